@@ -0,0 +1,294 @@
+"""Headless benchmarks for rendering, painting, hit testing, I/O and config load.
+
+Run from the repository root::
+
+    python -m benchmarks.run [--quick] [--output results.json]
+
+Everything runs under the SDL dummy video driver without Tk. A synthetic
+asset pack, maps of several sizes and fill densities, and brush populations
+are generated in a temporary directory. Results are written as one JSON
+document so runs can be diffed or compared with ``--compare``.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import yaml
+
+from classes.brush import BrushItem
+from classes.config_loader import Config
+
+MAP_SIZES = [64, 256, 1024]
+QUICK_MAP_SIZES = [64, 256]
+DENSITIES = [0.1, 0.5, 1.0]
+BRUSH_COUNTS = [100, 1000, 5000]
+QUICK_BRUSH_COUNTS = [100, 1000]
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """Time ``fn`` ``repeat`` times, returning summary statistics in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def make_asset_pack(root: str, groups: int, assets: int, size: int = 32) -> str:
+    """Write a synthetic asset pack and config, returning the config path."""
+    rng = random.Random(1)
+    tile_groups = []
+    for g in range(groups):
+        d = os.path.join(root, 'tiles', f'g{g}')
+        os.makedirs(d, exist_ok=True)
+        for a in range(assets):
+            surf = pygame.Surface((size, size))
+            surf.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            pygame.draw.circle(surf, (255, 255, 255), (size // 2, size // 2), size // 3)
+            pygame.image.save(surf, os.path.join(d, f'{a:04d}.png'))
+        tile_groups.append({'key': g + 1, 'id': f'g{g}', 'icon': os.path.join(d, '0000.png'), 'dir': d})
+    brush_dir = os.path.join(root, 'brushes')
+    os.makedirs(brush_dir, exist_ok=True)
+    for a in range(4):
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surf, (200, 40 * a, 40, 255), (size // 2, size // 2), size // 2)
+        pygame.image.save(surf, os.path.join(brush_dir, f'{a}.png'))
+    with open('config/ui.yaml', 'r') as f:
+        data = yaml.safe_load(f)
+    data['groups'] = {
+        'tile_groups': tile_groups,
+        'brush_groups': [{'key': 1, 'id': 'tokens', 'icon': os.path.join(brush_dir, '0.png'), 'dir': brush_dir}],
+    }
+    # keep everything the editor writes under root, away from the user's own files
+    data['general']['asset_cache_dir'] = os.path.join(root, 'cache')
+    data['general']['autosave_dir'] = os.path.join(root, 'autosave')
+    data['general']['map_index_cache'] = os.path.join(root, 'cache', 'map_index.json')
+    path = os.path.join(root, 'ui.yaml')
+    with open(path, 'w') as f:
+        yaml.safe_dump(data, f)
+    return path
+
+
+def fill_map(tool, size: int, density: float, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    tool.new_map(size, size)
+    groups = len(tool.config.tile_groups)
+    assets = len(tool.config.tile_groups[0].assets)
+    for layer_idx, layer in enumerate(tool.layers):
+        # upper layers are progressively sparser, as in real maps
+        d = density / (layer_idx + 1)
+        for _ in range(int(size * size * d)):
+            layer.paint(rng.randrange(size), rng.randrange(size), (rng.randrange(groups), rng.randrange(assets)))
+
+
+def populate_brushes(tool, count: int, seed: int = 2) -> None:
+    rng = random.Random(seed)
+    span = tool.map_tiles_x * tool.grid_size
+    tool.set_brush_items([BrushItem(0, rng.randrange(4), rng.uniform(0, span), rng.uniform(0, span))
+                          for _ in range(count)])
+
+
+def bench_config(config_path: str, repeat: int) -> dict:
+    with open(config_path, 'r') as f:
+        cache_dir = yaml.safe_load(f)['general']['asset_cache_dir']
+
+    def load_all():
+        cfg = Config(config_path)
+        for g in cfg.tile_groups + cfg.brush_groups:
+            for a in range(len(g.assets)):
+                g.assets[a]
+
+    def drop_cache():
+        for fn in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+            os.remove(os.path.join(cache_dir, fn))
+
+    return {
+        'config_load_cold': measure(load_all, repeat, setup=drop_cache),
+        'config_load_warm': measure(load_all, repeat),
+        'config_reload': measure(lambda: Config(config_path).reload(), repeat),
+    }
+
+
+def bench_render(tool, repeat: int) -> dict:
+    results = {}
+    rng = random.Random(3)
+    span = tool.map_tiles_x * tool.grid_size
+    for zoom in tool.zoom_levels:
+        tool.set_zoom(zoom)
+
+        def pan():
+            tool.camera = [rng.uniform(0, span), rng.uniform(0, span)]
+            tool.clamp_camera()
+
+        def cold():
+            pan()
+            tool.chunk_cache.clear()
+
+        results[f'frame_cold_zoom_{zoom}'] = measure(tool.draw, repeat, setup=cold)
+        results[f'frame_pan_zoom_{zoom}'] = measure(tool.draw, repeat, setup=pan)
+        results[f'frame_idle_zoom_{zoom}'] = measure(tool.draw, repeat)
+    return results
+
+
+def bench_paint(tool, repeat: int) -> dict:
+    tool.set_zoom(tool.zoom_levels[1])
+    tool.camera = [0, 0]
+    tool.mode = 1
+    tool.draw()
+    w, h = tool.screen.get_size()
+
+    def stroke():
+        # one diagonal drag across the screen, drawing after every step
+        for i in range(100):
+            tool.left_click((i * w // 100, i * h // 100))
+            tool.draw()
+
+    def erase():
+        for i in range(100):
+            tool.right_click((i * w // 100, i * h // 100))
+            tool.draw()
+
+    def next_asset():
+        # repaint with a different asset each time so every step changes a tile
+        tool.selected_asset = (tool.selected_asset + 1) % len(tool.config.tile_groups[0].assets)
+
+    def refill():
+        next_asset()
+        stroke()
+
+    return {
+        'paint_stroke_100': measure(stroke, repeat, setup=next_asset),
+        'erase_stroke_100': measure(erase, repeat, setup=refill),
+    }
+
+
+def bench_hit_test(tool, repeat: int) -> dict:
+    rng = random.Random(4)
+    tool.mode = 4
+    w, h = tool.screen.get_size()
+    points = [(rng.randrange(w), rng.randrange(h)) for _ in range(1000)]
+
+    def hits():
+        for p in points:
+            tool.start_drag(p)
+        tool.dragging_item = None
+
+    return {'brush_hit_test_1000': measure(hits, repeat)}
+
+
+def bench_io(tool, root: str, repeat: int) -> dict:
+    results = {}
+    for ext in ('.json', '.rpgmap'):
+        path = os.path.join(root, 'maps', 'bench' + ext)
+        results[f'map_save{ext}'] = measure(lambda: tool.save_map(path), repeat)
+        results[f'map_load{ext}'] = measure(lambda: (tool.load_map(path), tool.release_map_file()), repeat)
+        results[f'map_open{ext}'] = measure(lambda: (tool.load_map(path), tool.draw()), repeat)
+        tool.release_map_file()
+        results[f'map_size_bytes{ext}'] = os.path.getsize(path)
+    state = os.path.join(root, 'states', 'bench.json')
+    results['state_save'] = measure(lambda: tool.save_state(state), repeat)
+    results['state_load'] = measure(lambda: tool.load_state(state), repeat)
+    return results
+
+
+def run(quick: bool = False) -> dict:
+    from main import MapTool
+
+    repeat = 3 if quick else 10
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'quick': quick,
+        },
+        'cases': [],
+    }
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    with tempfile.TemporaryDirectory() as root:
+        config_path = make_asset_pack(root, groups=4, assets=16 if quick else 64)
+        results['cases'].append({'name': 'config', 'results': bench_config(config_path, repeat)})
+        tool = MapTool(headless=True, config_path=config_path)
+        tool.show_ui = False
+        for size in QUICK_MAP_SIZES if quick else MAP_SIZES:
+            for density in DENSITIES:
+                fill_map(tool, size, density)
+                case = {'name': 'map', 'size': size, 'density': density, 'results': {}}
+                case['results'].update(bench_render(tool, repeat))
+                case['results'].update(bench_paint(tool, repeat))
+                case['results'].update(bench_io(tool, root, repeat))
+                results['cases'].append(case)
+        for count in QUICK_BRUSH_COUNTS if quick else BRUSH_COUNTS:
+            fill_map(tool, 256, 0.5)
+            populate_brushes(tool, count)
+            case = {'name': 'brushes', 'count': count, 'results': {}}
+            case['results'].update(bench_render(tool, repeat))
+            case['results'].update(bench_hit_test(tool, repeat))
+            case['results'].update(bench_io(tool, root, repeat))
+            results['cases'].append(case)
+    return results
+
+
+def _case_key(case: dict) -> tuple:
+    return tuple(sorted((k, v) for k, v in case.items() if k != 'results'))
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    """Describe median changes between two result documents."""
+    lines = []
+    base_cases = {_case_key(c): c['results'] for c in baseline['cases']}
+    for case in current['cases']:
+        base = base_cases.get(_case_key(case))
+        if base is None:
+            continue
+        label = ' '.join(f'{k}={v}' for k, v in _case_key(case))
+        for name, result in case['results'].items():
+            old = base.get(name)
+            if isinstance(result, dict) and isinstance(old, dict) and old['median_ms'] > 0:
+                change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100
+                lines.append(f'{label} {name}: {old["median_ms"]:.2f} -> {result["median_ms"]:.2f} ms ({change:+.0f}%)')
+    return lines
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Run the headless benchmark suite.')
+    parser.add_argument('--quick', action='store_true', help='smaller maps and fewer repeats')
+    parser.add_argument('--output', help='write results JSON here instead of stdout')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    args = parser.parse_args(argv)
+    results = run(args.quick)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print('\n'.join(compare(baseline, results)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
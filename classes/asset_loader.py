@@ -0,0 +1,202 @@
+"""Parallel image decoding backed by an on-disk cache of decoded pixels.
+
+Files are read and decoded on a thread pool. Decoded RGBA pixels are kept
+under ``cache_dir`` keyed by path, mtime and size, so later launches skip
+image decoding entirely. Only the final ``convert_alpha`` happens on the
+calling (main) thread.
+
+:class:`LazyAssets` builds on this to load a group's assets on first access
+and to drop them again under a shared :class:`AssetBudget`.
+"""
+import hashlib
+import os
+import struct
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+CACHE_DIR = '.cache/assets'
+CACHE_HEADER = struct.Struct('<II')
+
+
+def _cache_path(path: str, st: os.stat_result, cache_dir: str) -> str:
+    key = f'{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}'
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.rgba')
+
+
+def decode_file(path: str, cache_dir: str | None = CACHE_DIR):
+    """Return ``((w, h), rgba_bytes)`` for an image, or ``None`` if it cannot be decoded.
+
+    Safe to call from worker threads; it never touches the display.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cache_path = _cache_path(path, st, cache_dir) if cache_dir else None
+    if cache_path:
+        try:
+            with open(cache_path, 'rb') as f:
+                w, h = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+                data = f.read()
+            if len(data) == w * h * 4:
+                return (w, h), data
+        except (OSError, struct.error):
+            pass
+    try:
+        surf = pygame.image.load(path)
+    except Exception:
+        return None
+    size = surf.get_size()
+    data = pygame.image.tobytes(surf, 'RGBA')
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(CACHE_HEADER.pack(*size))
+                f.write(data)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return size, data
+
+
+def placeholder(size=(32, 32)) -> pygame.Surface:
+    surf = pygame.Surface(size, pygame.SRCALPHA)
+    surf.fill((255, 0, 255, 255))
+    return surf
+
+
+def finish(decoded, size=(32, 32)) -> pygame.Surface:
+    """Turn a :func:`decode_file` result into a display surface (main thread only)."""
+    if decoded is None:
+        return placeholder(size)
+    dims, data = decoded
+    return pygame.image.frombuffer(data, dims, 'RGBA').convert_alpha()
+
+
+def load_images(paths: list[str], cache_dir: str | None = CACHE_DIR,
+                workers: int | None = None) -> list[pygame.Surface]:
+    """Decode ``paths`` in parallel, returning surfaces in the same order.
+
+    Files that fail to decode yield the magenta placeholder, as with
+    ``load_image``.
+    """
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        decoded = list(pool.map(lambda p: decode_file(p, cache_dir), paths))
+    return [finish(d) for d in decoded]
+
+
+_prefetch_pool: ThreadPoolExecutor | None = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _prefetch_pool
+    if _prefetch_pool is None:
+        _prefetch_pool = ThreadPoolExecutor(thread_name_prefix='asset-prefetch')
+    return _prefetch_pool
+
+
+class AssetBudget:
+    """Least-recently-used accounting of resident asset surfaces.
+
+    Shared by every :class:`LazyAssets` of a config; when the total exceeds
+    ``limit`` bytes the oldest surfaces are dropped from their sequences.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.used = 0
+        self.lru: OrderedDict = OrderedDict()
+
+    def touch(self, assets: 'LazyAssets', idx: int) -> None:
+        key = (assets, idx)
+        if key in self.lru:
+            self.lru.move_to_end(key)
+
+    def add(self, assets: 'LazyAssets', idx: int, nbytes: int) -> None:
+        self.lru[(assets, idx)] = nbytes
+        self.used += nbytes
+        # never evict the surface that was just loaded
+        while self.used > self.limit and len(self.lru) > 1:
+            (owner, old_idx), old_bytes = self.lru.popitem(last=False)
+            self.used -= old_bytes
+            owner._evict(old_idx)
+
+    def remap(self, assets: 'LazyAssets', kept: dict[int, int]) -> None:
+        """Re-index the entries of ``assets``, dropping those not in ``kept``."""
+        lru = OrderedDict()
+        for (owner, idx), nbytes in self.lru.items():
+            if owner is not assets:
+                lru[(owner, idx)] = nbytes
+            elif idx in kept:
+                lru[(owner, kept[idx])] = nbytes
+            else:
+                self.used -= nbytes
+        self.lru = lru
+
+
+class LazyAssets(Sequence):
+    """Index-compatible list of a group's assets, loaded on first access."""
+
+    def __init__(self, paths: list[str], budget: AssetBudget | None = None,
+                 cache_dir: str | None = CACHE_DIR):
+        self.paths = list(paths)
+        self.budget = budget
+        self.cache_dir = cache_dir
+        self.surfaces: list[pygame.Surface | None] = [None] * len(self.paths)
+        self.pending: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __hash__(self) -> int:
+        return id(self)
+
+    def __eq__(self, other) -> bool:
+        return self is other
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        surf = self.surfaces[idx]
+        if surf is not None:
+            if self.budget is not None:
+                self.budget.touch(self, idx)
+            return surf
+        future = self.pending.pop(idx, None)
+        decoded = future.result() if future is not None else decode_file(self.paths[idx], self.cache_dir)
+        surf = self.surfaces[idx] = finish(decoded)
+        if self.budget is not None:
+            self.budget.add(self, idx, surf.get_width() * surf.get_height() * surf.get_bytesize())
+        return surf
+
+    def is_loaded(self, idx: int) -> bool:
+        return self.surfaces[idx] is not None
+
+    def prefetch(self, indices) -> None:
+        """Start decoding ``indices`` in the background; out-of-range ones are ignored."""
+        for idx in indices:
+            if 0 <= idx < len(self) and self.surfaces[idx] is None and idx not in self.pending:
+                self.pending[idx] = _pool().submit(decode_file, self.paths[idx], self.cache_dir)
+
+    def rebuild(self, paths: list[str], kept: dict[int, int]) -> None:
+        """Switch to a new path list, carrying over surfaces for ``kept`` old -> new indices."""
+        surfaces = [None] * len(paths)
+        for old, new in kept.items():
+            surfaces[new] = self.surfaces[old]
+        self.paths = list(paths)
+        self.surfaces = surfaces
+        self.pending = {}
+        if self.budget is not None:
+            self.budget.remap(self, kept)
+
+    def _evict(self, idx: int) -> None:
+        self.surfaces[idx] = None
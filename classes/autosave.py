@@ -0,0 +1,231 @@
+"""Background autosave and non-blocking saves.
+
+:class:`AutoSaver` periodically snapshots the map and brush state while they
+have unsaved changes. The snapshot is only a copy of the chunk arrays; it is
+serialized and written by a single background thread. Every file is written
+under a temporary name and renamed into place, so a crash mid-write never
+leaves a truncated file behind.
+
+An autosave is a directory holding one single-layer binary map per layer,
+the brush state as JSON and a manifest written last. Only layers whose
+``version`` changed since the previous autosave are rewritten.
+"""
+import json
+import os
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .brush import brush_columns
+from .map_format import BINARY_MAP_EXT, MapFile, write_binary_map, write_json_layers
+
+MANIFEST = 'manifest.json'
+STATE_FILE = 'state.json'
+
+
+def atomic_write(path: str, write) -> None:
+    """Call ``write(tmp_path)`` and rename the result over ``path``."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_map(path: str, layers) -> None:
+    """Write ``layers`` atomically as JSON or binary, chosen by extension."""
+    if path.endswith(BINARY_MAP_EXT):
+        atomic_write(path, lambda tmp: write_binary_map(tmp, layers))
+    else:
+        atomic_write(path, lambda tmp: write_json_layers(tmp, layers))
+
+
+def write_json(path: str, data) -> None:
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+    atomic_write(path, write)
+
+
+class AutoSaver:
+    """Write snapshots of ``app`` to ``directory`` every ``interval`` seconds.
+
+    :meth:`poll` is called once per frame and returns immediately unless a
+    save is due. Set ``interval`` to 0 to disable periodic autosaves;
+    :meth:`submit` still runs background saves. Failures are handed to
+    ``app.report_error`` from :meth:`poll`, on the main thread.
+    """
+
+    def __init__(self, app, directory: str, interval: float):
+        self.app = app
+        self.directory = directory
+        self.interval = interval
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='autosave')
+        self.future: Future | None = None
+        self.last = time.monotonic()
+        # (layer object, version) and brush records last written successfully
+        self.written: dict[int, tuple] = {}
+        self.written_state = None
+        self._pending = None
+        self.error: str | None = None
+        # (message, on_failure) of failed submitted saves, reported by poll() and wait()
+        self.failures: queue.SimpleQueue = queue.SimpleQueue()
+
+    # ---- scheduling ----
+    def submit(self, fn, *args, on_failure=None) -> Future:
+        """Run ``fn(*args)`` on the save thread after any earlier saves.
+
+        Failures are reported, after calling ``on_failure``, on the main
+        thread by the next :meth:`poll` or :meth:`wait`.
+        """
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._note_failure(f, on_failure))
+        return future
+
+    def _note_failure(self, future: Future, on_failure) -> None:
+        exc = future.exception()
+        if exc is not None:
+            self.failures.put((f'{type(exc).__name__}: {exc}', on_failure))
+
+    def _report_failures(self) -> None:
+        while not self.failures.empty():
+            message, on_failure = self.failures.get()
+            if on_failure is not None:
+                on_failure()
+            self.app.report_error('Save failed', message)
+
+    def poll(self) -> None:
+        self._report_failures()
+        self._collect()
+        if self.interval <= 0 or self.future is not None:
+            return
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+        if self.app.unsaved_map or self.app.unsaved_state:
+            self.save()
+
+    def _collect(self) -> None:
+        if self.future is None or not self.future.done():
+            return
+        future, self.future = self.future, None
+        written, state = self._pending
+        self._pending = None
+        try:
+            future.result()
+        except Exception as exc:
+            # retried at the next interval; only the first of a run of failures is reported
+            if self.error is None:
+                self.app.report_error('Autosave failed', f'{type(exc).__name__}: {exc}')
+            self.error = str(exc)
+            return
+        self.error = None
+        self.written.update(written)
+        if state is not None:
+            self.written_state = state
+
+    def save(self) -> Future:
+        """Snapshot what changed since the last autosave and write it in the background."""
+        app = self.app
+        layers = []
+        written = {}
+        for i, layer in enumerate(app.layers):
+            key = (layer, layer.version)
+            if self.written.get(i) != key:
+                layers.append((i, layer.snapshot()))
+                written[i] = key
+        state = brush_columns(app.brush_items)
+        if state == self.written_state:
+            state = None
+        manifest = {
+            'time': time.time(),
+            'width': app.map_tiles_x,
+            'height': app.map_tiles_y,
+            'layers': [f'layer{i + 1}{BINARY_MAP_EXT}' for i in range(len(app.layers))],
+            'state': STATE_FILE,
+        }
+        self._pending = (written, state)
+        self.future = self.pool.submit(self._write, layers, state, manifest)
+        return self.future
+
+    def _write(self, layers, state, manifest) -> None:
+        for i, layer in layers:
+            write_map(os.path.join(self.directory, manifest['layers'][i]), [layer])
+        if state is not None:
+            write_json(os.path.join(self.directory, STATE_FILE), state)
+        write_json(os.path.join(self.directory, MANIFEST), manifest)
+
+    def wait(self) -> None:
+        """Block until queued saves are written, reporting any that failed."""
+        self.submit(lambda: None).result()
+        self._report_failures()
+        self._collect()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+        self._collect()
+
+    # ---- recovery ----
+    def manifest(self) -> dict | None:
+        """The manifest of an existing autosave, or ``None``."""
+        try:
+            with open(os.path.join(self.directory, MANIFEST), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self):
+        """Return ``(layers, saved brush state)`` of the existing autosave."""
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        layers = []
+        for name in manifest['layers']:
+            with MapFile(os.path.join(self.directory, name)) as map_file:
+                layers.extend(map_file.load_layers())
+        try:
+            with open(os.path.join(self.directory, manifest['state']), 'r') as f:
+                state = json.load(f)
+        except OSError:
+            state = brush_columns([])
+        return layers, state
+
+    def discard(self) -> None:
+        """Remove the autosave, e.g. after a clean exit with nothing unsaved."""
+        self.wait()
+        self._remove()
+        self._forget()
+
+    def saved(self, after: Future | None = None) -> None:
+        """Remove the autosave once a manual save left nothing unsaved.
+
+        The removal is queued behind pending writes, and skipped if the save
+        ``after`` failed, so the autosave is kept while it is the only copy.
+        """
+        self.submit(self._remove_after, after)
+        self._forget()
+        self.last = time.monotonic()
+
+    def _remove_after(self, after: Future | None) -> None:
+        # the single save thread has already finished ``after``
+        if after is None or after.exception() is None:
+            self._remove()
+
+    def _remove(self) -> None:
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+
+    def _forget(self) -> None:
+        if self._pending is not None:
+            # a write still in flight is removed with the rest
+            self._pending = ({}, None)
+        self.written.clear()
+        self.written_state = None
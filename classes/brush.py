@@ -1,8 +1,32 @@
 class BrushItem:
     """A placed brush asset on the map."""
 
-    def __init__(self, group_idx: int, asset_idx: int, x: float, y: float):
+    # play sessions place thousands of these; slots keep each one small
+    __slots__ = ('group_idx', 'asset_idx', 'x', 'y', 'z')
+
+    def __init__(self, group_idx: int, asset_idx: int, x: float, y: float, z: int = 0):
         self.group_idx = group_idx
         self.asset_idx = asset_idx
         self.x = x
         self.y = y
+        # stacking order; higher values draw on top and are hit first
+        self.z = z
+
+
+def brush_columns(items) -> dict[str, list]:
+    """Saved form of ``items``: parallel ``group``/``asset``/``x``/``y`` lists in stacking order."""
+    return {
+        'group': [b.group_idx for b in items],
+        'asset': [b.asset_idx for b in items],
+        'x': [b.x for b in items],
+        'y': [b.y for b in items],
+    }
+
+
+def read_brush_items(data) -> list[BrushItem]:
+    """Brush items from saved state, either columns or the older list of per-item records."""
+    if isinstance(data, dict):
+        columns = zip(data['group'], data['asset'], data['x'], data['y'])
+    else:
+        columns = ((d['group'], d['asset'], d['x'], d['y']) for d in data)
+    return [BrushItem(g, a, x, y, z) for z, (g, a, x, y) in enumerate(columns)]
@@ -0,0 +1,132 @@
+import math
+
+import pygame
+
+from .layer import EMPTY, decode
+
+
+class ChunkCache:
+    """Pre-rendered layer chunks for the current zoom level.
+
+    Each layer is split into ``layer.chunk_size`` square chunks that are
+    rendered once to an offscreen surface and blitted every frame. Only
+    occupied chunks are visited, so empty parts of a sparse layer cost
+    nothing. Chunks touched by ``Layer.paint``/``erase`` are patched tile by
+    tile; chunks marked wholly dirty are dropped and re-rendered when next
+    visible.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.zoom = None
+        self.layers: list = []
+        self.surfaces: dict[tuple[int, int, int], pygame.Surface] = {}
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+        self.zoom = None
+
+    def _drop_layer(self, layer_idx: int) -> None:
+        for key in [k for k in self.surfaces if k[0] == layer_idx]:
+            del self.surfaces[key]
+
+    def sync(self) -> None:
+        """Apply pending layer changes to cached chunk surfaces."""
+        app = self.app
+        if app.zoom != self.zoom:
+            self.surfaces.clear()
+            self.zoom = app.zoom
+        for i, layer in enumerate(app.layers):
+            dirty, dirty_all = layer.take_dirty()
+            if i >= len(self.layers) or self.layers[i] is not layer or dirty_all:
+                self._drop_layer(i)
+                continue
+            for (cx, cy), cells in dirty.items():
+                key = (i, cx, cy)
+                if key not in self.surfaces:
+                    continue
+                surf = self.surfaces[key]
+                # empty chunks are cached as None and simply re-rendered
+                if cells is None or surf is None:
+                    del self.surfaces[key]
+                    continue
+                for x, y in cells:
+                    self._draw_tile(surf, layer, cx, cy, x, y)
+        self.layers = list(app.layers)
+
+    def _tile_offset(self, local: int) -> int:
+        return int(local * self.app.grid_size * self.zoom)
+
+    def _tile_rect(self, lx: int, ly: int) -> pygame.Rect:
+        """Pixels of the tile at ``(lx, ly)`` within its chunk surface.
+
+        Scaled assets are rounded up, so at fractional zooms they are a pixel
+        larger than some tiles; blits are clipped to this rect so a tile never
+        covers its neighbours and can be patched on its own.
+        """
+        x, y = self._tile_offset(lx), self._tile_offset(ly)
+        return pygame.Rect(x, y, self._tile_offset(lx + 1) - x, self._tile_offset(ly + 1) - y)
+
+    def _draw_tile(self, surf: pygame.Surface, layer, cx: int, cy: int, x: int, y: int) -> None:
+        app = self.app
+        cs = layer.chunk_size
+        rect = self._tile_rect(x - cx * cs, y - cy * cs)
+        surf.fill((0, 0, 0, 0), rect)
+        val = layer.get(x, y)
+        if val != -1:
+            g_idx, a_idx = val
+            try:
+                img = app.scaled_assets.get(app.config.tile_groups[g_idx], a_idx, self.zoom, app.tile_base())
+            except IndexError:
+                # asset vanished in a config reload
+                return
+            surf.blit(img, rect.topleft, pygame.Rect((0, 0), rect.size))
+            app.profiler.count('tiles_blitted')
+
+    def _render(self, layer, cx: int, cy: int) -> pygame.Surface | None:
+        if layer.chunk_is_empty(cx, cy):
+            return None
+        app = self.app
+        cs = layer.chunk_size
+        size = math.ceil(cs * app.grid_size * self.zoom)
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        groups = app.config.tile_groups
+        blitted = 0
+        for i, code in enumerate(layer.get_chunk(cx, cy)):
+            if code == EMPTY:
+                continue
+            g_idx, a_idx = decode(code)
+            try:
+                img = app.scaled_assets.get(groups[g_idx], a_idx, self.zoom, app.tile_base())
+            except IndexError:
+                continue
+            rect = self._tile_rect(i % cs, i // cs)
+            surf.blit(img, rect.topleft, pygame.Rect((0, 0), rect.size))
+            blitted += 1
+        app.profiler.count('tiles_blitted', blitted)
+        app.profiler.count('chunks_rendered')
+        return surf
+
+    def draw(self, screen: pygame.Surface, view: pygame.Rect) -> None:
+        """Blit every chunk intersecting ``view``, rendering missing ones."""
+        self.sync()
+        app = self.app
+        x0, y0, x1, y1 = app.visible_tile_range(view)
+        visible = set()
+        for i, layer in enumerate(app.layers):
+            cs = layer.chunk_size
+            chunk_px = cs * app.grid_size
+            for cx, cy in layer.occupied_in(x0 // cs, y0 // cs, (x1 + cs - 1) // cs, (y1 + cs - 1) // cs):
+                key = (i, cx, cy)
+                if key not in self.surfaces:
+                    self.surfaces[key] = self._render(layer, cx, cy)
+                visible.add(key)
+                surf = self.surfaces[key]
+                if surf is not None:
+                    screen.blit(surf, app.world_to_screen(cx * chunk_px, cy * chunk_px))
+                    app.profiler.count('chunks_blitted')
+        # keep a margin of recently seen chunks for panning, drop the rest;
+        # partial redraws only see part of the screen so never evict there
+        if view == screen.get_rect() and len(self.surfaces) > 2 * len(visible):
+            for key in [k for k in self.surfaces if k not in visible]:
+                del self.surfaces[key]
@@ -1,7 +1,12 @@
+import math
 import os
+from collections import OrderedDict
+
 import yaml
 import pygame
 
+from .asset_loader import CACHE_DIR, AssetBudget, LazyAssets, load_images
+
 
 def load_image(path: str, size=(32, 32)) -> pygame.Surface:
     """Load an image returning a placeholder if it fails."""
@@ -15,38 +20,291 @@ def load_image(path: str, size=(32, 32)) -> pygame.Surface:
 CONFIG_PATH = 'config/ui.yaml'
 
 
+ASSET_EXTENSIONS = ('.txt', '.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+
+def file_stamp(path: str):
+    """``(mtime_ns, size)`` of a file, or ``None`` if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
 class Group:
-    """Represents a tile or brush group."""
+    """Represents a tile or brush group.
+
+    ``assets`` is a :class:`LazyAssets` sequence: surfaces are decoded on
+    first access and may be evicted again under ``budget``. With
+    ``load=False`` the icon is left for the caller to fill in (see
+    :func:`load_groups`).
+    """
 
-    def __init__(self, key: int, id: str, icon: str, dir: str):
+    def __init__(self, key: int, id: str, icon: str, dir: str, load: bool = True,
+                 budget: AssetBudget | None = None, cache_dir: str | None = CACHE_DIR):
         self.key = int(key)
         self.id = id
         self.icon_path = icon
         self.dir = dir
-        self.icon = load_image(icon)
-        self.assets: list[pygame.Surface] = []
-        self.load_assets()
+        self.cache_dir = cache_dir
+        self.asset_paths = self.list_assets()
+        self.stamps = [file_stamp(p) for p in self.asset_paths]
+        self.icon_stamp = file_stamp(icon)
+        self.icon: pygame.Surface | None = None
+        self.assets = LazyAssets(self.asset_paths, budget, cache_dir)
+        if load:
+            load_groups([self], cache_dir)
 
-    def load_assets(self) -> None:
+    def list_assets(self) -> list[str]:
         if not os.path.isdir(self.dir):
-            return
+            return []
         files = sorted(
             f for f in os.listdir(self.dir)
-            if any(f.lower().endswith(ext) for ext in ('.txt', '.png', '.jpg', '.jpeg', '.bmp', '.gif'))
+            if any(f.lower().endswith(ext) for ext in ASSET_EXTENSIONS)
         )
-        for fn in files:
-            path = os.path.join(self.dir, fn)
-            img = load_image(path)
-            self.assets.append(img)
+        return [os.path.join(self.dir, fn) for fn in files]
+
+    def refresh(self, key: int, id: str, icon: str, dir: str):
+        """Re-scan the group in place, keeping surfaces of unchanged files.
+
+        Returns ``(moves, kept)``: ``moves`` maps every old asset index to its
+        new index (``None`` if the file is gone) and ``kept`` is the subset
+        whose file is also unchanged on disk.
+        """
+        self.key = int(key)
+        self.id = id
+        icon_stamp = file_stamp(icon)
+        if icon != self.icon_path or icon_stamp != self.icon_stamp:
+            self.icon_path = icon
+            self.icon_stamp = icon_stamp
+            load_groups([self], self.cache_dir)
+        old_paths, old_stamps = self.asset_paths, self.stamps
+        self.dir = dir
+        self.asset_paths = self.list_assets()
+        self.stamps = [file_stamp(p) for p in self.asset_paths]
+        new_index = {p: i for i, p in enumerate(self.asset_paths)}
+        moves = {i: new_index.get(p) for i, p in enumerate(old_paths)}
+        kept = {i: j for i, j in moves.items() if j is not None and old_stamps[i] == self.stamps[j]}
+        self.assets.rebuild(self.asset_paths, kept)
+        return moves, kept
+
+
+def load_groups(groups: list[Group], cache_dir: str | None = CACHE_DIR) -> None:
+    """Decode the icons of every group in one parallel batch."""
+    for g, icon in zip(groups, load_images([g.icon_path for g in groups], cache_dir)):
+        g.icon = icon
+
+
+class ConfigChanges:
+    """Index changes made by :meth:`Config.reload`.
+
+    ``group_moves[kind]`` maps old group indices to new ones and
+    ``asset_moves[kind][old_group]`` maps that group's old asset indices,
+    with ``None`` for anything that no longer exists. ``kept`` maps each
+    reused :class:`Group` to the asset indices whose files did not change.
+    """
+
+    KINDS = ('tile_groups', 'brush_groups')
+
+    def __init__(self):
+        self.group_moves = {kind: {} for kind in self.KINDS}
+        self.asset_moves = {kind: {} for kind in self.KINDS}
+        self.kept: dict[Group, dict[int, int]] = {}
+
+    def remap(self, kind: str, g_idx: int, a_idx: int):
+        """New ``(group, asset)`` for an old pair, or ``None`` if it disappeared."""
+        if g_idx not in self.group_moves[kind]:
+            return g_idx, a_idx
+        new_g = self.group_moves[kind][g_idx]
+        if new_g is None:
+            return None
+        assets = self.asset_moves[kind].get(g_idx)
+        if assets is None:
+            # group was replaced rather than refreshed
+            return None
+        if a_idx not in assets:
+            return new_g, a_idx
+        new_a = assets[a_idx]
+        return None if new_a is None else (new_g, new_a)
 
 
 class Config:
     """Load UI configuration and asset groups from YAML."""
 
     def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
         with open(path, 'r') as f:
             self.data = yaml.safe_load(f)
-        self.tile_groups = [Group(**g) for g in self.data['groups']['tile_groups']]
-        self.brush_groups = [Group(**g) for g in self.data['groups']['brush_groups']]
         self.ui = self.data['ui']
         self.general = self.data['general']
+        cache_dir = self.general.get('asset_cache_dir', CACHE_DIR)
+        self.budget = AssetBudget(self.general.get('asset_memory_mb', 256) * 1024 * 1024)
+        self.tile_groups = [Group(**g, load=False, budget=self.budget, cache_dir=cache_dir)
+                            for g in self.data['groups']['tile_groups']]
+        self.brush_groups = [Group(**g, load=False, budget=self.budget, cache_dir=cache_dir)
+                             for g in self.data['groups']['brush_groups']]
+        load_groups(self.tile_groups + self.brush_groups, cache_dir)
+
+    def reload(self) -> ConfigChanges:
+        """Re-read the YAML and group directories, reloading only what changed.
+
+        Groups are matched by id; a matched group is refreshed in place so
+        surfaces of unchanged files (and caches keyed on the group) survive.
+        """
+        with open(self.path, 'r') as f:
+            self.data = yaml.safe_load(f)
+        self.ui = self.data['ui']
+        self.general = self.data['general']
+        cache_dir = self.general.get('asset_cache_dir', CACHE_DIR)
+        self.budget.limit = self.general.get('asset_memory_mb', 256) * 1024 * 1024
+        changes = ConfigChanges()
+        fresh = []
+        for kind in ConfigChanges.KINDS:
+            old_groups = getattr(self, kind)
+            by_id = {g.id: g for g in old_groups}
+            groups = []
+            for spec in self.data['groups'][kind]:
+                g = by_id.pop(spec['id'], None)
+                if g is None or g.dir != spec['dir']:
+                    g = Group(**spec, load=False, budget=self.budget, cache_dir=cache_dir)
+                    fresh.append(g)
+                else:
+                    moves, kept = g.refresh(**spec)
+                    changes.asset_moves[kind][old_groups.index(g)] = moves
+                    changes.kept[g] = kept
+                groups.append(g)
+            for i, g in enumerate(old_groups):
+                changes.group_moves[kind][i] = groups.index(g) if g in groups else None
+                if g not in groups:
+                    # release the dropped group's surfaces from the shared budget
+                    self.budget.remap(g.assets, {})
+            setattr(self, kind, groups)
+        load_groups(fresh, cache_dir)
+        return changes
+
+
+def surface_bytes(surf: pygame.Surface) -> int:
+    """Approximate pixel memory used by a surface."""
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+
+def _entry_bytes(value) -> int:
+    if isinstance(value, list):
+        return sum(surface_bytes(s) for s in value)
+    return surface_bytes(value)
+
+
+# zoom key of the mipmap pyramid entries in ScaledAssetCache
+MIPMAP = 'mipmap'
+
+
+def mipmap_levels(img: pygame.Surface) -> list[pygame.Surface]:
+    """Successive half-size copies of ``img``, filtered with ``smoothscale``, down to one pixel."""
+    levels = []
+    w, h = img.get_size()
+    while w > 1 or h > 1:
+        w, h = max(1, w // 2), max(1, h // 2)
+        try:
+            img = pygame.transform.smoothscale(img, (w, h))
+        except ValueError:
+            # smoothscale only handles 24 and 32 bit surfaces
+            img = pygame.transform.scale(img, (w, h))
+        levels.append(img)
+    return levels
+
+
+class ScaledAssetCache:
+    """LRU cache of group assets scaled for a zoom level.
+
+    Entries are keyed by ``(group, asset_idx, zoom, base)`` where ``base`` is
+    an optional fixed size (e.g. the grid size for tiles) that replaces the
+    asset's own dimensions before zooming. Any zoom may be requested.
+
+    Shrinking an asset to less than half its size starts from its mipmap
+    pyramid rather than the full-size image: the smallest level still at
+    least as large as the target gets a cheap final ``scale``, which keeps
+    zoomed-out views smooth instead of aliased. The pyramid is built once
+    per asset and cached under the zoom key :data:`MIPMAP`.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.used = 0
+        self.entries: OrderedDict = OrderedDict()
+        # running total of transform.scale calls, read by the frame profiler
+        self.scale_calls = 0
+
+    def _add(self, key, value) -> None:
+        self.entries[key] = value
+        self.used += _entry_bytes(value)
+        # always keep the entry just added, even if it alone exceeds the limit
+        while self.used > self.limit and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.used -= _entry_bytes(old)
+
+    def _source(self, group: Group, asset_idx: int, size: tuple[int, int]) -> pygame.Surface:
+        """The pyramid level to scale to ``size`` from: the smallest one no smaller than it."""
+        img = group.assets[asset_idx]
+        w, h = img.get_size()
+        if size[0] * 2 > w and size[1] * 2 > h:
+            return img
+        key = (group, asset_idx, MIPMAP, None)
+        levels = self.entries.get(key)
+        if levels is None:
+            levels = mipmap_levels(img)
+            self.scale_calls += len(levels)
+            self._add(key, levels)
+        else:
+            self.entries.move_to_end(key)
+        for level in levels:
+            if level.get_width() < size[0] or level.get_height() < size[1]:
+                break
+            img = level
+        return img
+
+    def get(self, group: Group, asset_idx: int, zoom: float, base=None) -> pygame.Surface:
+        key = (group, asset_idx, zoom, base)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            return surf
+        w, h = base if base is not None else group.assets[asset_idx].get_size()
+        # rounded up so tiles at fractional zooms leave no gaps between them
+        size = max(1, math.ceil(w * zoom)), max(1, math.ceil(h * zoom))
+        src = self._source(group, asset_idx, size)
+        if src.get_size() == size:
+            surf = src
+        else:
+            surf = pygame.transform.scale(src, size)
+            self.scale_calls += 1
+        self._add(key, surf)
+        return surf
+
+    def warm(self, groups: list[Group], zoom: float, base=None) -> None:
+        """Scale the already loaded assets of ``groups`` up front while the budget allows."""
+        for g in groups:
+            for idx in range(len(g.assets)):
+                if self.used >= self.limit:
+                    return
+                if g.assets.is_loaded(idx):
+                    self.get(g, idx, zoom, base)
+
+    def remap(self, kept: dict[Group, dict[int, int]]) -> None:
+        """Follow asset index changes from :meth:`Config.reload`.
+
+        Entries of groups in ``kept`` move to their new asset index or are
+        dropped when the file changed; entries of other groups are dropped.
+        """
+        entries = OrderedDict()
+        for (group, idx, zoom, base), surf in self.entries.items():
+            new_idx = kept.get(group, {}).get(idx)
+            if new_idx is None:
+                self.used -= _entry_bytes(surf)
+            else:
+                entries[(group, new_idx, zoom, base)] = surf
+        self.entries = entries
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.used = 0
@@ -0,0 +1,201 @@
+"""Headless export of a map and state to a PNG at any scale.
+
+Run as ``python -m classes.exporter MAP [--state STATE] --out OUT.png``.
+The output is split into square tiles rendered in parallel by a process
+pool under the SDL dummy video driver. Finished tiles are stitched one band
+at a time into a streamed PNG, so the full bitmap is never held in memory.
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+import yaml
+
+from .brush import read_brush_items
+from .config_loader import Config, ScaledAssetCache
+from .layer import EMPTY, Layer, decode
+from .map_format import BINARY_MAP_EXT, MapFile, read_json_layers
+from .spatial_index import SpatialGrid
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IDAT_SIZE = 1 << 16
+
+# per-process renderer state, filled by _init_worker
+_worker: dict = {}
+
+
+def load_layers(path: str):
+    """Layers of a JSON or binary map; binary maps stay lazily paged."""
+    if path.endswith(BINARY_MAP_EXT):
+        map_file = MapFile(path)
+        layers = []
+        for i in range(map_file.layer_count):
+            layer = Layer(map_file.width, map_file.height, map_file.chunk_size)
+            layer.attach(map_file, i)
+            layers.append(layer)
+        return layers
+    return read_json_layers(path)
+
+
+def load_brushes(path: str | None):
+    if not path:
+        return []
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return read_brush_items(data)
+
+
+def _init_worker(config_path: str, map_path: str, state_path: str | None, scale: float) -> None:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    config = Config(config_path)
+    grid_size = config.general['grid_size']
+    index = SpatialGrid(grid_size)
+    for item in load_brushes(state_path):
+        try:
+            w, h = config.brush_groups[item.group_idx].assets[item.asset_idx].get_size()
+        except IndexError:
+            continue
+        index.insert(item, (item.x, item.y, w, h))
+    _worker.update(
+        config=config,
+        layers=load_layers(map_path),
+        brushes=index,
+        scale=scale,
+        grid_size=grid_size,
+        cache=ScaledAssetCache(config.general.get('scaled_cache_mb', 64) * 1024 * 1024),
+    )
+
+
+def render_tile(px: int, py: int, w: int, h: int) -> bytes:
+    """Render output pixels ``[px, px + w) x [py, py + h)`` as RGBA bytes."""
+    config, scale, gs = _worker['config'], _worker['scale'], _worker['grid_size']
+    cache = _worker['cache']
+    surf = pygame.Surface((w, h), pygame.SRCALPHA)
+    step = gs * scale
+    for layer in _worker['layers']:
+        cs = layer.chunk_size
+        tx0, ty0 = max(0, int(px // step)), max(0, int(py // step))
+        tx1 = min(layer.width, math.ceil((px + w) / step))
+        ty1 = min(layer.height, math.ceil((py + h) / step))
+        if tx0 >= tx1 or ty0 >= ty1:
+            continue
+        # only chunks holding tiles are visited; empty map areas cost nothing
+        for cx, cy in layer.occupied_in(tx0 // cs, ty0 // cs, (tx1 - 1) // cs + 1, (ty1 - 1) // cs + 1):
+            for i, code in enumerate(layer.get_chunk(cx, cy)):
+                if code == EMPTY:
+                    continue
+                tx, ty = cx * cs + i % cs, cy * cs + i // cs
+                if not (tx0 <= tx < tx1 and ty0 <= ty < ty1):
+                    continue
+                g_idx, a_idx = decode(code)
+                try:
+                    img = cache.get(config.tile_groups[g_idx], a_idx, scale, (gs, gs))
+                except IndexError:
+                    continue
+                surf.blit(img, (int(tx * step) - px, int(ty * step) - py))
+    for item in _worker['brushes'].query_rect((px / scale, py / scale, w / scale, h / scale)):
+        img = cache.get(config.brush_groups[item.group_idx], item.asset_idx, scale)
+        surf.blit(img, (int(item.x * scale) - px, int(item.y * scale) - py))
+    return pygame.image.tobytes(surf, 'RGBA')
+
+
+def map_size(path: str) -> tuple[int, int]:
+    """Map dimensions in tiles."""
+    if path.endswith(BINARY_MAP_EXT):
+        with MapFile(path) as map_file:
+            return map_file.width, map_file.height
+    grid = read_json_layers(path)[0]
+    return grid.width, grid.height
+
+
+class PNGStreamWriter:
+    """Write an RGBA PNG scanline by scanline."""
+
+    def __init__(self, f, width: int, height: int):
+        self.f = f
+        self.compressor = zlib.compressobj(6)
+        self.buffer = bytearray()
+        f.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(kind)
+        self.f.write(data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_row(self, row: bytes) -> None:
+        self.buffer += self.compressor.compress(b'\x00' + row)
+        if len(self.buffer) >= IDAT_SIZE:
+            self._chunk(b'IDAT', bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self) -> None:
+        self.buffer += self.compressor.flush()
+        self._chunk(b'IDAT', bytes(self.buffer))
+        self._chunk(b'IEND', b'')
+
+
+def export(map_path: str, out_path: str, state_path: str | None = None, scale: float = 1.0,
+           config_path: str = 'config/ui.yaml', tile: int = 1024, workers: int | None = None) -> tuple[int, int]:
+    """Render ``map_path`` (plus brush items from ``state_path``) to ``out_path``.
+
+    Returns the output size in pixels.
+    """
+    with open(config_path, 'r') as f:
+        grid_size = yaml.safe_load(f)['general']['grid_size']
+    tiles_x, tiles_y = map_size(map_path)
+    width = int(tiles_x * grid_size * scale)
+    height = int(tiles_y * grid_size * scale)
+    if width <= 0 or height <= 0:
+        raise ValueError('nothing to export')
+    cols = range(0, width, tile)
+    rows = list(range(0, height, tile))
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config_path, map_path, state_path, scale)) as pool, \
+            open(out_path, 'wb') as f:
+        writer = PNGStreamWriter(f, width, height)
+
+        def submit(py):
+            h = min(tile, height - py)
+            return [(min(tile, width - px), pool.submit(render_tile, px, py, min(tile, width - px), h))
+                    for px in cols]
+
+        # keep a couple of bands in flight so workers stay busy while we stitch
+        ahead = max(2, (workers + len(cols) - 1) // len(cols) + 1)
+        pending = [submit(py) for py in rows[:ahead]]
+        for i, py in enumerate(rows):
+            band = [(w, future.result()) for w, future in pending.pop(0)]
+            if i + ahead < len(rows):
+                pending.append(submit(rows[i + ahead]))
+            for y in range(min(tile, height - py)):
+                writer.write_row(b''.join(data[y * w * 4:(y + 1) * w * 4] for w, data in band))
+            del band
+        writer.close()
+    return width, height
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Export a map (and optional state) to a PNG.')
+    parser.add_argument('map', help='map file (.json or .rpgmap)')
+    parser.add_argument('--state', help='state file with brush items')
+    parser.add_argument('--out', required=True, help='output PNG path')
+    parser.add_argument('--scale', type=float, default=1.0, help='output pixels per map pixel')
+    parser.add_argument('--config', default='config/ui.yaml')
+    parser.add_argument('--tile', type=int, default=1024, help='tile size in output pixels')
+    parser.add_argument('--workers', type=int, help='render processes (default: CPU count)')
+    args = parser.parse_args(argv)
+    w, h = export(args.map, args.out, args.state, args.scale, args.config, args.tile, args.workers)
+    print(f'{args.out}: {w}x{h}')
+
+
+if __name__ == '__main__':
+    main()
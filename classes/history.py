@@ -0,0 +1,210 @@
+"""Undo/redo history built from compact per-chunk tile diffs and brush records.
+
+Tile edits are captured through each layer's ``journal`` (see
+:class:`~classes.layer.Layer`): a chunk is copied the first time a step
+touches it, and when the step is committed only the cells that actually
+changed are kept, as parallel index/before/after arrays. Applying or
+reverting a step is therefore proportional to the cells it changed.
+Brush item additions, removals and moves are kept as small records.
+"""
+from array import array
+from contextlib import contextmanager
+
+# rough per-record overhead used for the memory cap
+RECORD_BYTES = 64
+
+
+class TileDiff:
+    """Changed cells of one chunk of one layer."""
+
+    __slots__ = ('layer_idx', 'chunk', 'cells', 'before', 'after')
+
+    def __init__(self, layer_idx: int, chunk: tuple[int, int], cells: array, before: array, after: array):
+        self.layer_idx = layer_idx
+        self.chunk = chunk
+        self.cells = cells
+        self.before = before
+        self.after = after
+
+    @property
+    def nbytes(self) -> int:
+        return RECORD_BYTES + sum(a.itemsize * len(a) for a in (self.cells, self.before, self.after))
+
+
+class Step:
+    """One undoable action: tile diffs plus ``(kind, item, before, after)`` brush records."""
+
+    def __init__(self, label: str, tiles: list[TileDiff], brushes: list[tuple]):
+        self.label = label
+        self.tiles = tiles
+        self.brushes = brushes
+        self.nbytes = sum(d.nbytes for d in tiles) + RECORD_BYTES * (1 + len(brushes))
+
+
+def _merge_moves(records: list[tuple]) -> list[tuple]:
+    """Collapse consecutive moves of the same item into one record."""
+    merged = []
+    for rec in records:
+        if merged and rec[0] == 'move' and merged[-1][0] == 'move' and merged[-1][1] is rec[1]:
+            merged[-1] = ('move', rec[1], merged[-1][2], rec[3])
+        else:
+            merged.append(rec)
+    return merged
+
+
+class History:
+    """Undo and redo stacks for a :class:`MapTool` with a memory cap in bytes.
+
+    Edits accumulate until :meth:`commit`. Between :meth:`begin` and the
+    matching :meth:`end` commits are deferred, so a whole mouse drag becomes
+    one step. Oldest steps are dropped once the stacks exceed ``limit_bytes``.
+    """
+
+    def __init__(self, app, limit_bytes: int):
+        self.app = app
+        self.limit = limit_bytes
+        self.undo_stack: list[Step] = []
+        self.redo_stack: list[Step] = []
+        self.used = 0
+        self.depth = 0
+        self.label = None
+        self.brushes: list[tuple] = []
+        self.recording = True
+        self._attach()
+
+    def _attach(self) -> None:
+        for layer in self.app.layers:
+            layer.journal = {}
+
+    def clear(self) -> None:
+        """Forget all history, e.g. after the layers were replaced by loading a map."""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.used = 0
+        self.depth = 0
+        self.label = None
+        self.brushes = []
+        self._attach()
+
+    @contextmanager
+    def paused(self):
+        """Run edits that must not be recorded (loading, applying history)."""
+        layers = self.app.layers
+        journals = [layer.journal for layer in layers]
+        recording = self.recording
+        for layer in layers:
+            layer.journal = None
+        self.recording = False
+        try:
+            yield
+        finally:
+            self.recording = recording
+            for layer, journal in zip(layers, journals):
+                layer.journal = journal
+
+    # ---- recording ----
+    def begin(self, label: str = 'edit') -> None:
+        if self.depth == 0 and self.label is None:
+            self.label = label
+        self.depth += 1
+
+    def end(self) -> None:
+        self.depth = max(0, self.depth - 1)
+        self.commit()
+
+    def record_brush(self, kind: str, item, before=None, after=None) -> None:
+        """Note a brush ``add``, ``remove`` or ``move`` (with before/after positions)."""
+        if self.recording:
+            self.brushes.append((kind, item, before, after))
+
+    def commit(self, label: str | None = None) -> Step | None:
+        """Close the pending edits into a step, unless inside :meth:`begin`/:meth:`end`."""
+        if self.depth:
+            return None
+        tiles = []
+        for layer_idx, layer in enumerate(self.app.layers):
+            journal = layer.journal
+            if not journal:
+                continue
+            for key, before in journal.items():
+                after = layer.get_chunk(*key)
+                if before == after:
+                    continue
+                cells = array('H', [i for i in range(len(before)) if before[i] != after[i]])
+                if cells:
+                    tiles.append(TileDiff(layer_idx, key, cells,
+                                          array('i', [before[i] for i in cells]),
+                                          array('i', [after[i] for i in cells])))
+            layer.journal = {}
+        brushes = _merge_moves(self.brushes)
+        self.brushes = []
+        step_label = label or self.label or 'edit'
+        self.label = None
+        if not tiles and not brushes:
+            return None
+        step = Step(step_label, tiles, brushes)
+        self.undo_stack.append(step)
+        self.used += step.nbytes
+        for old in self.redo_stack:
+            self.used -= old.nbytes
+        self.redo_stack.clear()
+        while self.used > self.limit and len(self.undo_stack) > 1:
+            self.used -= self.undo_stack.pop(0).nbytes
+        return step
+
+    # ---- applying ----
+    def _apply_tiles(self, step: Step, undo: bool) -> None:
+        layers = self.app.layers
+        for diff in step.tiles:
+            layer = layers[diff.layer_idx]
+            cx, cy = diff.chunk
+            chunk = layer.writable_chunk(cx, cy)
+            values = diff.before if undo else diff.after
+            for i, value in zip(diff.cells, values):
+                chunk[i] = value
+            layer.compact_chunk(cx, cy)
+            cs = layer.chunk_size
+            if len(diff.cells) > cs * cs // 4:
+                layer.mark_chunk(cx, cy)
+            else:
+                for i in diff.cells:
+                    layer._mark(cx * cs + i % cs, cy * cs + i // cs)
+        if step.tiles:
+            self.app.unsaved_map = True
+
+    def _apply_brushes(self, step: Step, undo: bool) -> None:
+        app = self.app
+        records = reversed(step.brushes) if undo else step.brushes
+        for kind, item, before, after in records:
+            if kind == 'move':
+                app.move_brush_item(item, *(before if undo else after))
+            elif (kind == 'add') == undo:
+                app.remove_brush_item(item)
+            else:
+                app.restore_brush_item(item)
+        if step.brushes:
+            app.unsaved_state = True
+
+    def undo(self) -> Step | None:
+        self.depth = 0
+        self.commit()
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        with self.paused():
+            self._apply_tiles(step, undo=True)
+            self._apply_brushes(step, undo=True)
+        self.redo_stack.append(step)
+        return step
+
+    def redo(self) -> Step | None:
+        self.depth = 0
+        self.commit()
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        with self.paused():
+            self._apply_tiles(step, undo=False)
+            self._apply_brushes(step, undo=False)
+        self.undo_stack.append(step)
+        return step
@@ -11,9 +11,25 @@ class InputHandler:
         self.app = app
         # timestamp of last processed scroll event for debouncing
         self.last_scroll = 0
+        # left button went down on the minimap, so drags move the camera
+        self.minimap_drag = False
 
-    def handle_events(self) -> None:
-        for event in pygame.event.get():
+    def handle_events(self, first: pygame.event.Event | None = None) -> int:
+        """Handle queued events, after ``first`` if given; returns how many there were."""
+        events = pygame.event.get()
+        if first is not None:
+            events.insert(0, first)
+        self.app.profiler.count('events', len(events))
+        # a run of motion events is handled once, at its last position; strokes
+        # interpolate the tiles in between
+        motion = None
+        for event in events:
+            if event.type == pygame.MOUSEMOTION:
+                motion = event
+                continue
+            if motion is not None:
+                self._handle_mousemotion(motion)
+                motion = None
             if event.type == pygame.QUIT:
                 self.app.running = False
             elif event.type == pygame.KEYDOWN:
@@ -24,8 +40,11 @@ class InputHandler:
                 self._handle_mousebuttondown(event)
             elif event.type == pygame.MOUSEBUTTONUP:
                 self._handle_mousebuttonup(event)
-            elif event.type == pygame.MOUSEMOTION:
-                self._handle_mousemotion(event)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.VIDEORESIZE):
+                self.app.invalidate()
+        if motion is not None:
+            self._handle_mousemotion(motion)
+        return len(events)
 
     # ---------------- internal handlers -----------------
     def _handle_keydown(self, event):
@@ -43,10 +62,37 @@ class InputHandler:
             self.app.asset_ui.cycle_selected_asset(-1)
         elif event.key == pygame.K_PAGEDOWN:
             self.app.asset_ui.cycle_selected_asset(1)
+        elif event.key == pygame.K_n:
+            self.app.minimap.toggle()
         elif event.key == pygame.K_TAB:
             self.app.show_ui = not self.app.show_ui
+        elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+            if event.mod & pygame.KMOD_SHIFT:
+                self.app.redo()
+            else:
+                self.app.undo()
+        elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+            self.app.redo()
         elif event.key == pygame.K_s and pygame.key.get_mods() & pygame.KMOD_CTRL:
             self.app.quick_save()
+        elif event.key == pygame.K_F3:
+            if event.mod & pygame.KMOD_SHIFT:
+                self.app.toggle_profile_log()
+            else:
+                self.app.toggle_profiler_hud()
+        elif event.key == pygame.K_b:
+            self.app.set_tool('paint')
+        elif event.key == pygame.K_g:
+            self.app.set_tool('fill')
+        elif event.key == pygame.K_m:
+            self.app.set_tool('outline' if event.mod & pygame.KMOD_SHIFT else 'rect')
+        elif event.key == pygame.K_h and event.mod & pygame.KMOD_CTRL and self.app.mode < 4:
+            # replace the tile under the cursor with the selected asset everywhere
+            layer = self.app.layers[self.app.mode - 1]
+            x, y = self.app.screen_to_tile(pygame.mouse.get_pos())
+            if 0 <= x < layer.width and 0 <= y < layer.height:
+                self.app.replace_tile(layer.get(x, y), (self.app.selected_group, self.app.selected_asset),
+                                      all_layers=bool(event.mod & pygame.KMOD_SHIFT))
         elif event.key == pygame.K_r:
             self.app.reload_config()
         elif event.key == pygame.K_ESCAPE:
@@ -54,8 +100,9 @@ class InputHandler:
         elif event.key == pygame.K_SPACE and self.app.mode == 4:
             mx, my = pygame.mouse.get_pos()
             wx, wy = self.app.screen_to_world(mx, my)
-            self.app.brush_items.append(BrushItem(self.app.selected_group, self.app.selected_asset, wx, wy))
+            self.app.add_brush_item(BrushItem(self.app.selected_group, self.app.selected_asset, wx, wy))
             self.app.unsaved_state = True
+            self.app.history.commit()
 
     def _process_scroll(self, delta: int) -> None:
         """Cycle assets with a 200ms debounce."""
@@ -66,11 +113,7 @@ class InputHandler:
 
     def _handle_mousewheel(self, event):
         if pygame.key.get_mods() & pygame.KMOD_CTRL:
-            if event.y > 0:
-                self.app.zoom = self.app.zoom_levels[max(0, self.app.zoom_levels.index(self.app.zoom) - 1)]
-            else:
-                self.app.zoom = self.app.zoom_levels[min(len(self.app.zoom_levels) - 1, self.app.zoom_levels.index(self.app.zoom) + 1)]
-            self.app.clamp_camera()
+            self.app.zoom_by(-1 if event.y > 0 else 1, pygame.mouse.get_pos())
         else:
             delta = -1 if event.y > 0 else 1
             self._process_scroll(delta)
@@ -79,20 +122,22 @@ class InputHandler:
         if event.button in (4, 5):
             delta = -1 if event.button == 4 else 1
             if pygame.key.get_mods() & pygame.KMOD_CTRL:
-                if delta < 0:
-                    self.app.zoom = self.app.zoom_levels[max(0, self.app.zoom_levels.index(self.app.zoom) - 1)]
-                else:
-                    self.app.zoom = self.app.zoom_levels[min(len(self.app.zoom_levels) - 1, self.app.zoom_levels.index(self.app.zoom) + 1)]
-                self.app.clamp_camera()
+                self.app.zoom_by(delta, event.pos)
             else:
                 self._process_scroll(delta)
+        elif event.button == 1 and self.app.minimap.hit(event.pos):
+            self.minimap_drag = True
+            self.app.minimap.jump(event.pos)
         elif event.button == 1:
+            # everything until the button is released is one undo step
+            self.app.history.begin()
             self.app.left_button_down = True
             if self.app.mode < 4:
                 self.app.left_click(event.pos)
             else:
                 self.app.start_drag(event.pos)
         elif event.button == 3:
+            self.app.history.begin()
             self.app.right_button_down = True
             self.app.right_click(event.pos)
         elif event.button == 2:
@@ -100,16 +145,25 @@ class InputHandler:
             self.app.last_mouse = event.pos
 
     def _handle_mousebuttonup(self, event):
-        if event.button == 1:
+        if event.button == 1 and self.minimap_drag:
+            self.minimap_drag = False
+        elif event.button == 1:
             self.app.left_button_down = False
+            self.app.finish_tool()
             if self.app.mode == 4:
                 self.app.dragging_item = None
+            self.app.history.end()
         elif event.button == 3:
             self.app.right_button_down = False
+            self.app.finish_tool()
+            self.app.history.end()
         elif event.button == 2:
             self.app.dragging = False
 
     def _handle_mousemotion(self, event):
+        if self.minimap_drag:
+            self.app.minimap.jump(event.pos)
+            return
         if getattr(self.app, 'dragging', False):
             mx, my = event.pos
             dx = mx - self.app.last_mouse[0]
@@ -120,10 +174,13 @@ class InputHandler:
             self.app.last_mouse = event.pos
         if self.app.mode == 4 and self.app.left_button_down and self.app.dragging_item:
             mx, my = self.app.screen_to_world(*event.pos)
-            self.app.dragging_item.x = mx - self.app.drag_offset[0]
-            self.app.dragging_item.y = my - self.app.drag_offset[1]
+            self.app.move_brush_item(self.app.dragging_item,
+                                     mx - self.app.drag_offset[0], my - self.app.drag_offset[1])
             self.app.unsaved_state = True
         elif self.app.left_button_down and self.app.mode < 4:
-            self.app.left_click(event.pos)
-        if self.app.right_button_down:
-            self.app.right_click(event.pos)
+            self.app.drag_tool(event.pos)
+        elif self.app.right_button_down:
+            if self.app.mode < 4:
+                self.app.drag_tool(event.pos, erase=True)
+            else:
+                self.app.right_click(event.pos)
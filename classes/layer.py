@@ -1,13 +1,542 @@
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import groupby
+
+CHUNK_SIZE = 16
+EMPTY = -1
+ASSET_BITS = 16
+ASSET_MASK = (1 << ASSET_BITS) - 1
+
+
+def encode(tile) -> int:
+    """Pack a ``(group, asset)`` pair (or ``-1``) into one int32 cell value."""
+    if tile == -1:
+        return EMPTY
+    g_idx, a_idx = tile
+    return (g_idx << ASSET_BITS) | a_idx
+
+
+def decode(code: int):
+    """Inverse of :func:`encode`."""
+    if code == EMPTY:
+        return -1
+    return code >> ASSET_BITS, code & ASSET_MASK
+
+
+def line_cells(x0: int, y0: int, x1: int, y1: int):
+    """Yield the grid cells on the line from ``(x0, y0)`` to ``(x1, y1)`` inclusive (Bresenham)."""
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while True:
+        yield x0, y0
+        if x0 == x1 and y0 == y1:
+            return
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
 class Layer:
-    """A single tile layer grid."""
+    """A single tile layer grid.
+
+    Cells are stored packed as int32 values (see :func:`encode`) in one flat
+    ``array`` per chunk of ``chunk_size`` x ``chunk_size`` tiles, row-major
+    within the chunk. Storage is sparse: ``chunks`` maps ``(cx, cy)`` to the
+    cells of chunks that hold tiles, and any chunk missing from it is empty,
+    so memory grows with painted content rather than map area. Readers get a
+    shared blank chunk for empty areas; writers go through
+    :meth:`writable_chunk`, and chunks emptied again are freed.
+
+    Changes are tracked per chunk so renderers can refresh only what was
+    touched: ``dirty`` maps a chunk to the set of changed cells, or to
+    ``None`` when the whole chunk must be redrawn.
+
+    A layer may be attached to a map file (see :meth:`attach`); its chunks
+    are then paged in from ``source`` the first time they are accessed.
+
+    While ``journal`` is a dict, every chunk is copied into it (keyed by
+    ``(cx, cy)``) before its first modification, which lets undo history diff
+    what an edit changed. ``version`` increases with every change so savers
+    can tell whether a layer needs writing again.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.dirty: dict[tuple[int, int], set[tuple[int, int]] | None] = {}
+        self.dirty_all = False
+        self.source = None
+        self.source_layer = 0
+        self.pending: set[tuple[int, int]] = set()
+        self.journal: dict[tuple[int, int], array] | None = None
+        self.version = 0
+        self._allocate(width, height)
+
+    def _allocate(self, width: int, height: int) -> None:
+        cs = self.chunk_size
+        self.width = width
+        self.height = height
+        self.chunks_x = (width + cs - 1) // cs
+        self.chunks_y = (height + cs - 1) // cs
+        self.chunks: dict[tuple[int, int], array] = {}
+        # returned for every empty chunk; never modified
+        self._blank = array('i', [EMPTY]) * (cs * cs)
+        self.pending = set()
+        self.source = None
 
-    def __init__(self, width: int, height: int):
-        self.grid = [[-1 for _ in range(height)] for _ in range(width)]
+    def _locate(self, x: int, y: int):
+        cs = self.chunk_size
+        return self.get_chunk(x // cs, y // cs), (y % cs) * cs + x % cs
+
+    def _touch(self, key: tuple[int, int]) -> None:
+        """Record chunk ``key`` in the journal before it is first modified."""
+        if self.journal is not None and key not in self.journal:
+            self.journal[key] = array('i', self.get_chunk(*key))
+
+    # ---- lazy loading ----
+    def attach(self, source, layer_idx: int) -> None:
+        """Replace the contents with layer ``layer_idx`` of a map file.
+
+        Chunks stored in ``source`` are only read when first accessed. Chunks
+        whose contents may change are marked dirty right away.
+        """
+        if (source.width, source.height, source.chunk_size) != (self.width, self.height, self.chunk_size):
+            self.chunk_size = source.chunk_size
+            self._allocate(source.width, source.height)
+            self.invalidate()
+        self.source = source
+        self.source_layer = layer_idx
+        self.pending = set(source.chunk_keys(layer_idx))
+        for key in list(self.chunks):
+            if key not in self.pending:
+                self.set_chunk(*key, self._blank)
+        for key in self.pending:
+            self.chunks.pop(key, None)
+            self.mark_chunk(*key)
+        if not self.pending:
+            self.source = None
+
+    def _page_in(self, key: tuple[int, int]) -> None:
+        if key in self.pending:
+            self.pending.discard(key)
+            self.chunks[key] = self.source.read_chunk(self.source_layer, *key)
+            if not self.pending:
+                self.source = None
+
+    def load_all(self) -> None:
+        """Page in every chunk still pending from the attached source."""
+        for key in list(self.pending):
+            self._page_in(key)
+
+    # ---- cell access ----
+    def get(self, x: int, y: int):
+        chunk, i = self._locate(x, y)
+        return decode(chunk[i])
 
     def paint(self, x: int, y: int, tile_idx):
-        if 0 <= x < len(self.grid) and 0 <= y < len(self.grid[0]):
-            self.grid[x][y] = tile_idx
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk, i = self._locate(x, y)
+            code = encode(tile_idx)
+            if chunk[i] != code:
+                self._set_cell(x, y, i, code)
 
     def erase(self, x: int, y: int) -> None:
-        if 0 <= x < len(self.grid) and 0 <= y < len(self.grid[0]):
-            self.grid[x][y] = -1
+        self.paint(x, y, -1)
+
+    def paint_cells(self, cells, tile_idx) -> int:
+        """Set every ``(x, y)`` in ``cells`` to ``tile_idx``, skipping cells off the map.
+
+        Returns the number of cells changed.
+        """
+        code = encode(tile_idx)
+        changed = 0
+        for x, y in cells:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                chunk, i = self._locate(x, y)
+                if chunk[i] != code:
+                    self._set_cell(x, y, i, code)
+                    changed += 1
+        return changed
+
+    def _set_cell(self, x: int, y: int, i: int, code: int) -> None:
+        cs = self.chunk_size
+        cx, cy = x // cs, y // cs
+        self.writable_chunk(cx, cy)[i] = code
+        if code == EMPTY:
+            self.compact_chunk(cx, cy)
+        self._mark(x, y)
+
+    # ---- compatibility accessor ----
+    @property
+    def grid(self) -> list[list]:
+        """The layer as nested ``grid[x][y]`` lists of ``-1``/``(group, asset)``."""
+        return [[self.get(x, y) for y in range(self.height)] for x in range(self.width)]
+
+    @grid.setter
+    def grid(self, grid) -> None:
+        self.load_grid(grid)
+
+    def load_grid(self, grid) -> None:
+        """Replace the contents from nested ``grid[x][y]`` lists.
+
+        Only chunks whose tiles differ are marked dirty unless the dimensions
+        change, in which case the whole layer is invalidated.
+        """
+        width = len(grid)
+        height = len(grid[0]) if grid else 0
+        if (width, height) != (self.width, self.height):
+            self._allocate(width, height)
+            self.invalidate()
+        cs = self.chunk_size
+        for cy in range(self.chunks_y):
+            for cx in range(self.chunks_x):
+                new = self._blank_chunk()
+                for y in range(cy * cs, min(height, (cy + 1) * cs)):
+                    row = (y - cy * cs) * cs
+                    for x in range(cx * cs, min(width, (cx + 1) * cs)):
+                        new[row + x - cx * cs] = encode(grid[x][y])
+                self.set_chunk(cx, cy, new)
+
+    # ---- chunk access ----
+    def _blank_chunk(self) -> array:
+        return array('i', self._blank)
+
+    def get_chunk(self, cx: int, cy: int) -> array:
+        """Return the packed cells of a chunk. Callers must not modify it."""
+        key = (cx, cy)
+        if self.pending:
+            self._page_in(key)
+        return self.chunks.get(key, self._blank)
+
+    def peek_chunk(self, cx: int, cy: int) -> array:
+        """Like :meth:`get_chunk`, but a pending chunk is read without paging it in."""
+        key = (cx, cy)
+        if key in self.pending:
+            return self.source.read_chunk(self.source_layer, cx, cy)
+        return self.chunks.get(key, self._blank)
+
+    def writable_chunk(self, cx: int, cy: int) -> array:
+        """Return the cells of a chunk for modification, allocating it if empty.
+
+        The chunk is journaled first; callers must mark what they change.
+        """
+        key = (cx, cy)
+        self._touch(key)
+        if self.pending:
+            self._page_in(key)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self._blank_chunk()
+        return chunk
+
+    def compact_chunk(self, cx: int, cy: int) -> None:
+        """Free the storage of a chunk that no longer holds any tiles."""
+        chunk = self.chunks.get((cx, cy))
+        if chunk is not None and chunk.count(EMPTY) == len(chunk):
+            del self.chunks[(cx, cy)]
+
+    def set_chunk(self, cx: int, cy: int, cells: array) -> None:
+        key = (cx, cy)
+        self._touch(key)
+        if key in self.pending:
+            self.pending.discard(key)
+            if not self.pending:
+                self.source = None
+        elif self.chunks.get(key, self._blank) == cells:
+            return
+        if cells.count(EMPTY) == len(cells):
+            self.chunks.pop(key, None)
+        else:
+            self.chunks[key] = array('i', cells)
+        self.mark_chunk(cx, cy)
+
+    def chunk_is_empty(self, cx: int, cy: int) -> bool:
+        chunk = self.get_chunk(cx, cy)
+        return chunk.count(EMPTY) == len(chunk)
+
+    def occupied(self) -> set[tuple[int, int]]:
+        """Keys of every chunk that may hold tiles, including ones not paged in yet."""
+        return self.chunks.keys() | self.pending
+
+    def occupied_in(self, cx0: int, cy0: int, cx1: int, cy1: int) -> list[tuple[int, int]]:
+        """Occupied chunk keys within ``[cx0, cx1) x [cy0, cy1)``, in row-major order.
+
+        Scans whichever is smaller, the range or the occupied chunks, so a
+        view over a huge empty area costs nothing.
+        """
+        cx0, cy0 = max(0, cx0), max(0, cy0)
+        cx1, cy1 = min(self.chunks_x, cx1), min(self.chunks_y, cy1)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return []
+        chunks, pending = self.chunks, self.pending
+        if (cx1 - cx0) * (cy1 - cy0) <= len(chunks) + len(pending):
+            return [(cx, cy) for cy in range(cy0, cy1) for cx in range(cx0, cx1)
+                    if (cx, cy) in chunks or (cx, cy) in pending]
+        keys = [(cx, cy) for cx, cy in self.occupied() if cx0 <= cx < cx1 and cy0 <= cy < cy1]
+        keys.sort(key=lambda key: (key[1], key[0]))
+        return keys
+
+    # ---- bulk operations ----
+    def clear(self) -> None:
+        """Erase every tile, marking only chunks that held something."""
+        for key in list(self.occupied()):
+            self.set_chunk(*key, self._blank)
+
+    def resize(self, width: int, height: int) -> None:
+        """Change the dimensions, keeping every tile that still fits on the map."""
+        self.load_all()
+        cs = self.chunk_size
+        chunks_x = (width + cs - 1) // cs
+        chunks_y = (height + cs - 1) // cs
+        for cx, cy in list(self.chunks):
+            if cx >= chunks_x or cy >= chunks_y:
+                self._touch((cx, cy))
+                del self.chunks[(cx, cy)]
+                continue
+            w = min(cs, width - cx * cs)
+            h = min(cs, height - cy * cs)
+            if w == h == cs:
+                continue
+            # clear the part of an edge chunk that now lies beyond the map
+            chunk = self.writable_chunk(cx, cy)
+            for ly in range(cs):
+                lx = w if ly < h else 0
+                chunk[ly * cs + lx:(ly + 1) * cs] = array('i', [EMPTY]) * (cs - lx)
+            self.compact_chunk(cx, cy)
+        self.width, self.height = width, height
+        self.chunks_x, self.chunks_y = chunks_x, chunks_y
+        self.invalidate()
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, tile_idx) -> None:
+        """Set every cell in ``[x0, x1) x [y0, y1)`` to ``tile_idx``."""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        cs = self.chunk_size
+        code = encode(tile_idx)
+        for cy in range(y0 // cs, (y1 - 1) // cs + 1):
+            for cx in range(x0 // cs, (x1 - 1) // cs + 1):
+                if code == EMPTY and (cx, cy) not in self.chunks and (cx, cy) not in self.pending:
+                    continue
+                chunk = self.get_chunk(cx, cy)
+                lx0 = max(x0, cx * cs) - cx * cs
+                lx1 = min(x1, (cx + 1) * cs) - cx * cs
+                run = array('i', [code]) * (lx1 - lx0)
+                changed = False
+                for ly in range(max(y0, cy * cs) - cy * cs, min(y1, (cy + 1) * cs) - cy * cs):
+                    start = ly * cs
+                    if chunk[start + lx0:start + lx1] != run:
+                        if not changed:
+                            chunk = self.writable_chunk(cx, cy)
+                        chunk[start + lx0:start + lx1] = run
+                        changed = True
+                if changed:
+                    if code == EMPTY:
+                        self.compact_chunk(cx, cy)
+                    self.mark_chunk(cx, cy)
+
+    def outline_rect(self, x0: int, y0: int, x1: int, y1: int, tile_idx) -> None:
+        """Set the one-cell border of ``[x0, x1) x [y0, y1)`` to ``tile_idx``."""
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.fill_rect(x0, y0, x1, y0 + 1, tile_idx)
+        self.fill_rect(x0, y1 - 1, x1, y1, tile_idx)
+        self.fill_rect(x0, y0 + 1, x0 + 1, y1 - 1, tile_idx)
+        self.fill_rect(x1 - 1, y0 + 1, x1, y1 - 1, tile_idx)
+
+    def row(self, y: int) -> array:
+        """A copy of the cells of row ``y``."""
+        cs = self.chunk_size
+        cy, start = y // cs, (y % cs) * cs
+        cells = array('i')
+        for cx in range(self.chunks_x):
+            cells.extend(self.get_chunk(cx, cy)[start:start + cs])
+        del cells[self.width:]
+        return cells
+
+    def _runs(self, y: int, code: int) -> list[tuple[int, int]]:
+        """Maximal ``[start, end)`` runs of ``code`` in row ``y``."""
+        runs = []
+        x = 0
+        for value, group in groupby(self.row(y)):
+            n = sum(1 for _ in group)
+            if value == code:
+                runs.append((x, x + n))
+            x += n
+        return runs
+
+    def _fill_row(self, y: int, x0: int, x1: int, code: int) -> None:
+        cs = self.chunk_size
+        cy, start = y // cs, (y % cs) * cs
+        for cx in range(x0 // cs, (x1 - 1) // cs + 1):
+            lx0 = max(x0, cx * cs) - cx * cs
+            lx1 = min(x1, (cx + 1) * cs) - cx * cs
+            self.writable_chunk(cx, cy)[start + lx0:start + lx1] = array('i', [code]) * (lx1 - lx0)
+            if code == EMPTY:
+                self.compact_chunk(cx, cy)
+            self.mark_chunk(cx, cy)
+
+    def flood_fill(self, x: int, y: int, tile_idx) -> int:
+        """Fill the 4-connected region of cells matching ``(x, y)`` with ``tile_idx``.
+
+        Works on whole runs of matching cells per row rather than cell by
+        cell. Returns the number of cells changed.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        chunk, i = self._locate(x, y)
+        target, code = chunk[i], encode(tile_idx)
+        if target == code:
+            return 0
+        runs: dict[int, list[tuple[int, int]]] = {}
+        starts: dict[int, list[int]] = {}
+
+        def row_runs(ry):
+            if ry not in runs:
+                runs[ry] = self._runs(ry, target)
+                starts[ry] = [r[0] for r in runs[ry]]
+            return runs[ry]
+
+        row_runs(y)
+        seed = runs[y][bisect_right(starts[y], x) - 1]
+        filled = {(y, seed)}
+        stack = [(y, seed)]
+        while stack:
+            ry, (s, e) = stack.pop()
+            for ny in (ry - 1, ry + 1):
+                if not 0 <= ny < self.height:
+                    continue
+                row = row_runs(ny)
+                # runs overlapping columns [s, e)
+                k = max(0, bisect_right(starts[ny], s) - 1)
+                while k < len(row) and row[k][0] < e:
+                    if row[k][1] > s and (ny, row[k]) not in filled:
+                        filled.add((ny, row[k]))
+                        stack.append((ny, row[k]))
+                    k += 1
+        total = 0
+        for ry, (s, e) in filled:
+            self._fill_row(ry, s, e, code)
+            total += e - s
+        return total
+
+    def replace(self, old, new) -> int:
+        """Replace every occurrence of tile ``old`` with ``new``.
+
+        Only occupied chunks are searched unless ``old`` is empty.
+        Returns the number of cells changed.
+        """
+        old_code, new_code = encode(old), encode(new)
+        if old_code == new_code:
+            return 0
+        cs = self.chunk_size
+        if old_code == EMPTY:
+            keys = [(cx, cy) for cy in range(self.chunks_y) for cx in range(self.chunks_x)]
+        else:
+            keys = list(self.occupied())
+        total = 0
+        for cx, cy in keys:
+            if old_code not in self.get_chunk(cx, cy):
+                continue
+            chunk = self.writable_chunk(cx, cy)
+            w = min(cs, self.width - cx * cs)
+            h = min(cs, self.height - cy * cs)
+            if w == h == cs and chunk.count(old_code) == cs * cs:
+                chunk[:] = array('i', [new_code]) * (cs * cs)
+                total += cs * cs
+            else:
+                # search row by row so padding beyond the map edge is left alone
+                for ly in range(h):
+                    i, stop = ly * cs, ly * cs + w
+                    while True:
+                        try:
+                            i = chunk.index(old_code, i, stop)
+                        except ValueError:
+                            break
+                        chunk[i] = new_code
+                        total += 1
+            if new_code == EMPTY:
+                self.compact_chunk(cx, cy)
+            self.mark_chunk(cx, cy)
+        return total
+
+    def count(self, tile_idx) -> int:
+        """Number of cells holding ``tile_idx``."""
+        self.load_all()
+        code = encode(tile_idx)
+        if code == EMPTY:
+            filled = sum(len(chunk) - chunk.count(EMPTY) for chunk in self.chunks.values())
+            return self.width * self.height - filled
+        return sum(chunk.count(code) for chunk in self.chunks.values())
+
+    def usage(self) -> Counter:
+        """Count of every non-empty ``(group, asset)`` on the layer."""
+        self.load_all()
+        counts = Counter()
+        for chunk in self.chunks.values():
+            counts.update(chunk)
+        counts.pop(EMPTY, None)
+        return Counter({decode(code): n for code, n in counts.items()})
+
+    def bounds(self):
+        """Return ``(x0, y0, x1, y1)`` (end exclusive) of painted cells, or ``None``."""
+        cs = self.chunk_size
+        x0 = y0 = None
+        x1 = y1 = 0
+        for cx, cy in self.occupied():
+            chunk = self.get_chunk(cx, cy)
+            if chunk.count(EMPTY) == len(chunk):
+                continue
+            rows = [ly for ly in range(cs) if chunk[ly * cs:(ly + 1) * cs].count(EMPTY) != cs]
+            cols = [lx for lx in range(cs) if chunk[lx::cs].count(EMPTY) != cs]
+            bx0, by0 = cx * cs + cols[0], cy * cs + rows[0]
+            x0 = bx0 if x0 is None else min(x0, bx0)
+            y0 = by0 if y0 is None else min(y0, by0)
+            x1 = max(x1, cx * cs + cols[-1] + 1)
+            y1 = max(y1, cy * cs + rows[-1] + 1)
+        if x0 is None:
+            return None
+        return x0, y0, x1, y1
+
+    def snapshot(self) -> 'Layer':
+        """An independent copy of the cells, e.g. to serialize on another thread."""
+        self.load_all()
+        snap = Layer(0, 0, self.chunk_size)
+        snap.width, snap.height = self.width, self.height
+        snap.chunks_x, snap.chunks_y = self.chunks_x, self.chunks_y
+        snap.chunks = {key: array('i', chunk) for key, chunk in self.chunks.items()}
+        return snap
+
+    # ---- change tracking ----
+    def invalidate(self) -> None:
+        """Mark the whole layer as changed."""
+        self.dirty.clear()
+        self.dirty_all = True
+        self.version += 1
+
+    def mark_chunk(self, cx: int, cy: int) -> None:
+        """Mark a whole chunk as changed."""
+        self.dirty[(cx, cy)] = None
+        self.version += 1
+
+    def take_dirty(self):
+        """Return and reset ``(dirty, dirty_all)``."""
+        dirty, dirty_all = self.dirty, self.dirty_all
+        self.dirty = {}
+        self.dirty_all = False
+        return dirty, dirty_all
+
+    def _mark(self, x: int, y: int) -> None:
+        self.version += 1
+        key = (x // self.chunk_size, y // self.chunk_size)
+        if key not in self.dirty:
+            self.dirty[key] = {(x, y)}
+        elif self.dirty[key] is not None:
+            self.dirty[key].add((x, y))
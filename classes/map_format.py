@@ -0,0 +1,255 @@
+"""Binary map files and JSON conversion.
+
+Layout (all little endian)::
+
+    header   magic b'RPGM', version, layer count, width, height,
+             chunk size, palette size
+    palette  one (group, asset) uint16 pair per entry
+    table    chunk count uint32, then (layer uint16, cx uint32, cy uint32,
+             offset uint64, length uint32) per stored chunk
+    chunks   chunk_size * chunk_size uint16 cells, row-major, where 0 is
+             empty and n refers to palette entry n - 1
+
+Only chunks holding tiles are listed, so file size follows the painted
+content rather than the map area. Version 1 files, whose table has an
+(offset, length) entry for every chunk of every layer with length 0 for
+empty ones, are still read.
+
+Chunks are stored uncompressed so :class:`MapFile` can read any one of them
+straight out of an mmap without touching the rest of the file.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .layer import Layer, EMPTY, encode
+
+MAGIC = b'RPGM'
+VERSION = 2
+BINARY_MAP_EXT = '.rpgmap'
+
+HEADER = struct.Struct('<4sHHIIHI')
+PALETTE_ENTRY = struct.Struct('<HH')
+TABLE_ENTRY = struct.Struct('<QI')  # version 1
+TABLE_COUNT = struct.Struct('<I')
+SPARSE_ENTRY = struct.Struct('<HIIQI')
+
+
+class MapFormatError(Exception):
+    """Raised when a binary map file is malformed or unsupported."""
+
+
+def _to_le(cells: array) -> bytes:
+    if sys.byteorder == 'big':
+        cells = array(cells.typecode, cells)
+        cells.byteswap()
+    return cells.tobytes()
+
+
+def write_binary_map(path: str, layers: list[Layer]) -> None:
+    """Write ``layers`` to ``path`` in the binary map format."""
+    with open(path, 'wb') as f:
+        write_binary_stream(f, layers)
+
+
+def write_binary_stream(f, layers: list[Layer]) -> None:
+    """Write ``layers`` in the binary map format to the binary file object ``f``."""
+    base = layers[0]
+    for layer in layers:
+        layer.load_all()
+    cs = base.chunk_size
+    if any((l.width, l.height, l.chunk_size) != (base.width, base.height, cs) for l in layers):
+        raise MapFormatError('all layers must share dimensions and chunk size')
+
+    palette: dict[int, int] = {EMPTY: 0}
+    chunks: list[tuple[int, int, int, bytes]] = []
+    for layer_idx, layer in enumerate(layers):
+        for cx, cy in layer.occupied_in(0, 0, layer.chunks_x, layer.chunks_y):
+            cells = layer.get_chunk(cx, cy)
+            if cells.count(EMPTY) == len(cells):
+                continue
+            for code in set(cells) - palette.keys():
+                palette[code] = len(palette)
+            chunks.append((layer_idx, cx, cy, _to_le(array('H', [palette[c] for c in cells]))))
+
+    entries = [code for code in palette if code != EMPTY]
+    offset = (HEADER.size + PALETTE_ENTRY.size * len(entries) + TABLE_COUNT.size
+              + SPARSE_ENTRY.size * len(chunks))
+    table = bytearray(TABLE_COUNT.pack(len(chunks)))
+    for layer_idx, cx, cy, data in chunks:
+        table += SPARSE_ENTRY.pack(layer_idx, cx, cy, offset, len(data))
+        offset += len(data)
+
+    f.write(HEADER.pack(MAGIC, VERSION, len(layers), base.width, base.height, cs, len(entries)))
+    for code in entries:
+        f.write(PALETTE_ENTRY.pack(code >> 16, code & 0xFFFF))
+    f.write(table)
+    for chunk in chunks:
+        f.write(chunk[3])
+
+
+class MapFile:
+    """Read-only, memory-mapped view of a binary map file.
+
+    Only the header, palette and chunk table are parsed on open; chunk cells
+    are decoded on demand by :meth:`read_chunk`. ``index`` maps
+    ``(layer, cx, cy)`` of every stored chunk to its ``(offset, length)``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:
+            self._file.close()
+            raise MapFormatError(f'{path}: empty file') from exc
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def from_buffer(cls, data: bytes, name: str = '<buffer>') -> 'MapFile':
+        """A map file held in memory, e.g. received over the network."""
+        self = cls.__new__(cls)
+        self.path = name
+        self._file = None
+        self._mm = data
+        self._parse()
+        return self
+
+    def _parse(self) -> None:
+        mm = self._mm
+        if len(mm) < HEADER.size:
+            raise MapFormatError(f'{self.path}: truncated header')
+        magic, version, self.layer_count, self.width, self.height, self.chunk_size, n_palette = \
+            HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise MapFormatError(f'{self.path}: not a map file')
+        if version not in (1, VERSION):
+            raise MapFormatError(f'{self.path}: unsupported version {version}')
+        pos = HEADER.size
+        self.palette = [EMPTY]
+        for _ in range(n_palette):
+            self.palette.append(encode(PALETTE_ENTRY.unpack_from(mm, pos)))
+            pos += PALETTE_ENTRY.size
+        cs = self.chunk_size
+        self.chunks_x = (self.width + cs - 1) // cs
+        self.chunks_y = (self.height + cs - 1) // cs
+        self.index: dict[tuple[int, int, int], tuple[int, int]] = {}
+        if version == 1:
+            end = pos + TABLE_ENTRY.size * self.layer_count * self.chunks_x * self.chunks_y
+            if end > len(mm):
+                raise MapFormatError(f'{self.path}: truncated chunk table')
+            per_layer = self.chunks_x * self.chunks_y
+            for idx, (offset, length) in enumerate(TABLE_ENTRY.iter_unpack(mm[pos:end])):
+                if length:
+                    layer_idx, rest = divmod(idx, per_layer)
+                    cy, cx = divmod(rest, self.chunks_x)
+                    self.index[(layer_idx, cx, cy)] = (offset, length)
+            return
+        if pos + TABLE_COUNT.size > len(mm):
+            raise MapFormatError(f'{self.path}: truncated chunk table')
+        count, = TABLE_COUNT.unpack_from(mm, pos)
+        pos += TABLE_COUNT.size
+        end = pos + SPARSE_ENTRY.size * count
+        if end > len(mm):
+            raise MapFormatError(f'{self.path}: truncated chunk table')
+        for layer_idx, cx, cy, offset, length in SPARSE_ENTRY.iter_unpack(mm[pos:end]):
+            self.index[(layer_idx, cx, cy)] = (offset, length)
+
+    def chunk_present(self, layer_idx: int, cx: int, cy: int) -> bool:
+        return (layer_idx, cx, cy) in self.index
+
+    def chunk_keys(self, layer_idx: int) -> list[tuple[int, int]]:
+        """``(cx, cy)`` of every chunk stored for layer ``layer_idx``."""
+        return [(cx, cy) for li, cx, cy in self.index if li == layer_idx]
+
+    def read_chunk(self, layer_idx: int, cx: int, cy: int) -> array:
+        """Return the packed ``Layer`` cells of one chunk."""
+        offset, length = self.index.get((layer_idx, cx, cy), (0, 0))
+        if length == 0:
+            return array('i', [EMPTY]) * (self.chunk_size * self.chunk_size)
+        cells = array('H')
+        cells.frombytes(self._mm[offset:offset + length])
+        if sys.byteorder == 'big':
+            cells.byteswap()
+        palette = self.palette
+        return array('i', [palette[c] for c in cells])
+
+    def load_layers(self) -> list[Layer]:
+        """Read every layer eagerly."""
+        layers = []
+        for i in range(self.layer_count):
+            layer = Layer(self.width, self.height, self.chunk_size)
+            layer.attach(self, i)
+            layer.load_all()
+            layers.append(layer)
+        return layers
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._mm.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---- JSON conversion ----
+def read_json_layers(path: str) -> list[Layer]:
+    with open(path, 'r') as f:
+        data = json.load(f)
+    layers = []
+    i = 1
+    while f'layer{i}' in data:
+        grid = data[f'layer{i}']
+        layer = Layer(len(grid), len(grid[0]) if grid else 0)
+        layer.load_grid(grid)
+        layers.append(layer)
+        i += 1
+    return layers
+
+
+def write_json_layers(path: str, layers: list[Layer]) -> None:
+    data = {f'layer{i+1}': layer.grid for i, layer in enumerate(layers)}
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def convert(src: str, dst: str) -> None:
+    """Convert a map between JSON and binary, choosing by file extension."""
+    if src.endswith(BINARY_MAP_EXT):
+        with MapFile(src) as map_file:
+            layers = map_file.load_layers()
+    else:
+        layers = read_json_layers(src)
+    if dst.endswith(BINARY_MAP_EXT):
+        write_binary_map(dst, layers)
+    else:
+        write_json_layers(dst, layers)
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert maps between JSON and the binary map format.')
+    parser.add_argument('paths', nargs='+', help='map files to convert, written next to the source')
+    args = parser.parse_args(argv)
+    for src in args.paths:
+        stem, ext = os.path.splitext(src)
+        dst = stem + ('.json' if ext == BINARY_MAP_EXT else BINARY_MAP_EXT)
+        convert(src, dst)
+        print(f'{src} -> {dst}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Thumbnail and metadata index of saved maps.
+
+:class:`MapIndex` describes the maps in a directory, dimensions, painted
+cells per layer, modification time and a small preview, so the load and
+save dialogs can show them without loading a map into the editor. Maps are
+read on a background thread; entries are cached on disk keyed by path and
+mtime, so a map is only read again after it changed.
+
+Previews hold cell codes rather than colours: the topmost non-empty code
+of evenly spaced sample cells. The dialog colours them on the Tk thread
+with the minimap's asset colours, which keeps the worker free of pygame.
+"""
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .autosave import write_json
+from .layer import EMPTY
+from .map_format import BINARY_MAP_EXT, MapFile, read_json_layers
+
+MAP_EXTS = ('.json', BINARY_MAP_EXT)
+PREVIEW_SIZE = 64
+
+
+def _preview(layers, size: int) -> dict:
+    base = layers[0]
+    scale = max(1, base.width, base.height) / size
+    w, h = max(1, round(base.width / scale)), max(1, round(base.height / scale))
+    cs = base.chunk_size
+    codes = []
+    for py in range(h):
+        y = min(base.height - 1, int((py + 0.5) * scale))
+        for px in range(w):
+            x = min(base.width - 1, int((px + 0.5) * scale))
+            code = EMPTY
+            for layer in reversed(layers):
+                code = layer.get_chunk(x // cs, y // cs)[(y % cs) * cs + x % cs]
+                if code != EMPTY:
+                    break
+            codes.append(code)
+    return {'width': w, 'height': h, 'codes': codes}
+
+
+def scan_map(path: str, preview_size: int = PREVIEW_SIZE) -> dict:
+    """Read ``path`` and describe it as an index entry."""
+    mtime = os.path.getmtime(path)
+    if path.endswith(BINARY_MAP_EXT):
+        with MapFile(path) as map_file:
+            layers = map_file.load_layers()
+    else:
+        layers = read_json_layers(path)
+    entry = {'mtime': mtime, 'width': 0, 'height': 0, 'filled': [], 'preview': None}
+    if layers:
+        base = layers[0]
+        entry.update(width=base.width, height=base.height,
+                     filled=[layer.width * layer.height - layer.count(-1) for layer in layers])
+        if base.width and base.height:
+            entry['preview'] = _preview(layers, preview_size)
+    return entry
+
+
+class MapIndex:
+    """Cached :func:`scan_map` entries for the maps in ``directory``.
+
+    :meth:`refresh` queues stale maps for the background worker and
+    :meth:`poll`, called from the UI thread, collects what it finished.
+    ``entries`` maps each map's path to its entry; a map that could not be
+    read gets an entry with an ``error``.
+    """
+
+    def __init__(self, directory: str, cache_path: str):
+        self.directory = directory
+        self.cache_path = cache_path
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='map-index')
+        self.futures: dict[str, Future] = {}
+        self.entries: dict[str, dict] = {}
+        try:
+            with open(cache_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def names(self) -> list[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(MAP_EXTS))
+
+    def refresh(self) -> list[str]:
+        """Queue every map that is new or changed since it was indexed; returns the map names."""
+        names = self.names()
+        paths = {os.path.join(self.directory, name) for name in names}
+        for path in paths:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            entry = self.entries.get(path)
+            if (entry is None or entry['mtime'] != mtime) and path not in self.futures:
+                self.futures[path] = self.pool.submit(self._scan, path, mtime)
+        for path in list(self.entries):
+            if path not in paths:
+                del self.entries[path]
+        return names
+
+    def entry(self, name: str) -> dict | None:
+        """The entry of map ``name`` in the directory, or ``None`` while it is being read."""
+        path = os.path.join(self.directory, name)
+        return None if path in self.futures else self.entries.get(path)
+
+    @staticmethod
+    def _scan(path: str, mtime: float) -> dict:
+        try:
+            return scan_map(path)
+        except Exception as exc:
+            # shown in the dialog in place of the map's details
+            return {'mtime': mtime, 'error': f'{type(exc).__name__}: {exc}'}
+
+    def poll(self) -> list[str]:
+        """Store finished scans and return the paths whose entries changed."""
+        done = [path for path, future in self.futures.items() if future.done()]
+        for path in done:
+            self.entries[path] = self.futures.pop(path).result()
+        if done:
+            # written on the worker, after any scans still queued
+            self.pool.submit(write_json, self.cache_path, dict(self.entries))
+        return done
+
+    def pending(self) -> bool:
+        return bool(self.futures)
+
+    def wait(self) -> None:
+        """Block until every queued scan and cache write finished."""
+        while self.futures:
+            next(iter(self.futures.values())).result()
+            self.poll()
+        self.pool.submit(lambda: None).result()
+
+    def close(self) -> None:
+        """Stop the worker without waiting for it; queued scans are dropped."""
+        self.pool.shutdown(wait=False, cancel_futures=True)
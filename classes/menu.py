@@ -1,9 +1,14 @@
 import os
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-from .layer import Layer
 from .brush import BrushItem
+from .map_format import BINARY_MAP_EXT
+from .map_index import PREVIEW_SIZE, MapIndex
+
+# how often open map dialogs check for finished index entries
+INDEX_POLL_MS = 100
 
 
 class FileMenu:
@@ -12,11 +17,17 @@ class FileMenu:
     def __init__(self, app, tk_root: tk.Tk):
         self.app = app
         self.tk_root = tk_root
+        self.map_index = MapIndex('maps', app.config.general.get('map_index_cache', '.cache/map_index.json'))
         self.menubar = tk.Menu(tk_root)
         self.file_menu = tk.Menu(self.menubar, tearoff=0)
         self.update_file_menu()
         self.menubar.add_cascade(label='File', menu=self.file_menu)
 
+        edit_menu = tk.Menu(self.menubar, tearoff=0)
+        edit_menu.add_command(label='Undo', accelerator='Ctrl+Z', command=app.undo)
+        edit_menu.add_command(label='Redo', accelerator='Ctrl+Y', command=app.redo)
+        self.menubar.add_cascade(label='Edit', menu=edit_menu)
+
         mode_menu = tk.Menu(self.menubar, tearoff=0)
         mode_menu.add_command(label='Layer 1', command=lambda: app.set_mode(1))
         mode_menu.add_command(label='Layer 2', command=lambda: app.set_mode(2))
@@ -24,11 +35,21 @@ class FileMenu:
         mode_menu.add_command(label='Play', command=lambda: app.set_mode(4))
         self.menubar.add_cascade(label='Mode', menu=mode_menu)
 
+        tools_menu = tk.Menu(self.menubar, tearoff=0)
+        tools_menu.add_command(label='Paint (B)', command=lambda: app.set_tool('paint'))
+        tools_menu.add_command(label='Flood Fill (G)', command=lambda: app.set_tool('fill'))
+        tools_menu.add_command(label='Rectangle (M)', command=lambda: app.set_tool('rect'))
+        tools_menu.add_command(label='Rectangle Outline (Shift+M)', command=lambda: app.set_tool('outline'))
+        tools_menu.add_separator()
+        tools_menu.add_command(label='Replace Tile...', command=self.open_replace_dialog)
+        self.menubar.add_cascade(label='Tools', menu=tools_menu)
+
         map_menu = tk.Menu(self.menubar, tearoff=0)
         map_menu.add_command(label='Preferences', command=self.open_preferences_dialog)
         map_menu.add_command(label='Save Map', command=self.open_save_map_dialog)
         map_menu.add_command(label='Load Map', command=self.open_load_map_dialog)
         map_menu.add_command(label='Clear Map', command=self.clear_map_prompt)
+        map_menu.add_command(label='Restore Autosave', command=self.restore_autosave_prompt)
         self.menubar.add_cascade(label='Map', menu=map_menu)
 
         session_menu = tk.Menu(self.menubar, tearoff=0)
@@ -70,22 +91,54 @@ class FileMenu:
         tk.Entry(dlg, textvariable=height_var).grid(row=3, column=1)
 
         def apply():
-            self.app.zoom = zoom_var.get()
+            self.app.set_zoom(zoom_var.get())
             self.app.pan_speed = pan_var.get()
             width = width_var.get()
             height = height_var.get()
             if width and height:
-                self.app.map_tiles_x = width // self.app.grid_size
-                self.app.map_tiles_y = height // self.app.grid_size
-                self.app.layers = [Layer(self.app.map_tiles_x, self.app.map_tiles_y) for _ in range(3)]
-                self.app.camera = [0, 0]
-                self.app.unsaved_map = False
+                self.app.resize_map(width // self.app.grid_size, height // self.app.grid_size)
             self.app.clamp_camera()
             dlg.destroy()
 
         tk.Button(dlg, text='OK', command=apply).grid(row=4, column=0, columnspan=2, pady=5)
         self.app.center_window(dlg)
 
+    def open_replace_dialog(self) -> None:
+        dlg = tk.Toplevel(self.tk_root)
+        dlg.title('Replace Tile')
+        dlg.grab_set()
+
+        tk.Label(dlg, text='Group').grid(row=0, column=1)
+        tk.Label(dlg, text='Asset').grid(row=0, column=2)
+        tk.Label(dlg, text='Replace:').grid(row=1, column=0, sticky='e')
+        old_group = tk.IntVar(value=self.app.selected_group)
+        old_asset = tk.IntVar(value=self.app.selected_asset)
+        tk.Entry(dlg, textvariable=old_group, width=6).grid(row=1, column=1)
+        tk.Entry(dlg, textvariable=old_asset, width=6).grid(row=1, column=2)
+
+        tk.Label(dlg, text='With:').grid(row=2, column=0, sticky='e')
+        new_group = tk.IntVar(value=self.app.selected_group)
+        new_asset = tk.IntVar(value=self.app.selected_asset)
+        tk.Entry(dlg, textvariable=new_group, width=6).grid(row=2, column=1)
+        tk.Entry(dlg, textvariable=new_asset, width=6).grid(row=2, column=2)
+
+        all_layers = tk.BooleanVar(value=False)
+        tk.Checkbutton(dlg, text='All layers', variable=all_layers).grid(row=3, column=0, columnspan=3)
+
+        def apply():
+            try:
+                old = (old_group.get(), old_asset.get())
+                new = (new_group.get(), new_asset.get())
+            except tk.TclError:
+                messagebox.showerror('Replace Tile', 'Group and asset must be whole numbers.', parent=dlg)
+                return
+            count = self.app.replace_tile(old, new, all_layers.get())
+            dlg.destroy()
+            messagebox.showinfo('Replace Tile', f'Replaced {count} cells.', parent=self.tk_root)
+
+        tk.Button(dlg, text='Replace', command=apply).grid(row=4, column=0, columnspan=3, pady=5)
+        self.app.center_window(dlg)
+
     def open_save_map_dialog(self) -> None:
         os.makedirs('maps', exist_ok=True)
         dlg = tk.Toplevel(self.tk_root)
@@ -97,20 +150,17 @@ class FileMenu:
         entry = tk.Entry(dlg, textvariable=name_var)
         entry.pack(fill=tk.X, padx=5)
 
-        listbox = tk.Listbox(dlg, height=10)
-        for fn in sorted(f for f in os.listdir('maps') if f.endswith('.json')):
-            listbox.insert(tk.END, fn)
-        listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        listbox = self._map_browser(dlg)
 
         def on_select(event=None):
             sel = listbox.curselection()
             if sel:
                 name_var.set(listbox.get(sel[0]))
-        listbox.bind('<<ListboxSelect>>', on_select)
+        listbox.bind('<<ListboxSelect>>', on_select, add='+')
 
         def save_action():
             fname = name_var.get()
-            if not fname.endswith('.json'):
+            if not fname.endswith(('.json', BINARY_MAP_EXT)):
                 fname += '.json'
             path = os.path.join('maps', fname)
             self.app.save_map(path)
@@ -125,10 +175,7 @@ class FileMenu:
         dlg.title('Load Map')
         dlg.grab_set()
 
-        listbox = tk.Listbox(dlg, height=10)
-        for fn in sorted(f for f in os.listdir('maps') if f.endswith('.json')):
-            listbox.insert(tk.END, fn)
-        listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        listbox = self._map_browser(dlg)
 
         def load_action():
             sel = listbox.curselection()
@@ -140,6 +187,69 @@ class FileMenu:
         tk.Button(dlg, text='Load', command=load_action).pack(pady=5)
         self.app.center_window(dlg)
 
+    def _map_browser(self, dlg: tk.Toplevel) -> tk.Listbox:
+        """Pack a list of the maps in ``maps/`` with a preview of the selected one.
+
+        Map details come from the background map index; the panel is updated
+        as entries arrive, polled with ``after`` so neither loop blocks.
+        """
+        frame = tk.Frame(dlg)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        listbox = tk.Listbox(frame, height=10)
+        for fn in self.map_index.refresh():
+            listbox.insert(tk.END, fn)
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        panel = tk.Frame(frame, width=2 * PREVIEW_SIZE + 10)
+        panel.pack(side=tk.LEFT, fill=tk.Y, padx=(5, 0))
+        preview = tk.Label(panel)
+        preview.pack()
+        info = tk.Label(panel, justify=tk.LEFT, anchor='w')
+        info.pack(fill=tk.X)
+
+        def show(event=None):
+            sel = listbox.curselection()
+            if not sel:
+                return
+            entry = self.map_index.entry(listbox.get(sel[0]))
+            image = None
+            if entry is None:
+                text = 'Reading map...'
+            elif 'error' in entry:
+                text = f"Unreadable:\n{entry['error']}"
+            else:
+                text = (f"{entry['width']} x {entry['height']} tiles\n"
+                        + '\n'.join(f'Layer {i + 1}: {n} tiles' for i, n in enumerate(entry['filled']))
+                        + '\nModified ' + time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['mtime'])))
+                if entry['preview']:
+                    image = self._preview_image(entry['preview'])
+            # keep a reference, or Tk drops the image
+            preview.image = image
+            preview.config(image=image or '')
+            info.config(text=text)
+
+        def poll():
+            if not dlg.winfo_exists():
+                return
+            if self.map_index.poll():
+                show()
+            if self.map_index.pending():
+                dlg.after(INDEX_POLL_MS, poll)
+
+        listbox.bind('<<ListboxSelect>>', show)
+        poll()
+        return listbox
+
+    def _preview_image(self, preview: dict) -> tk.PhotoImage:
+        colour = self.app.minimap.colour
+        w, h, codes = preview['width'], preview['height'], preview['codes']
+        rows = []
+        for y in range(h):
+            row = codes[y * w:(y + 1) * w]
+            rows.append('{' + ' '.join('#' + colour(code).hex() for code in row) + '}')
+        image = tk.PhotoImage(width=w, height=h)
+        image.put(' '.join(rows))
+        return image.zoom(2)
+
     def clear_map_prompt(self) -> None:
         if self.app.unsaved_map:
             if messagebox.askyesno('Clear Map?', 'Unsaved changes! Clear anyway?', parent=self.tk_root):
@@ -147,6 +257,13 @@ class FileMenu:
         else:
             self.app.clear_map()
 
+    def restore_autosave_prompt(self) -> None:
+        if self.app.autosaver.manifest() is None:
+            messagebox.showinfo('Restore Autosave', 'There is no autosave to restore.', parent=self.tk_root)
+        elif messagebox.askyesno('Restore Autosave?', 'Replace the current map and state with the last autosave?',
+                                 parent=self.tk_root):
+            self.app.restore_autosave()
+
     def open_save_state_dialog(self) -> None:
         path = filedialog.asksaveasfilename(
             defaultextension='.json', filetypes=[('JSON', '*.json')],
@@ -0,0 +1,213 @@
+import pygame
+from pygame import Rect
+
+from .layer import EMPTY, decode
+
+BACKGROUND = (50, 50, 50)
+MISSING = (255, 0, 255)
+# longest side of the base surface; larger maps show every step-th tile
+MAX_BASE = 1024
+
+
+class Minimap:
+    """Overview of the whole map drawn with one pixel per tile.
+
+    Each tile is shown in the average colour of its asset, taken from the
+    topmost non-empty layer. The ``base`` surface has one pixel per tile,
+    or on maps larger than ``MAX_BASE`` tiles one pixel per ``step`` by
+    ``step`` block, showing the block's top-left tile, so its memory stays
+    bounded however large the map. It is updated from the layers' dirty
+    chunks and cells, never regenerated as a whole unless the layers were
+    replaced or fully invalidated; the panel is ``base`` scaled down to
+    ``ui.minimap_size``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.visible = True
+        self.colours: dict[int, bytes] = {}
+        self.base: pygame.Surface | None = None
+        self.panel: pygame.Surface | None = None
+        # tiles per base pixel along each axis
+        self.step = 1
+        self.layers: list = []
+        self.versions: list[int] = []
+
+    def invalidate(self) -> None:
+        """Forget colours and pixels, e.g. after a config reload."""
+        self.colours = {}
+        self.base = None
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        # changes made while hidden were not tracked
+        self.base = None
+        self.app.invalidate()
+
+    # ---- colours ----
+    def colour(self, code: int) -> bytes:
+        """RGB bytes a cell ``code`` is shown in, e.g. also for map previews."""
+        colour = self.colours.get(code)
+        if colour is None:
+            if code == EMPTY:
+                rgb = BACKGROUND
+            else:
+                g_idx, a_idx = decode(code)
+                try:
+                    rgb = pygame.transform.average_color(self.app.config.tile_groups[g_idx].assets[a_idx])[:3]
+                except IndexError:
+                    rgb = MISSING
+            colour = self.colours[code] = bytes(rgb)
+        return colour
+
+    def _compose(self, cx: int, cy: int):
+        """Topmost non-empty cell codes of a chunk across layers, or ``None`` if all are empty."""
+        codes = None
+        for layer in reversed(self.app.layers):
+            cells = layer.peek_chunk(cx, cy)
+            if cells.count(EMPTY) == len(cells):
+                continue
+            if codes is None:
+                codes = cells
+            else:
+                codes = [c if c != EMPTY else below for c, below in zip(codes, cells)]
+            if EMPTY not in codes:
+                # fully covered; lower layers cannot show through
+                break
+        return codes
+
+    # ---- updating ----
+    def _base_size(self) -> tuple[int, int, int]:
+        """``(step, width, height)`` of the base surface for the current map."""
+        base = self.app.layers[0]
+        step = max(1, -(-max(base.width, base.height) // MAX_BASE))
+        return step, max(1, -(-base.width // step)), max(1, -(-base.height // step))
+
+    def _draw_chunk(self, cx: int, cy: int) -> None:
+        cs = self.app.layers[0].chunk_size
+        codes = self._compose(cx, cy)
+        if self.step > 1:
+            self._draw_sampled(cx, cy, cs, codes)
+            return
+        if codes is None:
+            self.base.fill(BACKGROUND, Rect(cx * cs, cy * cs, cs, cs))
+            return
+        if codes.count(codes[0]) == len(codes):
+            self.base.fill(self.colour(codes[0]), Rect(cx * cs, cy * cs, cs, cs))
+            return
+        for code in set(codes) - self.colours.keys():
+            self.colour(code)
+        colours = self.colours
+        data = b''.join([colours[c] for c in codes])
+        self.base.blit(pygame.image.frombuffer(data, (cs, cs), 'RGB'), (cx * cs, cy * cs))
+
+    def _draw_sampled(self, cx: int, cy: int, cs: int, codes) -> None:
+        step = self.step
+        # the sampled tiles inside this chunk
+        first_x = -(-cx * cs // step) * step
+        first_y = -(-cy * cs // step) * step
+        for y in range(first_y, (cy + 1) * cs, step):
+            for x in range(first_x, (cx + 1) * cs, step):
+                code = EMPTY if codes is None else codes[(y - cy * cs) * cs + x - cx * cs]
+                self.base.set_at((x // step, y // step), tuple(self.colour(code)))
+
+    def _draw_cell(self, x: int, y: int) -> None:
+        step = self.step
+        if x % step or y % step:
+            return
+        code = EMPTY
+        for layer in reversed(self.app.layers):
+            cs = layer.chunk_size
+            cells = layer.peek_chunk(x // cs, y // cs)
+            code = cells[(y % cs) * cs + x % cs]
+            if code != EMPTY:
+                break
+        self.base.set_at((x // step, y // step), tuple(self.colour(code)))
+
+    def _rebuild(self) -> None:
+        layers = self.app.layers
+        self.step, w, h = self._base_size()
+        self.base = pygame.Surface((w, h))
+        self.base.fill(BACKGROUND)
+        for cx, cy in set().union(*(layer.occupied() for layer in layers)):
+            self._draw_chunk(cx, cy)
+
+    def sync(self) -> bool:
+        """Apply layer changes since the last call; returns whether anything changed.
+
+        Reads the layers' pending dirty state without consuming it, so it must
+        run before the chunk cache takes it.
+        """
+        layers = self.app.layers
+        versions = [layer.version for layer in layers]
+        replaced = len(layers) != len(self.layers) or any(a is not b for a, b in zip(layers, self.layers))
+        if not replaced and versions == self.versions and self.base is not None:
+            return False
+        if (replaced or self.base is not None and self.base.get_size() != self._base_size()[1:]
+                or any(layer.dirty_all for layer in layers)):
+            self.base = None
+        if self.base is None:
+            self._rebuild()
+        else:
+            chunks = set()
+            cells = set()
+            for layer in layers:
+                for key, changed in layer.dirty.items():
+                    if changed is None:
+                        chunks.add(key)
+                    else:
+                        cells.update(changed)
+            for cx, cy in chunks:
+                self._draw_chunk(cx, cy)
+            cs = layers[0].chunk_size
+            for x, y in cells:
+                if (x // cs, y // cs) not in chunks:
+                    self._draw_cell(x, y)
+        self.layers = list(layers)
+        self.versions = versions
+        self.panel = None
+        return True
+
+    # ---- drawing and input ----
+    def scale(self) -> float:
+        layer = self.app.layers[0]
+        return self.app.config.ui.get('minimap_size', 160) / max(1, layer.width, layer.height)
+
+    def rect(self) -> Rect:
+        """Screen rect of the panel, above the bottom bar in the lower right corner."""
+        layer = self.app.layers[0]
+        s = self.scale()
+        w, h = max(1, int(layer.width * s)), max(1, int(layer.height * s))
+        sw, sh = self.app.screen.get_size()
+        return Rect(sw - w - 8, sh - self.app.config.ui['bottom_bar_height'] - h - 8, w, h)
+
+    def draw(self, surface: pygame.Surface) -> None:
+        if self.base is None:
+            self.sync()
+        rect = self.rect()
+        if self.panel is None or self.panel.get_size() != rect.size:
+            self.panel = pygame.transform.scale(self.base, rect.size)
+        surface.blit(self.panel, rect)
+        pygame.draw.rect(surface, (0, 0, 0), rect.inflate(2, 2), 1)
+        # the part of the map currently on screen
+        app = self.app
+        s = self.scale() / app.grid_size
+        sw, sh = app.screen.get_size()
+        view = Rect(rect.x + int(app.camera[0] * s), rect.y + int(app.camera[1] * s),
+                    max(2, int(sw / app.zoom * s)), max(2, int(sh / app.zoom * s)))
+        clip = surface.get_clip()
+        surface.set_clip(rect.clip(clip))
+        pygame.draw.rect(surface, pygame.Color(app.config.ui['highlight_color']), view, 1)
+        surface.set_clip(clip)
+
+    def hit(self, pos) -> bool:
+        return self.visible and self.app.show_ui and self.rect().collidepoint(pos)
+
+    def jump(self, pos) -> None:
+        """Centre the camera on the map point under ``pos`` in the panel."""
+        app = self.app
+        rect = self.rect()
+        s = self.scale() / app.grid_size
+        sw, sh = app.screen.get_size()
+        app.camera = [(pos[0] - rect.x) / s - sw / app.zoom / 2, (pos[1] - rect.y) / s - sh / app.zoom / 2]
+        app.clamp_camera()
@@ -0,0 +1,372 @@
+"""Shared play sessions over TCP.
+
+A :class:`SessionServer` runs inside the hosting editor and a
+:class:`SessionClient` inside each player's. A client joining gets one
+snapshot of the map and brush items; after that the server sends a single
+delta per frame with the tiles and brush items changed in it, so traffic
+follows what changes rather than the size of the map or state.
+
+Networking runs on an asyncio loop in a background thread. The editor's
+main loop calls ``sync()`` once per frame before drawing: the server reads
+the layers' pending dirty state (like the minimap) and the brush changes
+reported through :meth:`SessionServer.record_brush`, the client applies
+what arrived.
+
+Every message is a ``(type uint8, length uint32)`` header and a payload,
+little endian:
+
+snapshot
+    map size uint32, item count uint32, a binary map file (see
+    :mod:`classes.map_format`), then ``ITEM`` per brush item in stacking
+    order
+delta
+    cell count, chunk count, brush op count (uint32 each), then ``CELL`` per
+    cell, ``CHUNK_HEAD`` plus chunk_size² int32 codes per chunk, then the
+    brush ops: ``ITEM`` for add, ``MOVE``, ``REMOVE`` or a lone ``CLEAR``
+    byte, each led by its op byte
+"""
+import asyncio
+import io
+import queue
+import struct
+import sys
+import threading
+from array import array
+
+import pygame
+
+from .brush import BrushItem
+from .layer import decode
+from .map_format import MapFile, write_binary_stream
+
+DEFAULT_PORT = 5051
+# clients that fall this far behind are dropped; they can rejoin for a fresh snapshot
+MAX_BUFFER = 8 * 1024 * 1024
+
+# posted to wake an idle main loop when there is network work for sync()
+WAKE_EVENT = pygame.event.custom_type()
+
+MSG_SNAPSHOT = 1
+MSG_DELTA = 2
+OP_ADD, OP_MOVE, OP_REMOVE, OP_CLEAR = 1, 2, 3, 4
+
+HEADER = struct.Struct('<BI')
+SNAPSHOT_HEAD = struct.Struct('<II')
+DELTA_HEAD = struct.Struct('<III')
+CELL = struct.Struct('<BIIi')
+CHUNK_HEAD = struct.Struct('<BII')
+ITEM = struct.Struct('<BIHHffI')
+MOVE = struct.Struct('<BIff')
+REMOVE = struct.Struct('<BI')
+
+
+def _codes_le(cells: array) -> bytes:
+    if sys.byteorder == 'big':
+        cells = array('i', cells)
+        cells.byteswap()
+    return cells.tobytes()
+
+
+def _codes_from_le(data: bytes) -> array:
+    cells = array('i')
+    cells.frombytes(data)
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    return cells
+
+
+def _message(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def _wake() -> None:
+    try:
+        pygame.event.post(pygame.event.Event(WAKE_EVENT))
+    except pygame.error:
+        pass
+
+
+class _LoopThread:
+    """An asyncio event loop running in a daemon thread."""
+
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout: float | None = 10):
+        """Run ``coro`` on the loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call(self, fn, *args) -> None:
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+
+class SessionServer:
+    """Share the hosting ``app``'s map and brush items with connected clients.
+
+    Connections are accepted on the network thread but only join at the next
+    :meth:`sync`, which sends them a snapshot of the state as of that frame;
+    every later frame's changes follow as one delta broadcast to all.
+    """
+
+    def __init__(self, app, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        self.app = app
+        self.joining: queue.SimpleQueue = queue.SimpleQueue()
+        # only touched on the network thread
+        self.writers: set[asyncio.StreamWriter] = set()
+        self.ids: dict[BrushItem, int] = {}
+        self.next_id = 1
+        # encoded brush ops and moved items since the last sync
+        self.ops: list[bytes] = []
+        self.moved: set[BrushItem] = set()
+        self.layers: list = []
+        self.versions: list[int] = []
+        self.net = _LoopThread('netplay-server')
+        self.server = self.net.run(asyncio.start_server(self._accept, host, port))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    @property
+    def clients(self) -> int:
+        return len(self.writers)
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.joining.put(writer)
+        _wake()
+        try:
+            # clients only listen; wait for them to hang up
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    # ---- network thread ----
+    def _broadcast(self, data: bytes) -> None:
+        for writer in list(self.writers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_BUFFER:
+                self.writers.discard(writer)
+                writer.close()
+            else:
+                writer.write(data)
+
+    def _welcome(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        if not writer.is_closing():
+            writer.write(data)
+            self.writers.add(writer)
+
+    # ---- main thread ----
+    def record_brush(self, kind: str, item: BrushItem | None) -> None:
+        """Note a brush ``add``, ``remove``, ``move`` or ``clear`` (of every item) for the next delta."""
+        if kind == 'move':
+            self.moved.add(item)
+        elif kind == 'add':
+            self.ids[item] = self.next_id
+            self.next_id += 1
+            self.ops.append(self._item(item))
+        elif kind == 'remove':
+            if item in self.ids:
+                self.ops.append(REMOVE.pack(OP_REMOVE, self.ids.pop(item)))
+        else:
+            self.ids.clear()
+            self.ops.append(bytes([OP_CLEAR]))
+
+    def _item(self, item: BrushItem) -> bytes:
+        return ITEM.pack(OP_ADD, self.ids[item], item.group_idx, item.asset_idx, item.x, item.y, item.z)
+
+    def _snapshot(self) -> bytes:
+        buf = io.BytesIO()
+        write_binary_stream(buf, self.app.layers)
+        data = buf.getvalue()
+        items = self.app.brush_items
+        for item in items:
+            if item not in self.ids:
+                self.ids[item] = self.next_id
+                self.next_id += 1
+        return _message(MSG_SNAPSHOT, SNAPSHOT_HEAD.pack(len(data), len(items)) + data
+                        + b''.join(self._item(item) for item in items))
+
+    def _tile_changes(self):
+        """Encoded cells and chunks changed since the last sync, or ``None`` if the layers were replaced."""
+        layers = self.app.layers
+        versions = [layer.version for layer in layers]
+        if (len(layers) != len(self.layers) or any(a is not b for a, b in zip(layers, self.layers))
+                or any(layer.dirty_all for layer in layers)):
+            self.layers, self.versions = list(layers), versions
+            return None
+        cells, chunks = [], []
+        for i, layer in enumerate(layers):
+            if versions[i] == self.versions[i]:
+                continue
+            cs = layer.chunk_size
+            for (cx, cy), changed in layer.dirty.items():
+                codes = layer.get_chunk(cx, cy)
+                if changed is None:
+                    chunks.append(CHUNK_HEAD.pack(i, cx, cy) + _codes_le(codes))
+                else:
+                    cells.extend(CELL.pack(i, x, y, codes[(y % cs) * cs + x % cs]) for x, y in changed)
+        self.versions = versions
+        return cells, chunks
+
+    def _brush_ops(self) -> list[bytes]:
+        # however often an item moved this frame, only where it ended up is sent
+        ops = self.ops + [MOVE.pack(OP_MOVE, self.ids[item], item.x, item.y)
+                          for item in self.moved if item in self.ids]
+        self.ops = []
+        self.moved = set()
+        return ops
+
+    def sync(self) -> None:
+        """Send this frame's changes to the clients and snapshots to new ones."""
+        tiles = self._tile_changes()
+        if tiles is None:
+            # a new or resized map goes out whole, brush items with it
+            self.ops = []
+            self.moved = set()
+            self.net.call(self._broadcast, self._snapshot())
+        else:
+            cells, chunks = tiles
+            ops = self._brush_ops()
+            if cells or chunks or ops:
+                payload = b''.join([DELTA_HEAD.pack(len(cells), len(chunks), len(ops))] + cells + chunks + ops)
+                self.net.call(self._broadcast, _message(MSG_DELTA, payload))
+        snapshot = None
+        while not self.joining.empty():
+            if snapshot is None:
+                snapshot = self._snapshot()
+            self.net.call(self._welcome, self.joining.get(), snapshot)
+
+    def close(self) -> None:
+        async def shutdown():
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            self.writers.clear()
+        self.net.run(shutdown())
+        self.net.stop()
+
+
+class SessionClient:
+    """Follow a :class:`SessionServer`, mirroring its map and brush items in ``app``.
+
+    Messages are read on the network thread and applied by :meth:`sync` on
+    the main thread. Edits made locally are not sent back, and host moves
+    or removals of brush items removed locally are skipped.
+    """
+
+    def __init__(self, app, host: str, port: int = DEFAULT_PORT):
+        self.app = app
+        self.inbox: queue.SimpleQueue = queue.SimpleQueue()
+        self.items: dict[int, BrushItem] = {}
+        self.connected = True
+        self.snapshots = 0
+        self.net = _LoopThread('netplay-client')
+        self.reader, self.writer = self.net.run(asyncio.open_connection(host, port))
+        self.task = asyncio.run_coroutine_threadsafe(self._receive(), self.net.loop)
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                kind, length = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                self._deliver(kind, await self.reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._deliver(None, b'')
+
+    def _deliver(self, kind: int | None, payload: bytes) -> None:
+        wake = self.inbox.empty()
+        self.inbox.put((kind, payload))
+        if wake:
+            _wake()
+
+    def record_brush(self, kind: str, item: BrushItem | None) -> None:
+        pass
+
+    def sync(self) -> None:
+        """Apply every message received since the last call."""
+        while not self.inbox.empty():
+            kind, payload = self.inbox.get()
+            if kind == MSG_SNAPSHOT:
+                self._apply_snapshot(payload)
+            elif kind == MSG_DELTA:
+                with self.app.history.paused():
+                    self._apply_delta(payload)
+            elif kind is None:
+                self.connected = False
+
+    def _read_item(self, payload: bytes, pos: int) -> BrushItem:
+        _, item_id, group, asset, x, y, z = ITEM.unpack_from(payload, pos)
+        item = self.items[item_id] = BrushItem(group, asset, x, y, z)
+        return item
+
+    def _apply_snapshot(self, payload: bytes) -> None:
+        app = self.app
+        size, count = SNAPSHOT_HEAD.unpack_from(payload, 0)
+        pos = SNAPSHOT_HEAD.size
+        with MapFile.from_buffer(payload[pos:pos + size], 'session snapshot') as map_file:
+            layers = map_file.load_layers()
+        pos += size
+        self.items = {}
+        items = [self._read_item(payload, pos + i * ITEM.size) for i in range(count)]
+        zs = [item.z for item in items]
+        app.replace_layers(layers)
+        app.set_brush_items(items)
+        # keep the host's stacking order keys, so later adds slot in correctly
+        for item, z in zip(items, zs):
+            item.z = z
+        app.next_z = max(zs, default=-1) + 1
+        self.snapshots += 1
+
+    def _apply_delta(self, payload: bytes) -> None:
+        app = self.app
+        n_cells, n_chunks, n_ops = DELTA_HEAD.unpack_from(payload, 0)
+        pos = DELTA_HEAD.size
+        layers = app.layers
+        for _ in range(n_cells):
+            i, x, y, code = CELL.unpack_from(payload, pos)
+            pos += CELL.size
+            layers[i].paint(x, y, decode(code))
+        for _ in range(n_chunks):
+            i, cx, cy = CHUNK_HEAD.unpack_from(payload, pos)
+            pos += CHUNK_HEAD.size
+            layer = layers[i]
+            n = layer.chunk_size * layer.chunk_size * 4
+            layer.set_chunk(cx, cy, _codes_from_le(payload[pos:pos + n]))
+            pos += n
+        for _ in range(n_ops):
+            op = payload[pos]
+            if op == OP_ADD:
+                app.restore_brush_item(self._read_item(payload, pos))
+                pos += ITEM.size
+            elif op == OP_MOVE:
+                _, item_id, x, y = MOVE.unpack_from(payload, pos)
+                item = self.items.get(item_id)
+                # items removed in this editor stay removed
+                if item is not None and item in app.brush_index:
+                    app.move_brush_item(item, x, y)
+                pos += MOVE.size
+            elif op == OP_REMOVE:
+                _, item_id = REMOVE.unpack_from(payload, pos)
+                item = self.items.pop(item_id, None)
+                if item is not None and item in app.brush_index:
+                    app.remove_brush_item(item)
+                pos += REMOVE.size
+            else:
+                app.set_brush_items([])
+                self.items = {}
+                pos += 1
+
+    def close(self) -> None:
+        async def shutdown():
+            self.writer.close()
+        self.net.run(shutdown())
+        self.task.cancel()
+        self.net.stop()
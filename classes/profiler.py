@@ -0,0 +1,171 @@
+"""Per-frame timing of the main loop's phases, with an on-screen HUD.
+
+:class:`FrameProfiler` times named phases of each frame (Tk update, event
+handling, tile/brush/UI drawing, display update) and counts work done in
+them (tiles blitted, asset scale calls, events). A rolling window feeds the
+HUD; every frame can also be streamed to a JSONL or CSV file for offline
+analysis.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pygame
+
+PHASES = ['tk', 'events', 'net', 'tiles', 'brushes', 'ui', 'display', 'autosave', 'sleep']
+COUNTERS = ['tiles_blitted', 'chunks_blitted', 'chunks_rendered', 'brushes_blitted', 'scale_calls', 'events']
+HUD_REFRESH = 0.25
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+class FrameProfiler:
+    """Collect phase timings and counters for each frame of the main loop.
+
+    Call :meth:`begin_frame` and :meth:`end_frame` around a frame, wrap its
+    phases in :meth:`phase`, and report work with :meth:`count`. Phases may
+    run several times per frame (e.g. once per damaged rect); their times add
+    up. ``sleep`` is excluded from the frame time so frame times measure work,
+    not the frame cap.
+    """
+
+    def __init__(self, window: int = 240):
+        self.samples: deque = deque(maxlen=window)
+        self.show_hud = False
+        self.frame = 0
+        self.start = time.perf_counter()
+        self.frame_start = None
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.log_path: str | None = None
+        self._log = None
+        self._csv = None
+        self._hud = None
+        self._hud_time = 0.0
+
+    # ---- collection ----
+    def begin_frame(self) -> None:
+        self.frame_start = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_frame(self) -> dict | None:
+        """Record the current frame and return its sample."""
+        if self.frame_start is None:
+            return None
+        now = time.perf_counter()
+        total = now - self.frame_start - self.phases.get('sleep', 0.0)
+        sample = {'frame': self.frame, 'time': round(now - self.start, 6), 'frame_ms': total * 1000}
+        for name, seconds in self.phases.items():
+            sample[f'{name}_ms'] = seconds * 1000
+        sample.update(self.counters)
+        self.samples.append(sample)
+        self.frame += 1
+        self.frame_start = None
+        if self._log is not None:
+            self._write(sample)
+        return sample
+
+    def stats(self) -> dict:
+        """Rolling averages and frame-time percentiles over the window."""
+        if not self.samples:
+            return {}
+        frames = [s['frame_ms'] for s in self.samples]
+        n = len(self.samples)
+        result = {
+            'frames': n,
+            'frame_avg_ms': sum(frames) / n,
+            'frame_p95_ms': percentile(frames, 0.95),
+            'frame_p99_ms': percentile(frames, 0.99),
+            'frame_max_ms': max(frames),
+        }
+        span = self.samples[-1]['time'] - self.samples[0]['time']
+        result['fps'] = (n - 1) / span if n > 1 and span > 0 else 0.0
+        for name in PHASES:
+            result[f'{name}_avg_ms'] = sum(s.get(f'{name}_ms', 0.0) for s in self.samples) / n
+        for name in COUNTERS:
+            result[f'{name}_avg'] = sum(s.get(name, 0) for s in self.samples) / n
+        return result
+
+    # ---- export ----
+    def start_log(self, path: str) -> None:
+        """Stream every following frame to ``path``; ``.csv`` selects CSV, anything else JSONL."""
+        self.stop_log()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._log = open(path, 'w', newline='')
+        self.log_path = path
+        if path.endswith('.csv'):
+            fields = ['frame', 'time', 'frame_ms'] + [f'{p}_ms' for p in PHASES] + COUNTERS
+            self._csv = csv.DictWriter(self._log, fields, restval=0, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def _write(self, sample: dict) -> None:
+        if self._csv is not None:
+            self._csv.writerow(sample)
+        else:
+            self._log.write(json.dumps(sample) + '\n')
+
+    def stop_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+        self._log = None
+        self._csv = None
+        self.log_path = None
+
+    # ---- HUD ----
+    def hud_lines(self) -> list[str]:
+        s = self.stats()
+        if not s:
+            return ['profiling...']
+        lines = [
+            f"frame {s['frame_avg_ms']:.2f} ms  p95 {s['frame_p95_ms']:.2f}  p99 {s['frame_p99_ms']:.2f}",
+            f"max {s['frame_max_ms']:.2f} ms  {s['fps']:.0f} fps",
+        ]
+        lines += [f"{name:<8}{s[f'{name}_avg_ms']:7.2f} ms" for name in PHASES]
+        lines.append(f"tiles {s['tiles_blitted_avg']:.0f}  chunks {s['chunks_blitted_avg']:.0f}"
+                     f"/{s['chunks_rendered_avg']:.1f}")
+        lines.append(f"brushes {s['brushes_blitted_avg']:.0f}  scales {s['scale_calls_avg']:.1f}"
+                     f"  events {s['events_avg']:.1f}")
+        if self.log_path:
+            lines.append(f'logging to {self.log_path}')
+        return lines
+
+    def hud_surface(self, font: pygame.font.Font) -> tuple[pygame.Surface, bool]:
+        """Return the HUD surface and whether it was re-rendered since the last call.
+
+        The text is refreshed a few times a second so an idle editor stays idle.
+        """
+        now = time.perf_counter()
+        if self._hud is not None and now - self._hud_time < HUD_REFRESH:
+            return self._hud, False
+        rendered = [font.render(line, True, (255, 255, 255)) for line in self.hud_lines()]
+        width = max(r.get_width() for r in rendered) + 8
+        height = sum(r.get_height() for r in rendered) + 8
+        surf = pygame.Surface((width, height))
+        surf.fill((0, 0, 0))
+        y = 4
+        for r in rendered:
+            surf.blit(r, (4, y))
+            y += r.get_height()
+        self._hud = surf
+        self._hud_time = now
+        return surf, True
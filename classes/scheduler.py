@@ -0,0 +1,96 @@
+"""Frame pacing for the combined Tk/pygame main loop.
+
+:class:`FrameScheduler` runs frames at ``target_fps`` while the user is
+interacting and for a short while afterwards, then drops to ``idle_fps``.
+An idle loop blocks in ``pygame.event.wait`` so the next input wakes it at
+once instead of at the next idle tick; with ``idle_fps`` 0 it only wakes for
+input, Tk activity and periodic housekeeping. Tk is serviced at its own
+``tk_hz`` rather than once per frame, so its menus neither stall rendering
+nor keep an idle editor spinning: while idle it is polled inside the wait,
+and a frame only runs if the poll reports work.
+"""
+import time
+
+import pygame
+
+# how long the loop keeps the interactive rate after the last activity
+LINGER = 0.5
+# longest idle wait, so autosave and other polling still run
+MAX_IDLE_WAIT = 1.0
+
+
+class FrameScheduler:
+    """Decide when the next frame runs and when Tk is serviced.
+
+    Call :meth:`tk_due` before servicing Tk and :meth:`wait` at the end of
+    every frame. :meth:`wait` returns the event that woke an idle loop, if
+    any, which must be handled before the rest of the queue.
+    """
+
+    def __init__(self, target_fps: float = 60, idle_fps: float = 4, tk_hz: float = 30):
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.tk_hz = tk_hz
+        self.active_until = 0.0
+        self.last_frame = time.perf_counter()
+        self.last_tk = float('-inf')
+
+    def tk_due(self) -> bool:
+        """Whether Tk should be serviced this frame; records the service if so."""
+        now = time.perf_counter()
+        if self.tk_hz > 0 and now - self.last_tk < 1 / self.tk_hz:
+            return False
+        self.last_tk = now
+        return True
+
+    def _idle_timeout(self, now: float, wake_within: float | None) -> float:
+        timeout = MAX_IDLE_WAIT
+        if self.idle_fps > 0:
+            timeout = min(timeout, self.last_frame + 1 / self.idle_fps - now)
+        if wake_within is not None:
+            timeout = min(timeout, wake_within)
+        return timeout
+
+    def _idle_wait(self, timeout: float, poll_tk) -> pygame.event.Event | None:
+        """Wait up to ``timeout`` for input, servicing Tk through ``poll_tk`` meanwhile."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            now = time.perf_counter()
+            wait = deadline - now
+            if poll_tk is not None and self.tk_hz > 0:
+                # Tk events do not reach the pygame queue, so wake up to poll it
+                wait = min(wait, self.last_tk + 1 / self.tk_hz - now)
+            if wait > 0:
+                event = pygame.event.wait(max(1, int(wait * 1000)))
+                if event.type != pygame.NOEVENT:
+                    return event
+            if time.perf_counter() >= deadline:
+                return None
+            if poll_tk is not None and self.tk_due() and poll_tk():
+                return None
+
+    def wait(self, active: bool, wake_within: float | None = None, poll_tk=None) -> pygame.event.Event | None:
+        """Sleep until the next frame is due.
+
+        ``active`` says whether this frame handled input or drew anything;
+        ``wake_within`` caps an idle wait, e.g. for an on-screen clock.
+        ``poll_tk`` services Tk during an idle wait and returns whether that
+        left work for a frame.
+        """
+        now = time.perf_counter()
+        if active:
+            self.active_until = now + LINGER
+        event = None
+        if now < self.active_until:
+            delay = self.last_frame + 1 / self.target_fps - now if self.target_fps > 0 else 0
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            timeout = self._idle_timeout(now, wake_within)
+            if timeout > 0:
+                event = self._idle_wait(timeout, poll_tk)
+                if event is not None:
+                    # input is interaction; render the response at full rate
+                    self.active_until = time.perf_counter() + LINGER
+        self.last_frame = time.perf_counter()
+        return event
@@ -0,0 +1,84 @@
+class SpatialGrid:
+    """Uniform grid bucketing items by their world-space rectangles.
+
+    Every item must expose a ``z`` attribute; queries return items in
+    ascending ``z`` so callers can draw bottom to top or pick the topmost.
+    """
+
+    def __init__(self, cell_size: int):
+        self.cell_size = cell_size
+        self.buckets: dict[tuple[int, int], set] = {}
+        self.rects: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, item) -> bool:
+        return item in self.rects
+
+    def _cells(self, rect):
+        x, y, w, h = rect
+        cs = self.cell_size
+        # zero-sized rects still occupy the cell they sit in
+        x1 = x + w if w > 0 else x + 1e-9
+        y1 = y + h if h > 0 else y + 1e-9
+        for bx in range(int(x // cs), int(-(-x1 // cs))):
+            for by in range(int(y // cs), int(-(-y1 // cs))):
+                yield bx, by
+
+    def insert(self, item, rect) -> None:
+        """Add ``item`` covering ``rect`` given as ``(x, y, w, h)``."""
+        self.rects[item] = rect
+        for cell in self._cells(rect):
+            self.buckets.setdefault(cell, set()).add(item)
+
+    def remove(self, item) -> None:
+        rect = self.rects.pop(item, None)
+        if rect is None:
+            return
+        for cell in self._cells(rect):
+            bucket = self.buckets.get(cell)
+            if bucket is not None:
+                bucket.discard(item)
+                if not bucket:
+                    del self.buckets[cell]
+
+    def move(self, item, rect) -> None:
+        self.remove(item)
+        self.insert(item, rect)
+
+    def clear(self) -> None:
+        self.buckets.clear()
+        self.rects.clear()
+
+    def query_point(self, x: float, y: float):
+        """Return the topmost item whose rect contains ``(x, y)``, or ``None``."""
+        cs = self.cell_size
+        best = None
+        for item in self.buckets.get((int(x // cs), int(y // cs)), ()):
+            rx, ry, rw, rh = self.rects[item]
+            if rx <= x < rx + rw and ry <= y < ry + rh and (best is None or item.z > best.z):
+                best = item
+        return best
+
+    def query_rect(self, rect) -> list:
+        """Return items intersecting ``rect`` sorted by ``z``."""
+        x, y, w, h = rect
+        cs = self.cell_size
+        found = set()
+        if (w / cs + 1) * (h / cs + 1) > len(self.buckets):
+            # fewer occupied buckets than cells covered: scan the buckets instead
+            for bucket in self.buckets.values():
+                found.update(bucket)
+        else:
+            for cell in self._cells(rect):
+                bucket = self.buckets.get(cell)
+                if bucket:
+                    found.update(bucket)
+        hits = []
+        for item in found:
+            rx, ry, rw, rh = self.rects[item]
+            if rx < x + w and x < rx + rw and ry < y + h and y < ry + rh:
+                hits.append(item)
+        hits.sort(key=lambda item: item.z)
+        return hits
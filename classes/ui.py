@@ -3,46 +3,92 @@ from pygame import Rect
 
 
 class AssetUI:
-    """Handles drawing of the left asset strip and bottom group bar."""
+    """Handles drawing of the left asset strip and bottom group bar.
+
+    Both are composited into cached surfaces that are rebuilt only when the
+    selection, scroll, mode or config changes; every other frame just blits
+    them. Thumbnails come from the app's scaled asset cache and hotkey labels
+    are rendered once.
+    """
 
     def __init__(self, app):
         self.app = app
+        self.key = None
+        self.bar: pygame.Surface | None = None
+        self.strip: pygame.Surface | None = None
+        self.icons: dict = {}
+        self.labels: dict[str, pygame.Surface] = {}
 
-    def draw(self, surface: pygame.Surface) -> None:
-        ui = self.app.config.ui
-        bottom_rect = Rect((surface.get_width() - ui['bottom_bar_width']) // 2,
-                           surface.get_height() - ui['bottom_bar_height'],
-                           ui['bottom_bar_width'], ui['bottom_bar_height'])
-        pygame.draw.rect(surface, (30, 30, 30), bottom_rect)
-        groups = self.app.get_active_groups()
+    def invalidate(self) -> None:
+        """Drop every cached surface, e.g. after a config reload replaced assets."""
+        self.key = None
+        self.icons.clear()
+
+    def _state(self):
+        app = self.app
+        return (app.selected_group, app.selected_asset, app.asset_scroll, app.mode, app.config,
+                app.menu_bar_height)
+
+    def _label(self, text: str) -> pygame.Surface:
+        surf = self.labels.get(text)
+        if surf is None:
+            surf = self.labels[text] = self.app.font.render(text, True, (255, 255, 255))
+        return surf
+
+    def _icon(self, group, size: int) -> pygame.Surface:
+        key = (group, size)
+        icon = self.icons.get(key)
+        if icon is None or icon[0] is not group.icon:
+            self.app.profiler.count('scale_calls')
+            icon = self.icons[key] = (group.icon, pygame.transform.scale(group.icon, (size, size)))
+        return icon[1]
+
+    def _build_bar(self, ui, groups) -> pygame.Surface:
+        bar = pygame.Surface((ui['bottom_bar_width'], ui['bottom_bar_height']))
+        bar.fill((30, 30, 30))
         slot_w = ui['bottom_bar_width'] // 10
         for i, g in enumerate(groups[:10]):
-            icon = pygame.transform.scale(g.icon, (ui['tile_preview_size'], ui['tile_preview_size']))
-            x = bottom_rect.x + i * slot_w
-            y = bottom_rect.y
-            surface.blit(icon, (x, y))
+            x = i * slot_w
+            bar.blit(self._icon(g, ui['tile_preview_size']), (x, 0))
             # draw the numeric hotkey for this group
-            num_surf = self.app.font.render(str(g.key), True, (255, 255, 255))
-            surface.blit(num_surf, (x + 2, y + 2))
+            bar.blit(self._label(str(g.key)), (x + 2, 2))
             if i == self.app.selected_group:
-                pygame.draw.rect(surface, pygame.Color(ui['highlight_color']),
-                                 Rect(x, y, slot_w, ui['bottom_bar_height']), 2)
+                pygame.draw.rect(bar, pygame.Color(ui['highlight_color']),
+                                 Rect(x, 0, slot_w, ui['bottom_bar_height']), 2)
+        return bar
 
-        strip_rect = Rect(0, self.app.menu_bar_height,
-                          ui['left_strip_width'], ui['left_strip_visible_rows'] * ui['tile_preview_size'])
-        pygame.draw.rect(surface, (30, 30, 30), strip_rect)
-        assets = groups[self.app.selected_group].assets
-        for idx in range(ui['left_strip_visible_rows']):
+    def _build_strip(self, ui, groups) -> pygame.Surface:
+        size = ui['tile_preview_size']
+        rows = ui['left_strip_visible_rows']
+        strip = pygame.Surface((ui['left_strip_width'], rows * size))
+        strip.fill((30, 30, 30))
+        if not groups:
+            return strip
+        group = groups[self.app.selected_group]
+        assets = group.assets
+        # decode the selection's neighbours before the user scrolls to them
+        assets.prefetch(range(self.app.selected_asset - rows, self.app.selected_asset + rows + 1))
+        for idx in range(rows):
             asset_idx = idx + self.app.asset_scroll
             if asset_idx >= len(assets):
                 break
-            img = pygame.transform.scale(assets[asset_idx],
-                                         (ui['tile_preview_size'], ui['tile_preview_size']))
-            surface.blit(img, (0, self.app.menu_bar_height + idx * ui['tile_preview_size']))
+            strip.blit(self.app.scaled_assets.get(group, asset_idx, 1, (size, size)), (0, idx * size))
             if asset_idx == self.app.selected_asset:
-                pygame.draw.rect(surface, pygame.Color(ui['highlight_color']),
-                                 Rect(0, self.app.menu_bar_height + idx * ui['tile_preview_size'],
-                                      ui['left_strip_width'], ui['tile_preview_size']), 2)
+                pygame.draw.rect(strip, pygame.Color(ui['highlight_color']),
+                                 Rect(0, idx * size, ui['left_strip_width'], size), 2)
+        return strip
+
+    def draw(self, surface: pygame.Surface) -> None:
+        ui = self.app.config.ui
+        state = self._state()
+        if state != self.key:
+            groups = self.app.get_active_groups()
+            self.bar = self._build_bar(ui, groups)
+            self.strip = self._build_strip(ui, groups)
+            self.key = state
+        surface.blit(self.bar, ((surface.get_width() - ui['bottom_bar_width']) // 2,
+                                surface.get_height() - ui['bottom_bar_height']))
+        surface.blit(self.strip, (0, self.app.menu_bar_height))
 
     def cycle_selected_asset(self, delta: int) -> None:
         groups = self.app.get_active_groups()
@@ -1,42 +1,83 @@
 import os
 import json
+import argparse
+import math
+import time
 import pygame
 from pygame import Rect
 import tkinter as tk
-
-from classes.config_loader import Config, load_image, Group
-from classes.layer import Layer
-from classes.brush import BrushItem
+from tkinter import messagebox
+from bisect import insort
+from collections import Counter
+
+from classes.config_loader import CONFIG_PATH, Config, load_image, Group, ScaledAssetCache
+from classes.layer import Layer, line_cells
+from classes.chunk_cache import ChunkCache
+from classes.map_format import MapFile, BINARY_MAP_EXT
+from classes.brush import BrushItem, brush_columns, read_brush_items
+from classes.spatial_index import SpatialGrid
+from classes.profiler import HUD_REFRESH, FrameProfiler
+from classes.scheduler import FrameScheduler
+from classes.history import History
+from classes.autosave import AutoSaver, write_json, write_map
 from classes.menu import FileMenu
 from classes.ui import AssetUI
+from classes.minimap import Minimap
 from classes.input_handler import InputHandler
+from classes.netplay import DEFAULT_PORT, SessionClient, SessionServer
+
+
+# tile tools available in layer modes
+TOOLS = ('paint', 'fill', 'rect', 'outline')
 
 
 def main():
+    parser = argparse.ArgumentParser(description='RPG Map Tool')
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument('--serve', nargs='?', type=int, const=DEFAULT_PORT, metavar='PORT',
+                         help=f'host a shared session (port {DEFAULT_PORT} by default)')
+    session.add_argument('--join', metavar='HOST[:PORT]', help='follow a session hosted elsewhere')
+    args = parser.parse_args()
     tool = MapTool()
+    if args.serve is not None:
+        tool.host_session(args.serve, '0.0.0.0')
+    elif args.join:
+        host, _, port = args.join.partition(':')
+        tool.join_session(host, int(port) if port else DEFAULT_PORT)
     tool.run()
 
 
 class MapTool:
-    def __init__(self):
-        self.tk_root = tk.Tk()
-        self.tk_root.title('RPG Map Tool')
-        self.tk_root.protocol('WM_DELETE_WINDOW', self.exit_program)
-        self.embed = tk.Frame(self.tk_root, width=800, height=600)
-        self.embed.pack(fill=tk.BOTH, expand=True)
-        self.tk_root.geometry('800x600')
-        self.tk_root.update()
-        os.environ['SDL_WINDOWID'] = str(self.embed.winfo_id())
+    def __init__(self, headless: bool = False, config_path: str = CONFIG_PATH, screen_size=(800, 600)):
+        # headless tools have no Tk window or menus, e.g. for benchmarks;
+        # set SDL_VIDEODRIVER=dummy before creating one without a display
+        self.headless = headless
+        self.tk_root = None
+        if not headless:
+            self.tk_root = tk.Tk()
+            self.tk_root.title('RPG Map Tool')
+            self.tk_root.protocol('WM_DELETE_WINDOW', self.exit_program)
+            self.embed = tk.Frame(self.tk_root, width=screen_size[0], height=screen_size[1])
+            self.embed.pack(fill=tk.BOTH, expand=True)
+            self.tk_root.geometry('{}x{}'.format(*screen_size))
+            self.tk_root.update()
+            os.environ['SDL_WINDOWID'] = str(self.embed.winfo_id())
+            # SDL does not always see expose events for an embedded window
+            self.embed.bind('<Expose>', lambda e: self.invalidate())
+            self.embed.bind('<Configure>', lambda e: self.invalidate())
 
         pygame.init()
         # initialize a display before loading images so convert_alpha works
-        self.screen = pygame.display.set_mode((800, 600))
+        self.screen = pygame.display.set_mode(screen_size)
         pygame.display.set_caption('RPG Map Tool')
 
         # configuration may load images that rely on a valid display
-        self.config = Config()
+        self.config = Config(config_path)
         self.zoom_levels = self.config.general['zoom_levels']
         self.zoom = self.zoom_levels[1]
+        self.zoom_min = self.config.general.get('zoom_min', min(self.zoom_levels))
+        self.zoom_max = self.config.general.get('zoom_max', max(self.zoom_levels))
+        self.zoom_step = self.config.general.get('zoom_step', 1.25)
         self.pan_speed = self.config.general['pan_speed']
         map_w, map_h = self.config.general['map_size_pixels']
         self.grid_size = self.config.general['grid_size']
@@ -44,6 +85,16 @@ class MapTool:
         self.map_tiles_y = map_h // self.grid_size
         self.layers = [Layer(self.map_tiles_x, self.map_tiles_y) for _ in range(3)]
         self.brush_items: list[BrushItem] = []
+        self.history = History(self, self.config.general.get('undo_memory_mb', 32) * 1024 * 1024)
+        self.brush_index = SpatialGrid(self.grid_size)
+        self.next_z = 0
+        # binary map file that layers are still paging chunks in from
+        self.map_file: MapFile | None = None
+        # SessionServer or SessionClient while sharing a session
+        self.netplay: SessionServer | SessionClient | None = None
+        self.scaled_assets = ScaledAssetCache(self.config.general.get('scaled_cache_mb', 64) * 1024 * 1024)
+        self.scaled_assets.warm(self.config.tile_groups, self.zoom, self.tile_base())
+        self.chunk_cache = ChunkCache(self)
         self.mode = 1
         self.running = True
 
@@ -53,29 +104,104 @@ class MapTool:
         self.asset_scroll = 0
         self.selected_asset = 0
         self.dragging_item: BrushItem | None = None
+        self.tool = 'paint'
+        # tile the current paint/erase stroke last reached
+        self.stroke_tile: tuple[int, int] | None = None
+        # corner tile of a rectangle being dragged and the (x0, y0, x1, y1) it covers
+        self.rect_anchor: tuple[int, int] | None = None
+        self.rect_preview: tuple[int, int, int, int] | None = None
+        self.rect_erase = False
         self.left_button_down = False
         self.right_button_down = False
         self.unsaved_map = False
         self.unsaved_state = False
         self.font = pygame.font.Font(None, 24)
         self.menu_bar_height = 0
+        # the last failure passed to report_error
+        self.last_error: str | None = None
 
-        self.file_menu = FileMenu(self, self.tk_root)
+        self.file_menu = FileMenu(self, self.tk_root) if not headless else None
         self.asset_ui = AssetUI(self)
+        self.minimap = Minimap(self)
         self.input_handler = InputHandler(self)
 
         self.drag_offset = (0, 0)
 
+        # screen regions needing a redraw; full_redraw overrides them
+        self.damage: list[Rect] = []
+        self.full_redraw = True
+        self.last_view_state = None
+
+        self.profiler = FrameProfiler()
+        self.hud_font = pygame.font.Font(None, 18)
+        self.hud_rect: Rect | None = None
+        if self.config.general.get('profile_log'):
+            self.profiler.start_log(self.config.general['profile_log'])
+        self.scheduler = FrameScheduler(self.config.general.get('target_fps', 60),
+                                        self.config.general.get('idle_fps', 4),
+                                        self.config.general.get('tk_hz', 30))
+
+        self.autosaver = AutoSaver(self, self.config.general.get('autosave_dir', '.autosave'),
+                                   self.config.general.get('autosave_seconds', 60))
+        if not headless and self.autosaver.manifest() is not None:
+            if messagebox.askyesno('Restore autosave?',
+                                   'An autosave from an earlier session was found. Restore it?',
+                                   parent=self.tk_root):
+                self.restore_autosave()
+
     # ---- Utility methods ----
     def get_active_groups(self):
         return self.config.tile_groups if self.mode < 4 else self.config.brush_groups
 
+    def tile_base(self):
+        return self.grid_size, self.grid_size
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom to any level within ``zoom_min``..``zoom_max``.
+
+        The world point under the screen position ``anchor``, if given, stays
+        where it is.
+        """
+        zoom = round(max(self.zoom_min, min(self.zoom_max, zoom)), 4)
+        if zoom == self.zoom:
+            return
+        if anchor is not None:
+            wx, wy = self.screen_to_world(*anchor)
+        self.zoom = zoom
+        if anchor is not None:
+            self.camera = [wx - anchor[0] / zoom, wy - anchor[1] / zoom]
+        self.clamp_camera()
+
+    def zoom_by(self, steps: int, anchor=None):
+        """Zoom in (positive ``steps``) or out by factors of ``zoom_step``."""
+        self.set_zoom(self.zoom * self.zoom_step ** steps, anchor)
+
     def world_to_screen(self, x, y):
         return int((x - self.camera[0]) * self.zoom), int((y - self.camera[1]) * self.zoom)
 
     def screen_to_world(self, x, y):
         return x / self.zoom + self.camera[0], y / self.zoom + self.camera[1]
 
+    def visible_tile_range(self, rect: Rect | None = None):
+        """Return the ``(x0, y0, x1, y1)`` tile range (end exclusive) covering a screen rect."""
+        if rect is None:
+            rect = self.screen.get_rect()
+        wx0, wy0 = self.screen_to_world(rect.left, rect.top)
+        wx1, wy1 = self.screen_to_world(rect.right, rect.bottom)
+        x0 = max(0, int(wx0 // self.grid_size))
+        y0 = max(0, int(wy0 // self.grid_size))
+        x1 = min(self.map_tiles_x, int(wx1 // self.grid_size) + 1)
+        y1 = min(self.map_tiles_y, int(wy1 // self.grid_size) + 1)
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def world_rect_to_screen(self, x, y, w, h) -> Rect:
+        """Screen rect covering a world rect, padded for pixel rounding."""
+        sx0 = math.floor((x - self.camera[0]) * self.zoom) - 1
+        sy0 = math.floor((y - self.camera[1]) * self.zoom) - 1
+        sx1 = math.ceil((x + w - self.camera[0]) * self.zoom) + 1
+        sy1 = math.ceil((y + h - self.camera[1]) * self.zoom) + 1
+        return Rect(sx0, sy0, sx1 - sx0, sy1 - sy0)
+
     def clamp_camera(self):
         map_w = self.map_tiles_x * self.grid_size
         map_h = self.map_tiles_y * self.grid_size
@@ -99,134 +225,577 @@ class MapTool:
         window.geometry(f"+{x}+{y}")
 
     # ---- Selection and actions ----
-    def left_click(self, pos):
+    def screen_to_tile(self, pos):
         x, y = self.screen_to_world(*pos)
+        return int(x // self.grid_size), int(y // self.grid_size)
+
+    def left_click(self, pos):
         if self.mode < 4:
-            tile_x = int(x // self.grid_size)
-            tile_y = int(y // self.grid_size)
-            self.layers[self.mode - 1].paint(tile_x, tile_y, (self.selected_group, self.selected_asset))
+            self.start_tool(pos)
+
+    def start_tool(self, pos, erase: bool = False):
+        """Apply the current tile tool for a mouse press at ``pos``."""
+        tile = self.screen_to_tile(pos)
+        if self.tool == 'fill':
+            value = -1 if erase else (self.selected_group, self.selected_asset)
+            if self.layers[self.mode - 1].flood_fill(*tile, value):
+                self.unsaved_map = True
+        elif self.tool in ('rect', 'outline'):
+            self.rect_anchor = tile
+            self.rect_erase = erase
+            self.drag_tool(pos)
+        else:
+            self.stroke_tile = None
+            self.stroke_to(pos, erase)
+        self.history.commit()
+
+    def drag_tool(self, pos, erase: bool = False):
+        """Follow the mouse while a button is held in a layer mode."""
+        if self.rect_anchor is not None:
+            (ax, ay), (tx, ty) = self.rect_anchor, self.screen_to_tile(pos)
+            self.rect_preview = (min(ax, tx), min(ay, ty), max(ax, tx) + 1, max(ay, ty) + 1)
+        elif self.tool == 'paint':
+            self.stroke_to(pos, erase)
+
+    def finish_tool(self):
+        """End the current stroke or rectangle when the mouse button is released."""
+        self.stroke_tile = None
+        if self.rect_preview is not None and self.mode < 4:
+            value = -1 if self.rect_erase else (self.selected_group, self.selected_asset)
+            layer = self.layers[self.mode - 1]
+            if self.tool == 'outline':
+                layer.outline_rect(*self.rect_preview, value)
+            else:
+                layer.fill_rect(*self.rect_preview, value)
+            self.unsaved_map = True
+        self.rect_anchor = None
+        self.rect_preview = None
+        self.history.commit()
+
+    def replace_tile(self, old, new, all_layers: bool = False) -> int:
+        """Replace ``old`` with ``new`` on the current layer, or on every layer.
+
+        Returns the number of cells changed.
+        """
+        layers = self.layers if all_layers or self.mode >= 4 else [self.layers[self.mode - 1]]
+        total = sum(layer.replace(old, new) for layer in layers)
+        if total:
             self.unsaved_map = True
+        self.history.commit('replace')
+        return total
+
+    def undo(self):
+        if self.history.undo() is not None:
+            self.invalidate()
+
+    def redo(self):
+        if self.history.redo() is not None:
+            self.invalidate()
+
+    def stroke_to(self, pos, erase: bool = False):
+        """Extend the current paint (or erase) stroke to ``pos`` as one batched layer update.
+
+        Every tile on the line from where the stroke last reached is painted,
+        so fast drags leave no gaps.
+        """
+        tile = self.screen_to_tile(pos)
+        start = self.stroke_tile or tile
+        value = -1 if erase else (self.selected_group, self.selected_asset)
+        self.layers[self.mode - 1].paint_cells(line_cells(*start, *tile), value)
+        self.stroke_tile = tile
+        self.unsaved_map = True
 
     def start_drag(self, pos):
         x, y = self.screen_to_world(*pos)
-        for item in reversed(self.brush_items):
-            g = self.get_active_groups()[item.group_idx]
-            img = g.assets[item.asset_idx]
-            rect = Rect(item.x, item.y, img.get_width(), img.get_height())
-            if rect.collidepoint(x, y):
-                self.dragging_item = item
-                self.drag_offset = (x - item.x, y - item.y)
-                break
+        item = self.brush_index.query_point(x, y)
+        if item is not None:
+            self.dragging_item = item
+            self.drag_offset = (x - item.x, y - item.y)
 
     def right_click(self, pos):
-        x, y = self.screen_to_world(*pos)
         if self.mode < 4:
-            tile_x = int(x // self.grid_size)
-            tile_y = int(y // self.grid_size)
-            self.layers[self.mode - 1].erase(tile_x, tile_y)
-            self.unsaved_map = True
+            self.start_tool(pos, erase=True)
         else:
-            for item in reversed(self.brush_items):
-                g = self.get_active_groups()[item.group_idx]
-                img = g.assets[item.asset_idx]
-                rect = Rect(item.x, item.y, img.get_width(), img.get_height())
-                if rect.collidepoint(x, y):
-                    self.brush_items.remove(item)
-                    self.unsaved_state = True
-                    break
+            x, y = self.screen_to_world(*pos)
+            item = self.brush_index.query_point(x, y)
+            if item is not None:
+                self.remove_brush_item(item)
+                self.unsaved_state = True
+                self.history.commit()
+
+    # ---- Brush items ----
+    def brush_rect(self, item: BrushItem):
+        try:
+            w, h = self.config.brush_groups[item.group_idx].assets[item.asset_idx].get_size()
+        except IndexError:
+            w = h = self.grid_size
+        return item.x, item.y, w, h
+
+    def add_brush_item(self, item: BrushItem):
+        """Place ``item`` on top of every other brush item."""
+        item.z = self.next_z
+        self.next_z += 1
+        self.brush_items.append(item)
+        rect = self.brush_rect(item)
+        self.brush_index.insert(item, rect)
+        self.invalidate(self.world_rect_to_screen(*rect))
+        self._record_brush('add', item)
+
+    def restore_brush_item(self, item: BrushItem):
+        """Put a removed ``item`` back at its previous stacking position."""
+        insort(self.brush_items, item, key=lambda i: i.z)
+        rect = self.brush_rect(item)
+        self.brush_index.insert(item, rect)
+        self.invalidate(self.world_rect_to_screen(*rect))
+        self._record_brush('add', item)
+
+    def remove_brush_item(self, item: BrushItem):
+        self.brush_items.remove(item)
+        self.brush_index.remove(item)
+        self.invalidate(self.world_rect_to_screen(*self.brush_rect(item)))
+        self._record_brush('remove', item)
+
+    def move_brush_item(self, item: BrushItem, x: float, y: float):
+        self.invalidate(self.world_rect_to_screen(*self.brush_rect(item)))
+        self._record_brush('move', item, (item.x, item.y), (x, y))
+        item.x = x
+        item.y = y
+        rect = self.brush_rect(item)
+        self.brush_index.move(item, rect)
+        self.invalidate(self.world_rect_to_screen(*rect))
+
+    def _record_brush(self, kind: str, item: BrushItem | None, before=None, after=None):
+        self.history.record_brush(kind, item, before, after)
+        if self.netplay is not None:
+            self.netplay.record_brush(kind, item)
+
+    def set_brush_items(self, items: list[BrushItem]):
+        """Replace all brush items, stacking them in list order. Not recorded in the history."""
+        if self.netplay is not None:
+            self.netplay.record_brush('clear', None)
+        self.brush_items = []
+        self.brush_index.clear()
+        self.next_z = 0
+        with self.history.paused():
+            for item in items:
+                self.add_brush_item(item)
+        self.damage.clear()
+        self.invalidate()
 
     # ---- Save/Load helpers ----
     def quick_save(self):
         if self.mode < 4:
-            self.save_map('maps/quick.json')
+            self.save_map('maps/quick.json', background=True)
         else:
-            self.save_state('map-states/quick.json')
-
-    def save_map(self, path):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        data = {f'layer{i+1}': layer.grid for i, layer in enumerate(self.layers)}
-        with open(path, 'w') as f:
-            json.dump(data, f)
+            self.save_state('map-states/quick.json', background=True)
+
+    def save_map(self, path, background: bool = False):
+        """Write the map; with ``background`` only a snapshot is taken here and written on the save thread."""
+        # the open map file may be the one being overwritten
+        self.release_map_file()
+        if background:
+            future = self.autosaver.submit(write_map, path, [layer.snapshot() for layer in self.layers],
+                                           on_failure=self._map_save_failed)
+        else:
+            write_map(path, self.layers)
+            future = None
         self.unsaved_map = False
+        self._saved(future)
 
     def load_map(self, path):
-        with open(path, 'r') as f:
-            data = json.load(f)
-        for i in range(3):
-            self.layers[i].grid = data.get(f'layer{i+1}', self.layers[i].grid)
+        with self.history.paused():
+            self._read_map(path)
+        self.history.clear()
+        self.map_tiles_x = self.layers[0].width
+        self.map_tiles_y = self.layers[0].height
+        self.clamp_camera()
         self.unsaved_map = False
 
-    def save_state(self, path):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        data = [{'group': b.group_idx, 'asset': b.asset_idx, 'x': b.x, 'y': b.y} for b in self.brush_items]
-        with open(path, 'w') as f:
-            json.dump(data, f)
+    def _read_map(self, path):
+        if path.endswith(BINARY_MAP_EXT):
+            # chunks are paged in lazily as they come into view
+            map_file = MapFile(path)
+            for i in range(min(3, map_file.layer_count)):
+                self.layers[i].attach(map_file, i)
+            self.release_map_file(keep=map_file)
+        else:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            for i in range(3):
+                if f'layer{i+1}' in data:
+                    self.layers[i].load_grid(data[f'layer{i+1}'])
+            self.release_map_file()
+
+    def release_map_file(self, keep: MapFile | None = None):
+        """Finish paging in from the current map file and close it, unless it is ``keep``."""
+        old = self.map_file
+        if old is not None and old is not keep:
+            for layer in self.layers:
+                if layer.source is old:
+                    layer.load_all()
+            old.close()
+        self.map_file = keep
+
+    def save_state(self, path, background: bool = False):
+        data = brush_columns(self.brush_items)
+        if background:
+            future = self.autosaver.submit(write_json, path, data, on_failure=self._state_save_failed)
+        else:
+            write_json(path, data)
+            future = None
         self.unsaved_state = False
+        self._saved(future)
+
+    def _map_save_failed(self):
+        self.unsaved_map = True
+
+    def _state_save_failed(self):
+        self.unsaved_state = True
+
+    def _saved(self, future):
+        # an autosave older than the saved files must not be offered after a crash
+        if not (self.unsaved_map or self.unsaved_state):
+            self.autosaver.saved(future)
+
+    def restore_autosave(self) -> bool:
+        """Replace the map and brush state with the last autosave, if there is one."""
+        saved = self.autosaver.read()
+        if saved is None:
+            return False
+        layers, state = saved
+        self.replace_layers(layers)
+        self.set_brush_items(read_brush_items(state))
+        # the restored work has not been saved anywhere but the autosave
+        self.unsaved_map = True
+        self.unsaved_state = True
+        return True
+
+    def replace_layers(self, layers: list[Layer]):
+        """Show ``layers`` instead of the current map, padded to three; clears the undo history."""
+        self.release_map_file()
+        self.layers = layers[:3]
+        while len(self.layers) < 3:
+            self.layers.append(Layer(self.layers[0].width, self.layers[0].height))
+        self.history.clear()
+        self.map_tiles_x = self.layers[0].width
+        self.map_tiles_y = self.layers[0].height
+        self.clamp_camera()
 
     def load_state(self, path):
         with open(path, 'r') as f:
             data = json.load(f)
-        self.brush_items = [BrushItem(d['group'], d['asset'], d['x'], d['y']) for d in data]
+        self.set_brush_items(read_brush_items(data))
+        self.history.clear()
         self.unsaved_state = False
 
     def reload_config(self):
-        self.config = Config()
+        """Reload only the groups and files that changed on disk."""
+        changes = self.config.reload()
+        self.scaled_assets.remap(changes.kept)
+        self.chunk_cache.clear()
+        self.asset_ui.invalidate()
+        self.minimap.invalidate()
+        self.invalidate()
+        groups = self.get_active_groups()
+        if self.selected_group >= len(groups):
+            self.selected_group = 0
+        if groups and self.selected_asset >= len(groups[self.selected_group].assets):
+            self.selected_asset = self.asset_scroll = 0
+        # asset sizes may have changed
+        self.set_brush_items(self.brush_items)
+        problems = self.reload_problems(changes)
+        if problems and not self.headless:
+            if len(problems) > 20:
+                problems = problems[:20] + [f'... and {len(problems) - 20} more']
+            messagebox.showwarning('Config reloaded', 'Assets in use moved or disappeared:\n' + '\n'.join(problems),
+                                   parent=self.tk_root)
+
+    def reload_problems(self, changes) -> list[str]:
+        """Describe ``(group, asset)`` indices in use that a config reload moved or removed."""
+        problems = []
+        for i, layer in enumerate(self.layers):
+            for tile, count in sorted(layer.usage().items()):
+                new = changes.remap('tile_groups', *tile)
+                if new != tile:
+                    where = 'is gone' if new is None else f'is now {new}'
+                    problems.append(f'Layer {i+1}: tile {tile} ({count} cells) {where}')
+        used = Counter((b.group_idx, b.asset_idx) for b in self.brush_items)
+        for brush, count in sorted(used.items()):
+            new = changes.remap('brush_groups', *brush)
+            if new != brush:
+                where = 'is gone' if new is None else f'is now {new}'
+                problems.append(f'Brush {brush} ({count} items) {where}')
+        return problems
 
     def toggle_ui(self):
         self.show_ui = not self.show_ui
-        self.file_menu.update_file_menu()
+        if self.file_menu is not None:
+            self.file_menu.update_file_menu()
 
     def set_mode(self, mode_idx: int):
         self.mode = mode_idx
 
+    def set_tool(self, tool: str):
+        self.finish_tool()
+        self.tool = tool
+
+    def new_map(self, tiles_x: int, tiles_y: int):
+        """Start an empty map of the given size."""
+        self.release_map_file()
+        self.map_tiles_x = tiles_x
+        self.map_tiles_y = tiles_y
+        self.layers = [Layer(tiles_x, tiles_y) for _ in range(3)]
+        self.history.clear()
+        self.camera = [0, 0]
+        self.unsaved_map = False
+        self.clamp_camera()
+
+    def resize_map(self, tiles_x: int, tiles_y: int):
+        """Change the map size, keeping the tiles that still fit."""
+        if (tiles_x, tiles_y) == (self.map_tiles_x, self.map_tiles_y):
+            return
+        self.release_map_file()
+        with self.history.paused():
+            for layer in self.layers:
+                layer.resize(tiles_x, tiles_y)
+        self.history.clear()
+        self.map_tiles_x = tiles_x
+        self.map_tiles_y = tiles_y
+        self.unsaved_map = True
+        self.clamp_camera()
+
     def clear_map(self):
-        self.layers = [Layer(self.map_tiles_x, self.map_tiles_y) for _ in range(3)]
+        for layer in self.layers:
+            layer.clear()
+        self.history.commit('clear map')
         self.unsaved_map = False
 
     def clear_state(self):
-        self.brush_items = []
+        for item in list(self.brush_items):
+            self.remove_brush_item(item)
+        self.history.commit('clear state')
         self.unsaved_state = False
 
+    def host_session(self, port: int = DEFAULT_PORT, host: str = '127.0.0.1') -> SessionServer:
+        """Share this map and its brush items with editors that join on ``port``."""
+        self.leave_session()
+        self.netplay = SessionServer(self, host, port)
+        return self.netplay
+
+    def join_session(self, host: str, port: int = DEFAULT_PORT) -> SessionClient:
+        """Follow the session hosted at ``host``; the map is replaced by the host's."""
+        self.leave_session()
+        self.netplay = SessionClient(self, host, port)
+        return self.netplay
+
+    def leave_session(self):
+        if self.netplay is not None:
+            self.netplay.close()
+            self.netplay = None
+
     def exit_program(self):
         self.running = False
+        self.release_map_file()
+
+    def toggle_profiler_hud(self):
+        self.profiler.show_hud = not self.profiler.show_hud
+        if self.hud_rect is not None:
+            self.invalidate(self.hud_rect)
+            self.hud_rect = None
+
+    def toggle_profile_log(self):
+        """Start streaming frame samples to a new file under profiles/, or stop."""
+        if self.profiler.log_path:
+            self.profiler.stop_log()
+        else:
+            self.profiler.start_log(os.path.join('profiles', time.strftime('frames-%Y%m%d-%H%M%S.jsonl')))
+
+    def report_error(self, title: str, message: str):
+        """Show a failure of background work, e.g. a save; called on the main thread."""
+        self.last_error = f'{title}: {message}'
+        caption = f'RPG Map Tool - {title}'
+        if self.tk_root is not None:
+            self.tk_root.title(caption)
+            messagebox.showerror(title, message, parent=self.tk_root)
+        else:
+            pygame.display.set_caption(caption)
 
     # ---- Drawing ----
-    def draw(self):
-        self.screen.fill((50, 50, 50))
+    def invalidate(self, rect: Rect | None = None):
+        """Schedule a redraw of ``rect`` in screen space, or of the whole screen."""
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.damage.append(rect)
+
+    def needs_frame(self) -> bool:
+        """Whether something changed outside the event queue that a frame should show, e.g. from Tk."""
+        return (not self.running or self.full_redraw or bool(self.damage) or self._view_state() != self.last_view_state
+                or any(layer.dirty or layer.dirty_all for layer in self.layers))
+
+    def _view_state(self):
+        # anything here changing means the whole screen is stale
+        return (tuple(self.camera), self.zoom, self.show_ui, self.mode, self.selected_group,
+                self.selected_asset, self.asset_scroll, self.config, self.screen.get_size(),
+                tuple(self.layers), self.rect_preview)
+
+    def _layer_damage(self):
+        """Screen rects of layer cells changed since the last draw, or None for everything."""
+        rects = []
+        gs = self.grid_size
         for layer in self.layers:
-            for x in range(self.map_tiles_x):
-                for y in range(self.map_tiles_y):
-                    val = layer.grid[x][y]
-                    if val != -1:
-                        g_idx, a_idx = val
-                        g = self.config.tile_groups[g_idx]
-                        img = g.assets[a_idx]
-                        sx, sy = self.world_to_screen(x * self.grid_size, y * self.grid_size)
-                        sz = int(self.grid_size * self.zoom)
-                        img_s = pygame.transform.scale(img, (sz, sz))
-                        self.screen.blit(img_s, (sx, sy))
-        for item in self.brush_items:
-            g = self.config.brush_groups[item.group_idx]
-            img = g.assets[item.asset_idx]
-            sx, sy = self.world_to_screen(item.x, item.y)
-            szx = int(img.get_width() * self.zoom)
-            szy = int(img.get_height() * self.zoom)
-            img_s = pygame.transform.scale(img, (szx, szy))
-            self.screen.blit(img_s, (sx, sy))
+            if layer.dirty_all:
+                return None
+            chunk_px = layer.chunk_size * gs
+            for (cx, cy), cells in layer.dirty.items():
+                if cells is None:
+                    rects.append(self.world_rect_to_screen(cx * chunk_px, cy * chunk_px, chunk_px, chunk_px))
+                else:
+                    rects.extend(self.world_rect_to_screen(x * gs, y * gs, gs, gs) for x, y in cells)
+        return rects
+
+    def _render(self, view: Rect):
+        profiler = self.profiler
+        with profiler.phase('tiles'):
+            self.screen.fill((50, 50, 50), view)
+            self.chunk_cache.draw(self.screen, view)
+        with profiler.phase('brushes'):
+            wx, wy = self.screen_to_world(view.left, view.top)
+            items = self.brush_index.query_rect((wx, wy, view.width / self.zoom, view.height / self.zoom))
+            # look each asset up once per frame, then hand every blit to pygame in one call
+            images = {}
+            batch = []
+            zoom, cam_x, cam_y = self.zoom, self.camera[0], self.camera[1]
+            groups = self.config.brush_groups
+            for item in items:
+                key = (item.group_idx, item.asset_idx)
+                img_s = images.get(key)
+                if img_s is None:
+                    try:
+                        img_s = images[key] = self.scaled_assets.get(groups[key[0]], key[1], zoom)
+                    except IndexError:
+                        # asset vanished in a config reload
+                        continue
+                batch.append((img_s, (int((item.x - cam_x) * zoom), int((item.y - cam_y) * zoom))))
+            self.screen.blits(batch, doreturn=False)
+            profiler.count('brushes_blitted', len(batch))
+
+        if self.rect_preview is not None:
+            x0, y0, x1, y1 = self.rect_preview
+            gs = self.grid_size
+            rect = self.world_rect_to_screen(x0 * gs, y0 * gs, (x1 - x0) * gs, (y1 - y0) * gs)
+            pygame.draw.rect(self.screen, pygame.Color(self.config.ui['highlight_color']), rect, 2)
 
         if self.show_ui:
-            self.asset_ui.draw(self.screen)
-        pygame.display.flip()
+            with profiler.phase('ui'):
+                self.asset_ui.draw(self.screen)
+                if self.minimap.visible:
+                    self.minimap.draw(self.screen)
+
+    def _hud(self):
+        """The profiler HUD surface and its screen rect, damaging it when the text changed."""
+        surf, fresh = self.profiler.hud_surface(self.hud_font)
+        rect = surf.get_rect(topright=(self.screen.get_width() - 4, self.menu_bar_height + 4))
+        if fresh or rect != self.hud_rect:
+            self.damage.append(rect)
+            if self.hud_rect is not None and self.hud_rect != rect:
+                self.damage.append(self.hud_rect)
+        self.hud_rect = rect
+        return surf, rect
+
+    def draw(self) -> bool:
+        """Redraw what changed since the last frame; returns whether anything was drawn."""
+        state = self._view_state()
+        if state != self.last_view_state:
+            self.last_view_state = state
+            self.full_redraw = True
+        hud = self._hud() if self.profiler.show_hud else None
+        # the minimap peeks at layer changes before the chunk cache consumes them
+        if self.minimap.visible:
+            with self.profiler.phase('ui'):
+                if self.minimap.sync() and self.show_ui:
+                    self.invalidate(self.minimap.rect())
+        layer_rects = None if self.full_redraw else self._layer_damage()
+        screen_rect = self.screen.get_rect()
+        drawn = True
+        if layer_rects is None:
+            self._render(screen_rect)
+            if hud is not None:
+                self.screen.blit(*hud)
+            with self.profiler.phase('display'):
+                pygame.display.flip()
+        else:
+            rects = [r.clip(screen_rect) for r in self.damage + layer_rects]
+            rects = [r for r in rects if r.width and r.height]
+            if rects:
+                if len(rects) > 32:
+                    rects = [rects[0].unionall(rects[1:])]
+                for rect in rects:
+                    self.screen.set_clip(rect)
+                    self._render(rect)
+                self.screen.set_clip(None)
+                # the HUD is opaque, so drawing it over itself is harmless
+                if hud is not None:
+                    self.screen.blit(*hud)
+                with self.profiler.phase('display'):
+                    pygame.display.update(rects)
+            else:
+                # nothing on screen changed, but off-screen edits must not stay pending
+                self.chunk_cache.sync()
+                drawn = False
+        self.damage.clear()
+        self.full_redraw = False
+        return drawn
+
+    def _update_tk(self):
+        self.tk_root.update_idletasks()
+        self.tk_root.update()
+
+    def _poll_tk(self) -> bool:
+        """Service Tk during an idle wait; returns whether that left work for a frame."""
+        self._update_tk()
+        return self.needs_frame()
 
     def run(self):
-        clock = pygame.time.Clock()
+        profiler = self.profiler
+        scheduler = self.scheduler
+        # the event that woke an idle wait, handled first next frame
+        woken_by = None
         while self.running:
-            self.tk_root.update_idletasks()
-            self.tk_root.update()
-            self.input_handler.handle_events()
-            self.draw()
-            clock.tick(60)
-        self.tk_root.destroy()
+            profiler.begin_frame()
+            scale_calls = self.scaled_assets.scale_calls
+            if self.tk_root is not None and scheduler.tk_due():
+                with profiler.phase('tk'):
+                    self._update_tk()
+            with profiler.phase('events'):
+                handled = self.input_handler.handle_events(woken_by)
+            if self.netplay is not None:
+                # before drawing, which consumes the layers' dirty state
+                with profiler.phase('net'):
+                    self.netplay.sync()
+            drawn = self.draw()
+            with profiler.phase('autosave'):
+                self.autosaver.poll()
+            profiler.count('scale_calls', self.scaled_assets.scale_calls - scale_calls)
+            interacting = self.left_button_down or self.right_button_down or self.input_handler.minimap_drag
+            with profiler.phase('sleep'):
+                woken_by = scheduler.wait(bool(handled or drawn or interacting),
+                                          HUD_REFRESH if profiler.show_hud else None,
+                                          self._poll_tk if self.tk_root is not None else None)
+            profiler.end_frame()
+        profiler.stop_log()
+        self.leave_session()
+        if self.file_menu is not None:
+            # quitting must not wait for maps queued for the dialogs' index
+            self.file_menu.map_index.close()
+        # background saves that fail mark their work unsaved again
+        self.autosaver.wait()
+        # a clean exit with everything saved needs no crash recovery
+        if not (self.unsaved_map or self.unsaved_state):
+            self.autosaver.discard()
+        self.autosaver.close()
+        if self.tk_root is not None:
+            self.tk_root.destroy()
 
 
 if __name__ == '__main__':
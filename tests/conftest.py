@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def make_headless_tool(monkeypatch, tmp_path):
+    """Factory of headless MapTools on the dummy video driver, autosaving under ``tmp_path``."""
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    from main import MapTool
+
+    def make():
+        tool = MapTool(headless=True)
+        tool.autosaver.directory = str(tmp_path / 'autosave')
+        return tool
+    return make
+
+
+@pytest.fixture
+def headless_tool(make_headless_tool):
+    return make_headless_tool()
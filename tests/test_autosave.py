@@ -0,0 +1,114 @@
+import json
+import os
+
+from classes.brush import BrushItem
+
+
+def test_autosave_writes_only_changed_layers(make_headless_tool, tmp_path):
+    tool = make_headless_tool()
+    tool.layers[0].paint(1, 1, (0, 1))
+    tool.add_brush_item(BrushItem(0, 0, 5, 5))
+    tool.autosaver.save()
+    tool.autosaver.wait()
+    assert sorted(os.listdir(tmp_path / 'autosave')) == [
+        'layer1.rpgmap', 'layer2.rpgmap', 'layer3.rpgmap', 'manifest.json', 'state.json']
+
+    # unchanged layers are not rewritten
+    for name in ('layer1.rpgmap', 'layer3.rpgmap', 'state.json'):
+        os.remove(tmp_path / 'autosave' / name)
+    tool.layers[1].paint(2, 2, (0, 2))
+    tool.autosaver.save()
+    # edits after the snapshot do not leak into it
+    tool.layers[1].paint(3, 3, (0, 3))
+    tool.autosaver.wait()
+    assert sorted(os.listdir(tmp_path / 'autosave')) == ['layer2.rpgmap', 'manifest.json']
+    assert not [n for n in os.listdir(tmp_path / 'autosave') if n.endswith('.tmp')]
+
+    tool.autosaver.discard()
+    tool.layers[1].erase(3, 3)
+    tool.autosaver.save()
+    tool.autosaver.wait()
+
+    other = make_headless_tool()
+    assert other.restore_autosave()
+    assert other.layers[0].get(1, 1) == (0, 1)
+    assert other.layers[1].get(2, 2) == (0, 2)
+    assert other.layers[1].get(3, 3) == -1
+    assert [(b.x, b.y) for b in other.brush_items] == [(5, 5)]
+    assert other.unsaved_map and other.unsaved_state
+    tool.autosaver.close()
+    other.autosaver.close()
+
+
+def test_background_quick_save(headless_tool, tmp_path):
+    tool = headless_tool
+    tool.layers[0].paint(1, 1, (0, 1))
+    path = str(tmp_path / 'maps' / 'm.rpgmap')
+    tool.save_map(path, background=True)
+    assert not tool.unsaved_map
+    tool.autosaver.wait()
+    tool.load_map(path)
+    assert tool.layers[0].get(1, 1) == (0, 1)
+    tool.autosaver.close()
+
+
+def test_state_saves_columns_and_loads_old_records(headless_tool, tmp_path):
+    tool = headless_tool
+    for i in range(3):
+        tool.add_brush_item(BrushItem(0, i % 2, i * 10, 5))
+    path = str(tmp_path / 'state.json')
+    tool.save_state(path)
+    with open(path) as f:
+        assert json.load(f) == {'group': [0, 0, 0], 'asset': [0, 1, 0], 'x': [0, 10, 20], 'y': [5, 5, 5]}
+    tool.load_state(path)
+    assert [(b.asset_idx, b.x, b.z) for b in tool.brush_items] == [(0, 0, 0), (1, 10, 1), (0, 20, 2)]
+
+    with open(path, 'w') as f:
+        json.dump([{'group': 0, 'asset': 1, 'x': 7, 'y': 8}], f)
+    tool.load_state(path)
+    assert [(b.asset_idx, b.x, b.y) for b in tool.brush_items] == [(1, 7, 8)]
+    tool.autosaver.close()
+
+
+def test_manual_save_removes_stale_autosave(headless_tool, tmp_path):
+    tool = headless_tool
+    tool.layers[0].paint(1, 1, (0, 1))
+    tool.add_brush_item(BrushItem(0, 0, 5, 5))
+    tool.unsaved_map = tool.unsaved_state = True
+    tool.autosaver.save()
+    tool.autosaver.wait()
+    assert tool.autosaver.manifest() is not None
+
+    # a failed save keeps the autosave
+    (tmp_path / 'taken.json').mkdir()
+    tool.save_state(str(tmp_path / 'state.json'))
+    tool.save_map(str(tmp_path / 'taken.json'), background=True)
+    tool.autosaver.wait()
+    assert tool.autosaver.manifest() is not None
+    assert tool.last_error.startswith('Save failed: IsADirectoryError')
+    assert tool.unsaved_map and not tool.unsaved_state
+
+    tool.save_map(str(tmp_path / 'm.rpgmap'), background=True)
+    tool.autosaver.wait()
+    assert tool.autosaver.manifest() is None
+    # later autosaves write every layer again
+    tool.layers[0].paint(2, 2, (0, 1))
+    tool.autosaver.save()
+    tool.autosaver.wait()
+    assert len(tool.autosaver.read()[0]) == 3
+    tool.autosaver.close()
+
+
+def test_exit_keeps_autosave_after_failed_background_save(headless_tool, tmp_path):
+    tool = headless_tool
+    tool.layers[0].paint(1, 1, (0, 1))
+    tool.unsaved_map = True
+    tool.autosaver.save()
+    tool.autosaver.wait()
+    (tmp_path / 'taken.json').mkdir()
+    tool.save_map(str(tmp_path / 'taken.json'), background=True)
+    # the editor quits before the failure was polled
+    tool.running = False
+    tool.run()
+    assert tool.unsaved_map
+    assert tool.autosaver.manifest() is not None
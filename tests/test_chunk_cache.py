@@ -0,0 +1,47 @@
+def test_patched_tiles_match_a_fresh_render_at_fractional_zoom(headless_tool):
+    tool = headless_tool
+    tool.set_zoom(0.7)
+    layer = tool.layers[0]
+    for x in range(4):
+        layer.paint(x, 0, (0, x % 2))
+    tool.draw()
+    cache = tool.chunk_cache
+
+    layer.erase(1, 0)
+    layer.paint(2, 0, (0, 0))
+    cache.sync()
+    patched = cache.surfaces[(0, 0, 0)]
+    fresh = cache._render(layer, 0, 0)
+    width = cache._tile_offset(5)
+    assert all(patched.get_at((x, y)) == fresh.get_at((x, y))
+               for x in range(width) for y in range(cache._tile_offset(1) + 1))
+    # the neighbours of the erased tile keep every pixel
+    assert patched.get_at((cache._tile_offset(2), 0)).a == 255
+
+
+def test_chunks_are_patched_rerendered_and_culled(headless_tool):
+    tool = headless_tool
+    tool.new_map(200, 200)
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    layer = tool.layers[0]
+    layer.paint(1, 1, (0, 0))
+    layer.paint(100, 100, (0, 0))
+    tool.draw()
+    cache = tool.chunk_cache
+    surf = cache.surfaces[(0, 0, 0)]
+    # chunks off screen are never rendered
+    assert (0, 6, 6) not in cache.surfaces
+
+    profiler = tool.profiler
+    profiler.begin_frame()
+    layer.paint(2, 1, (0, 1))
+    tool.draw()
+    assert cache.surfaces[(0, 0, 0)] is surf
+    assert profiler.counters['chunks_rendered'] == 0 and profiler.counters['tiles_blitted'] == 1
+
+    profiler.begin_frame()
+    layer.fill_rect(0, 0, 16, 16, (0, 1))
+    tool.draw()
+    assert cache.surfaces[(0, 0, 0)] is not surf
+    assert profiler.counters['chunks_rendered'] == 1
@@ -1,6 +1,11 @@
 import os
+import shutil
+
 import pygame
+import yaml
 from main import Config
+from classes.config_loader import MIPMAP, ScaledAssetCache, mipmap_levels
+from classes.asset_loader import AssetBudget, LazyAssets, decode_file, load_images
 
 def test_load_config():
     os.environ['SDL_VIDEODRIVER'] = 'dummy'
@@ -9,3 +14,112 @@ def test_load_config():
     cfg = Config('config/ui.yaml')
     assert len(cfg.tile_groups) > 0
     assert len(cfg.brush_groups) > 0
+
+
+def test_scaled_asset_cache_evicts_lru():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1,1))
+    cfg = Config('config/ui.yaml')
+    group = cfg.tile_groups[0]
+    # room for exactly two 32x32 RGBA surfaces
+    cache = ScaledAssetCache(2 * 32 * 32 * 4)
+    first = cache.get(group, 0, 1, (32, 32))
+    assert first.get_size() == (32, 32)
+    assert cache.get(group, 0, 1, (32, 32)) is first
+    cache.get(group, 1, 1, (32, 32))
+    cache.get(group, 0, 1, (32, 32))
+    cache.get(group, 2, 1, (32, 32))
+    assert (group, 0, 1, (32, 32)) in cache.entries
+    assert (group, 1, 1, (32, 32)) not in cache.entries
+    assert cache.used <= cache.limit
+    cache.clear()
+    assert cache.used == 0 and not cache.entries
+
+
+def test_decoded_asset_cache(tmp_path):
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1,1))
+    path = 'icons/tiles/ground_a/grass1.png'
+    first = decode_file(path, str(tmp_path))
+    assert first is not None
+    assert len(list(tmp_path.iterdir())) == 1
+    assert decode_file(path, str(tmp_path)) == first
+    assert decode_file('icons/groups/water.txt', str(tmp_path)) is None
+    surfaces = load_images([path, 'icons/groups/water.txt'], str(tmp_path))
+    assert surfaces[0].get_size() == first[0]
+    assert surfaces[1].get_at((0, 0)) == (255, 0, 255, 255)
+
+
+def test_lazy_assets_load_on_access_and_evict(tmp_path):
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1,1))
+    paths = ['icons/tiles/ground_a/grass1.png', 'icons/tiles/ground_a/grass2.png', 'missing.png']
+    budget = AssetBudget(32 * 32 * 4)
+    assets = LazyAssets(paths, budget, str(tmp_path))
+    assert len(assets) == 3 and not assets.is_loaded(0)
+    first = assets[0]
+    assert assets.is_loaded(0) and assets[0] is first
+    assets.prefetch([1, 5])
+    assets[1]
+    assert not assets.is_loaded(0)
+    assert budget.used <= budget.limit
+    assert assets[-1].get_at((0, 0)) == (255, 0, 255, 255)
+
+
+def test_incremental_reload_keeps_unchanged_assets(tmp_path):
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1,1))
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    for name in ('a.png', 'b.png', 'c.png'):
+        shutil.copy('icons/tiles/ground_a/grass1.png', tiles / name)
+    cfg_path = tmp_path / 'ui.yaml'
+    cfg_path.write_text(yaml.safe_dump({
+        'groups': {
+            'tile_groups': [{'key': 1, 'id': 't', 'icon': str(tiles / 'a.png'), 'dir': str(tiles)}],
+            'brush_groups': [],
+        },
+        'ui': {},
+        'general': {'asset_cache_dir': str(tmp_path / 'cache')},
+    }))
+    cfg = Config(str(cfg_path))
+    group = cfg.tile_groups[0]
+    kept_surface = group.assets[2]
+    (tiles / 'a.png').unlink()
+    changes = cfg.reload()
+    assert cfg.tile_groups[0] is group
+    assert group.assets[1] is kept_surface
+    assert changes.remap('tile_groups', 0, 0) is None
+    assert changes.remap('tile_groups', 0, 2) == (0, 1)
+    assert changes.kept[group] == {1: 0, 2: 1}
+
+    # groups that are dropped or rebuilt give their memory back
+    group.assets[0]
+    assert cfg.budget.used > 0
+    data = yaml.safe_load(cfg_path.read_text())
+    data['groups']['tile_groups'] = []
+    cfg_path.write_text(yaml.safe_dump(data))
+    cfg.reload()
+    assert cfg.budget.used == 0 and not cfg.budget.lru
+
+
+def test_scaled_asset_cache_uses_mipmaps():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1,1))
+    cfg = Config('config/ui.yaml')
+    group = cfg.tile_groups[0]
+    levels = mipmap_levels(group.assets[0])
+    assert [l.get_size() for l in levels] == [(16, 16), (8, 8), (4, 4), (2, 2), (1, 1)]
+    cache = ScaledAssetCache(1 << 20)
+    # level sizes need no final scale; others start from the nearest larger level
+    assert cache.get(group, 0, 0.25, (32, 32)).get_size() == (8, 8)
+    assert cache.scale_calls == len(levels)
+    assert cache.get(group, 0, 0.3, (32, 32)).get_size() == (10, 10)
+    assert cache.scale_calls == len(levels) + 1
+    assert cache.get(group, 0, 1.3, (32, 32)).get_size() == (42, 42)
+    assert (group, 0, MIPMAP, None) in cache.entries
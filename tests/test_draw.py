@@ -0,0 +1,49 @@
+import pygame
+
+from classes.brush import BrushItem
+
+
+def test_damage_rects_redraw_only_changed_tiles(headless_tool, monkeypatch):
+    tool = headless_tool
+    tool.new_map(200, 200)
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    tool.draw()
+    updates = []
+    monkeypatch.setattr(pygame.display, 'update', lambda rects: updates.append(list(rects)))
+    monkeypatch.setattr(pygame.display, 'flip', lambda: updates.append(None))
+
+    gs = tool.grid_size
+    tile = tool.world_rect_to_screen(12 * gs, 8 * gs, gs, gs)
+    before = tool.screen.get_at(tile.center)
+    tool.minimap.visible = False
+    tool.layers[0].paint(12, 8, (0, 0))
+    assert tool.draw()
+    assert updates == [[tile]]
+    assert tool.screen.get_at(tile.center) != before
+
+    # off-screen edits update nothing but are still taken from the layers
+    updates.clear()
+    tool.layers[0].paint(150, 150, (0, 0))
+    assert not tool.draw()
+    assert not updates
+    assert not any(layer.dirty for layer in tool.layers)
+
+
+def test_viewport_culls_tiles_and_brush_items(headless_tool):
+    tool = headless_tool
+    tool.new_map(200, 200)
+    tool.set_zoom(1)
+    tool.camera = [320, 160]
+    w, h = tool.screen.get_size()
+    gs = tool.grid_size
+    assert tool.visible_tile_range() == (10, 5, (320 + w) // gs + 1, (160 + h) // gs + 1)
+    tool.set_zoom(0.5)
+    assert tool.visible_tile_range()[2:] == (min(200, (320 + 2 * w) // gs + 1), min(200, (160 + 2 * h) // gs + 1))
+
+    tool.set_zoom(1)
+    tool.set_brush_items([BrushItem(0, 0, 400.0, 300.0)] +
+                         [BrushItem(0, 0, 5000.0 + 40 * i, 5000.0) for i in range(50)])
+    tool.profiler.begin_frame()
+    tool.draw()
+    assert tool.profiler.counters['brushes_blitted'] == 1
@@ -0,0 +1,26 @@
+import json
+
+import pygame
+
+from classes.exporter import export
+from classes.layer import Layer
+
+
+def test_export_stitches_tiles(tmp_path):
+    layer = Layer(5, 4)
+    layer.paint(0, 0, (0, 0))
+    layer.paint(4, 3, (0, 1))
+    map_path = tmp_path / 'map.json'
+    map_path.write_text(json.dumps({'layer1': layer.grid}))
+    state_path = tmp_path / 'state.json'
+    state_path.write_text(json.dumps([{'group': 0, 'asset': 0, 'x': 64, 'y': 32}]))
+    out = tmp_path / 'out.png'
+    size = export(str(map_path), str(out), str(state_path), scale=0.5, tile=20, workers=2)
+    assert size == (80, 64)
+    img = pygame.image.load(str(out))
+    assert img.get_size() == (80, 64)
+    # empty cells stay transparent, painted and brush cells do not
+    assert img.get_at((20, 40)).a == 0
+    assert img.get_at((2, 2)).a == 255
+    assert img.get_at((70, 60)).a == 255
+    assert img.get_at((34, 18)).a == 255
@@ -0,0 +1,91 @@
+import pygame
+import pytest
+
+from classes.brush import BrushItem
+
+
+@pytest.fixture
+def tool(headless_tool):
+    tool = headless_tool
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    tool.mode = 1
+    return tool
+
+
+def test_drag_is_one_step_and_undo_restores_cells(tool):
+    gs = tool.grid_size
+    layer = tool.layers[0]
+    layer.paint(3, 0, (1, 1))
+    tool.history.commit()
+    pygame.event.clear()
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(1, 1)))
+    tool.input_handler.handle_events()
+    for x in range(1, 10):
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=(x * gs + 1, 1), rel=(gs, 0), buttons=(1, 0, 0)))
+        tool.input_handler.handle_events()
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=(9 * gs + 1, 1)))
+    tool.input_handler.handle_events()
+    assert len(tool.history.undo_stack) == 2
+    step = tool.history.undo_stack[-1]
+    assert sum(len(d.cells) for d in step.tiles) == 10
+    assert layer.count((0, 0)) == 10
+
+    tool.undo()
+    assert layer.count((0, 0)) == 0
+    assert layer.get(3, 0) == (1, 1)
+    tool.redo()
+    assert layer.count((0, 0)) == 10
+    tool.undo()
+    tool.undo()
+    assert layer.count(-1) == layer.width * layer.height
+    assert tool.history.undo() is None
+    # a new edit drops the redo stack
+    tool.left_click((1, 1))
+    assert not tool.history.redo_stack
+
+
+def test_bulk_edits_and_brushes(tool):
+    layer = tool.layers[0]
+    tool.set_tool('fill')
+    tool.left_click((1, 1))
+    assert layer.count((0, 0)) == layer.width * layer.height
+    tool.clear_map()
+    assert layer.count((0, 0)) == 0
+    tool.undo()
+    assert layer.count((0, 0)) == layer.width * layer.height
+
+    tool.mode = 4
+    a, b = BrushItem(0, 0, 10, 10), BrushItem(0, 0, 100, 100)
+    tool.add_brush_item(a)
+    tool.add_brush_item(b)
+    tool.history.commit()
+    tool.history.begin()
+    for x in range(20, 60, 10):
+        tool.move_brush_item(a, x, 10)
+    tool.history.end()
+    assert len(tool.history.undo_stack[-1].brushes) == 1
+    tool.remove_brush_item(a)
+    tool.history.commit()
+    tool.undo()
+    assert tool.brush_items == [a, b]
+    assert tool.brush_index.query_point(55, 15) is a
+    tool.undo()
+    assert (a.x, a.y) == (10, 10)
+    tool.undo()
+    assert tool.brush_items == []
+    tool.redo()
+    assert tool.brush_items == [a, b]
+
+
+def test_memory_cap_and_load_clears(tool, tmp_path):
+    tool.history.limit = 2000
+    for x in range(30):
+        tool.layers[0].paint(x % tool.map_tiles_x, 0, (0, x % 5 + 1))
+        tool.history.commit()
+    assert tool.history.used <= 2000
+    assert 1 < len(tool.history.undo_stack) < 30
+    path = str(tmp_path / 'm.rpgmap')
+    tool.save_map(path)
+    tool.load_map(path)
+    assert not tool.history.undo_stack and tool.history.commit() is None
@@ -0,0 +1,72 @@
+import pygame
+
+
+def test_motion_is_coalesced_into_one_gapless_stroke(headless_tool, monkeypatch):
+    tool = headless_tool
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    tool.mode = 1
+    pygame.event.clear()
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(5, 5)))
+    for x in range(40, 330, 40):
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=(x, 5), rel=(40, 0), buttons=(1, 0, 0)))
+    tool.input_handler.handle_events()
+    assert [tool.layers[0].get(x, 0) for x in range(11)] == [(0, 0)] * 11
+    assert tool.layers[0].get(11, 0) == -1
+
+    calls = []
+    monkeypatch.setattr(tool, 'stroke_to', lambda pos, erase=False: calls.append(pos))
+    for x in (400, 410, 420):
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=(x, 5), rel=(10, 0), buttons=(1, 0, 0)))
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=(420, 5)))
+    tool.input_handler.handle_events()
+    assert calls == [(420, 5)]
+    assert tool.stroke_tile is None
+
+
+def test_fill_and_rectangle_tools(headless_tool):
+    tool = headless_tool
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    tool.mode = 1
+    gs = tool.grid_size
+    tool.set_tool('rect')
+    tool.left_click((gs * 4 + 1, gs * 3 + 1))
+    tool.drag_tool((gs + 1, gs + 1))
+    assert tool.rect_preview == (1, 1, 5, 4)
+    tool.draw()
+    tool.finish_tool()
+    assert tool.layers[0].count((0, 0)) == 4 * 3
+    assert tool.rect_preview is None
+
+    tool.set_tool('fill')
+    tool.selected_asset = 1
+    tool.left_click((gs * 2 + 1, gs * 2 + 1))
+    assert tool.layers[0].count((0, 1)) == 4 * 3
+    tool.right_click((1, 1))
+    assert tool.layers[0].count(-1) == tool.map_tiles_x * tool.map_tiles_y - 12
+
+    tool.layers[2].paint(0, 0, (0, 1))
+    assert tool.replace_tile((0, 1), (0, 2)) == 12
+    assert tool.replace_tile((0, 1), (0, 2), all_layers=True) == 1
+
+
+def test_continuous_zoom_keeps_cursor_point(headless_tool, monkeypatch):
+    tool = headless_tool
+    tool.new_map(200, 200)
+    tool.set_zoom(1)
+    tool.camera = [300, 200]
+    before = tool.screen_to_world(400, 300)
+    pygame.event.clear()
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=5, pos=(400, 300)))
+    monkeypatch.setattr(pygame.key, 'get_mods', lambda: pygame.KMOD_CTRL)
+    tool.input_handler.handle_events()
+    assert tool.zoom == tool.zoom_step
+    after = tool.screen_to_world(400, 300)
+    assert abs(after[0] - before[0]) < 1e-6 and abs(after[1] - before[1]) < 1e-6
+    # any zoom works, clamped to the configured range
+    tool.set_zoom(0.3)
+    assert tool.zoom == 0.3
+    tool.zoom_by(-100)
+    assert tool.zoom == tool.zoom_min
+    tool.draw()
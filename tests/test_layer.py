@@ -0,0 +1,110 @@
+from classes.layer import Layer, encode, decode, line_cells
+
+
+def test_paint_erase_and_grid_roundtrip():
+    layer = Layer(20, 18)
+    layer.paint(3, 17, (2, 5))
+    layer.paint(19, 0, [1, 300])
+    assert layer.get(3, 17) == (2, 5)
+    assert layer.get(19, 0) == (1, 300)
+    grid = layer.grid
+    assert len(grid) == 20 and len(grid[0]) == 18
+    assert grid[3][17] == (2, 5)
+    layer.erase(3, 17)
+    assert layer.get(3, 17) == -1
+    other = Layer(20, 18)
+    other.load_grid(grid)
+    assert other.grid == grid
+    assert decode(encode((7, 9))) == (7, 9)
+
+
+def test_dirty_tracking_per_chunk():
+    layer = Layer(40, 40)
+    layer.take_dirty()
+    layer.paint(1, 1, (0, 0))
+    layer.paint(1, 1, (0, 0))
+    layer.paint(20, 1, (0, 1))
+    dirty, dirty_all = layer.take_dirty()
+    assert not dirty_all
+    assert dirty == {(0, 0): {(1, 1)}, (1, 0): {(20, 1)}}
+    layer.clear()
+    assert set(layer.take_dirty()[0]) == {(0, 0), (1, 0)}
+
+
+def test_bulk_operations():
+    layer = Layer(40, 30)
+    assert layer.bounds() is None
+    layer.fill_rect(5, 4, 25, 20, (1, 2))
+    assert layer.count((1, 2)) == 20 * 16
+    assert layer.count(-1) == 40 * 30 - 20 * 16
+    assert layer.bounds() == (5, 4, 25, 20)
+    layer.paint(39, 29, (0, 0))
+    assert layer.bounds() == (5, 4, 40, 30)
+    assert layer.replace((1, 2), (3, 4)) == 20 * 16
+    assert layer.usage() == {(3, 4): 20 * 16, (0, 0): 1}
+    assert layer.replace(-1, (0, 0)) == 40 * 30 - 20 * 16 - 1
+    assert layer.count(-1) == 0
+
+
+def test_line_cells_and_batched_paint():
+    assert list(line_cells(0, 0, 3, 0)) == [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert list(line_cells(2, 2, 2, 2)) == [(2, 2)]
+    cells = list(line_cells(0, 0, 5, -3))
+    assert cells[0] == (0, 0) and cells[-1] == (5, -3)
+    # consecutive cells touch, so strokes have no gaps
+    assert all(abs(a[0] - b[0]) <= 1 and abs(a[1] - b[1]) <= 1 for a, b in zip(cells, cells[1:]))
+    assert len(cells) == 6
+
+    layer = Layer(40, 40)
+    layer.take_dirty()
+    assert layer.paint_cells(line_cells(-2, 1, 20, 1), (0, 3)) == 21
+    assert layer.paint_cells(line_cells(0, 1, 20, 1), (0, 3)) == 0
+    dirty, _ = layer.take_dirty()
+    assert set(dirty) == {(0, 0), (1, 0)}
+    assert len(dirty[(0, 0)]) == 16
+
+
+def test_flood_fill_and_outline():
+    layer = Layer(40, 30)
+    layer.outline_rect(2, 2, 20, 12, (1, 1))
+    assert layer.count((1, 1)) == 2 * 18 + 2 * 8
+    assert layer.get(2, 11) == (1, 1) and layer.get(3, 3) == -1
+    # inside the outline only
+    assert layer.flood_fill(5, 5, (2, 2)) == 16 * 8
+    assert layer.get(3, 3) == (2, 2) and layer.get(0, 0) == -1
+    assert layer.flood_fill(5, 5, (2, 2)) == 0
+    # a diagonal gap does not leak with 4-connectivity
+    layer.erase(2, 2)
+    assert layer.flood_fill(0, 0, (3, 3)) == 40 * 30 - 2 * 18 - 2 * 8 + 1 - 16 * 8
+    assert layer.get(3, 3) == (2, 2)
+    assert layer.flood_fill(-1, 0, (0, 0)) == 0
+
+    big = Layer(1000, 1000)
+    big.fill_rect(0, 500, 1000, 501, (1, 0))
+    assert big.flood_fill(10, 10, (0, 1)) == 500 * 1000
+    assert big.count(-1) == 499 * 1000
+
+
+def test_sparse_storage_and_resize():
+    layer = Layer(100000, 100000)
+    assert not layer.chunks
+    layer.paint(50000, 70000, (1, 2))
+    layer.fill_rect(0, 0, 20, 20, (0, 1))
+    assert len(layer.chunks) == 5
+    assert layer.count(-1) == 100000 * 100000 - 401
+    assert layer.occupied_in(0, 0, 2, 2) == [(0, 0), (1, 0), (0, 1), (1, 1)]
+    assert layer.occupied_in(3000, 4000, 4000, 5000) == [(3125, 4375)]
+    # erasing the last tile of a chunk frees it
+    layer.erase(50000, 70000)
+    layer.fill_rect(0, 0, 20, 20, -1)
+    assert not layer.chunks
+    assert layer.replace((0, 1), (0, 2)) == 0
+
+    small = Layer(40, 40)
+    small.fill_rect(0, 0, 40, 40, (0, 1))
+    small.resize(20, 10)
+    assert (small.width, small.height, small.chunks_x, small.chunks_y) == (20, 10, 2, 1)
+    assert small.count((0, 1)) == 200 and small.count(-1) == 0
+    small.resize(50, 50)
+    assert small.count((0, 1)) == 200
+    assert small.get(19, 9) == (0, 1) and small.get(20, 9) == -1 and small.get(19, 10) == -1
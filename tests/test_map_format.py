@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+from array import array
+
+import pytest
+
+from classes.layer import Layer
+from classes.map_format import (HEADER, MAGIC, PALETTE_ENTRY, TABLE_ENTRY, MapFile, MapFormatError,
+                                convert, write_binary_map)
+
+
+def _sample_layers():
+    layers = [Layer(40, 20) for _ in range(3)]
+    layers[0].fill_rect(0, 0, 40, 20, (0, 1))
+    layers[1].paint(3, 4, (2, 300))
+    layers[1].paint(39, 19, (1, 0))
+    return layers
+
+
+def test_binary_roundtrip_and_lazy_paging(tmp_path):
+    layers = _sample_layers()
+    path = str(tmp_path / 'map.rpgmap')
+    write_binary_map(path, layers)
+    with MapFile(path) as map_file:
+        assert (map_file.layer_count, map_file.width, map_file.height) == (3, 40, 20)
+        assert not map_file.chunk_present(2, 0, 0)
+        lazy = Layer(40, 20)
+        lazy.attach(map_file, 1)
+        assert len(lazy.pending) == 2
+        assert lazy.get(3, 4) == (2, 300)
+        assert len(lazy.pending) == 1
+        lazy.load_all()
+        assert lazy.source is None
+        loaded = map_file.load_layers()
+    assert [l.grid for l in loaded] == [l.grid for l in layers]
+
+
+def test_json_conversion(tmp_path):
+    layers = _sample_layers()
+    src = tmp_path / 'map.json'
+    src.write_text(json.dumps({f'layer{i+1}': l.grid for i, l in enumerate(layers)}))
+    convert(str(src), str(tmp_path / 'map.rpgmap'))
+    convert(str(tmp_path / 'map.rpgmap'), str(tmp_path / 'back.json'))
+    assert json.loads((tmp_path / 'back.json').read_text()) == json.loads(src.read_text())
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / 'bad.rpgmap'
+    path.write_bytes(b'NOPE' + bytes(40))
+    with pytest.raises(MapFormatError):
+        MapFile(str(path))
+
+
+def test_sparse_file_size_and_version_1(tmp_path):
+    small, huge = Layer(64, 64), Layer(64000, 64000)
+    for layer in (small, huge):
+        layer.paint(5, 6, (1, 2))
+        layer.paint(63, 63, (0, 7))
+    sizes = []
+    for name, layer in (('small', small), ('huge', huge)):
+        path = str(tmp_path / f'{name}.rpgmap')
+        write_binary_map(path, [layer])
+        sizes.append(os.path.getsize(path))
+    assert sizes[0] == sizes[1]
+    with MapFile(str(tmp_path / 'huge.rpgmap')) as map_file:
+        assert sorted(map_file.chunk_keys(0)) == [(0, 0), (3, 3)]
+        assert map_file.load_layers()[0].usage() == {(1, 2): 1, (0, 7): 1}
+
+    # a version 1 file with a dense chunk table
+    cells = array('H', [0] * 256)
+    cells[6 * 16 + 5] = 1
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    data = cells.tobytes()
+    header = HEADER.pack(MAGIC, 1, 1, 32, 16, 16, 1) + PALETTE_ENTRY.pack(1, 2)
+    offset = len(header) + 2 * TABLE_ENTRY.size
+    path = tmp_path / 'old.rpgmap'
+    path.write_bytes(header + TABLE_ENTRY.pack(0, 0) + TABLE_ENTRY.pack(offset, len(data)) + data)
+    with MapFile(str(path)) as map_file:
+        layer = map_file.load_layers()[0]
+    assert layer.get(21, 6) == (1, 2) and layer.count(-1) == 32 * 16 - 1
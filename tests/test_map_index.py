@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+from classes.layer import Layer
+from classes.map_format import write_binary_map, write_json_layers
+from classes.map_index import MapIndex, scan_map
+
+
+def test_scan_describes_map(tmp_path):
+    layers = [Layer(128, 64) for _ in range(3)]
+    layers[0].fill_rect(0, 0, 64, 64, (0, 1))
+    layers[2].paint(100, 10, (1, 2))
+    path = str(tmp_path / 'a.rpgmap')
+    write_binary_map(path, layers)
+    entry = scan_map(path, preview_size=32)
+    assert (entry['width'], entry['height'], entry['filled']) == (128, 64, [64 * 64, 0, 1])
+    assert entry['mtime'] == os.path.getmtime(path)
+    preview = entry['preview']
+    assert (preview['width'], preview['height']) == (32, 16)
+    assert preview['codes'][0] == 1 and preview['codes'][-1] == -1
+
+
+def test_index_builds_in_background_and_reuses_cache(tmp_path):
+    maps = tmp_path / 'maps'
+    maps.mkdir()
+    layer = Layer(10, 10)
+    layer.paint(1, 1, (0, 1))
+    write_json_layers(str(maps / 'a.json'), [layer])
+    (maps / 'broken.rpgmap').write_bytes(b'nope')
+    (maps / 'notes.txt').write_text('ignored')
+    cache = str(tmp_path / 'index.json')
+
+    index = MapIndex(str(maps), cache)
+    assert index.refresh() == ['a.json', 'broken.rpgmap']
+    index.wait()
+    assert index.entry('a.json')['filled'] == [1]
+    assert 'error' in index.entry('broken.rpgmap')
+    with open(cache) as f:
+        assert set(json.load(f)) == {str(maps / 'a.json'), str(maps / 'broken.rpgmap')}
+    index.close()
+
+    # unchanged maps are not read again; changed ones are
+    again = MapIndex(str(maps), cache)
+    os.remove(maps / 'broken.rpgmap')
+    layer.paint(2, 2, (0, 1))
+    write_json_layers(str(maps / 'a.json'), [layer])
+    os.utime(maps / 'a.json', (1, 1))
+    again.refresh()
+    assert again.pending() and again.entry('a.json') is None
+    again.wait()
+    assert again.entry('a.json')['filled'] == [2]
+    assert list(again.entries) == [str(maps / 'a.json')]
+    again.close()
+
+
+def test_close_drops_queued_scans(tmp_path):
+    maps = tmp_path / 'maps'
+    maps.mkdir()
+    for name in 'abc':
+        write_json_layers(str(maps / f'{name}.json'), [Layer(10, 10)])
+    index = MapIndex(str(maps), str(tmp_path / 'index.json'))
+    busy = threading.Event()
+    index.pool.submit(busy.wait, 5)
+    index.refresh()
+    futures = list(index.futures.values())
+    index.close()
+    assert all(future.cancelled() for future in futures)
+    busy.set()
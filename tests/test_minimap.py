@@ -0,0 +1,88 @@
+import pygame
+
+from classes.minimap import BACKGROUND
+
+
+def test_minimap_tracks_edits_incrementally(headless_tool, monkeypatch, tmp_path):
+    tool = headless_tool
+    minimap = tool.minimap
+    tool.draw()
+    rebuilds = []
+    original = minimap._rebuild
+    monkeypatch.setattr(minimap, '_rebuild', lambda: (rebuilds.append(1), original()))
+
+    assets = tool.config.tile_groups[0].assets
+    colour = tuple(pygame.transform.average_color(assets[0])[:3])
+    tool.layers[0].paint(2, 3, (0, 0))
+    tool.draw()
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == colour
+    assert tuple(minimap.base.get_at((3, 3)))[:3] == BACKGROUND
+
+    # upper layers win, and erasing them shows the layer below again
+    tool.layers[2].fill_rect(0, 0, 5, 5, (0, 1))
+    tool.draw()
+    upper = tuple(pygame.transform.average_color(assets[1])[:3])
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == upper
+    tool.layers[2].erase(2, 3)
+    tool.draw()
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == colour
+    assert not rebuilds
+    assert not minimap.sync()
+
+    path = str(tmp_path / 'm.rpgmap')
+    tool.save_map(path)
+    tool.new_map(10, 10)
+    tool.draw()
+    assert minimap.base.get_size() == (10, 10)
+    tool.load_map(path)
+    tool.draw()
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == colour
+    assert len(rebuilds) == 2
+
+
+def test_minimap_click_moves_camera(headless_tool):
+    tool = headless_tool
+    tool.set_zoom(1)
+    tool.camera = [0, 0]
+    tool.draw()
+    rect = tool.minimap.rect()
+    pygame.event.clear()
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=rect.center))
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=rect.center))
+    tool.input_handler.handle_events()
+    assert tool.camera != [0, 0]
+    assert tool.layers[0].count(-1) == tool.map_tiles_x * tool.map_tiles_y
+    tool.minimap.jump(rect.topleft)
+    assert tool.camera == [-128, -128]
+
+
+def test_large_maps_are_sampled_into_a_bounded_base(headless_tool, monkeypatch):
+    from classes import minimap as minimap_module
+
+    tool = headless_tool
+    minimap = tool.minimap
+    tool.new_map(100000, 100000)
+    tool.draw()
+    assert max(minimap.base.get_size()) <= minimap_module.MAX_BASE
+
+    monkeypatch.setattr(minimap_module, 'MAX_BASE', 16)
+    tool.new_map(100, 100)
+    tool.layers[0].paint(14, 21, (0, 0))
+    tool.layers[0].fill_rect(64, 64, 100, 100, (0, 1))
+    tool.draw()
+    assert minimap.step == 7 and minimap.base.get_size() == (15, 15)
+    assets = tool.config.tile_groups[0].assets
+    colour = tuple(pygame.transform.average_color(assets[0])[:3])
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == colour
+    assert tuple(minimap.base.get_at((10, 10)))[:3] == tuple(pygame.transform.average_color(assets[1])[:3])
+    assert tuple(minimap.base.get_at((2, 2)))[:3] == BACKGROUND
+
+    # only the sampled tile of a block is drawn
+    tool.layers[0].paint(15, 15, (0, 0))
+    tool.draw()
+    assert tuple(minimap.base.get_at((2, 2)))[:3] == BACKGROUND
+    tool.layers[0].paint(14, 14, (0, 0))
+    tool.layers[0].erase(14, 21)
+    tool.draw()
+    assert tuple(minimap.base.get_at((2, 2)))[:3] == colour
+    assert tuple(minimap.base.get_at((2, 3)))[:3] == BACKGROUND
@@ -0,0 +1,103 @@
+import time
+
+from classes.brush import BrushItem
+
+
+def _state(tool):
+    cells = [[layer.get_chunk(cx, cy).tobytes() for cy in range(layer.chunks_y) for cx in range(layer.chunks_x)]
+             for layer in tool.layers]
+    items = [(i.group_idx, i.asset_idx, i.x, i.y, i.z) for i in tool.brush_items]
+    return tool.layers[0].width, tool.layers[0].height, cells, items
+
+
+def _pump(host, clients):
+    """Run frames until every client shows what the host does."""
+    deadline = time.monotonic() + 5
+    while True:
+        host.netplay.sync()
+        host.draw()
+        for client in clients:
+            client.netplay.sync()
+            client.draw()
+        if all(_state(client) == _state(host) for client in clients):
+            return
+        assert time.monotonic() < deadline, 'clients did not catch up'
+        time.sleep(0.01)
+
+
+def test_session_mirrors_edits_as_deltas(make_headless_tool):
+    host = make_headless_tool()
+    host.new_map(100, 80)
+    host.layers[0].fill_rect(0, 0, 10, 10, (0, 0))
+    host.add_brush_item(BrushItem(0, 0, 5.0, 6.0))
+    server = host.host_session(0)
+    clients = [make_headless_tool() for _ in range(2)]
+    try:
+        for client in clients:
+            client.join_session('127.0.0.1', server.port)
+        _pump(host, clients)
+        assert server.clients == 2
+
+        host.layers[1].paint(3, 4, (0, 1))
+        host.layers[0].erase(2, 2)
+        _pump(host, clients)
+        # whole chunks go out as such
+        host.layers[2].fill_rect(20, 20, 60, 50, (0, 1))
+        _pump(host, clients)
+
+        moved = BrushItem(0, 0, 1.0, 1.0)
+        host.add_brush_item(moved)
+        gone = BrushItem(0, 0, 9.0, 9.0)
+        host.add_brush_item(gone)
+        for x in range(10):
+            host.move_brush_item(moved, 40.0 + x, 30.0)
+        host.remove_brush_item(gone)
+        _pump(host, clients)
+        host.undo()
+        _pump(host, clients)
+
+        host.set_brush_items([BrushItem(0, 0, 2.0, 3.0), BrushItem(0, 0, 4.0, 5.0)])
+        host.move_brush_item(host.brush_items[0], 7.0, 7.0)
+        _pump(host, clients)
+        # everything after joining arrived as deltas
+        assert all(client.netplay.snapshots == 1 for client in clients)
+
+        # a new map is sent whole
+        host.new_map(30, 30)
+        _pump(host, clients)
+        assert all(client.netplay.snapshots == 2 for client in clients)
+    finally:
+        for client in clients:
+            client.leave_session()
+        host.leave_session()
+
+
+def test_client_removing_an_item_locally_ignores_later_host_ops(make_headless_tool):
+    host = make_headless_tool()
+    host.new_map(20, 20)
+    moved = BrushItem(0, 0, 1.0, 1.0)
+    removed = BrushItem(0, 0, 2.0, 2.0)
+    kept = BrushItem(0, 0, 3.0, 3.0)
+    for item in (moved, removed, kept):
+        host.add_brush_item(item)
+    server = host.host_session(0)
+    client = make_headless_tool()
+    try:
+        client.join_session('127.0.0.1', server.port)
+        _pump(host, [client])
+        for item in list(client.brush_items[:2]):
+            client.remove_brush_item(item)
+
+        host.move_brush_item(moved, 8.0, 8.0)
+        host.remove_brush_item(removed)
+        host.move_brush_item(kept, 9.0, 9.0)
+        deadline = time.monotonic() + 5
+        while client.brush_items[0].x != 9.0:
+            assert time.monotonic() < deadline, 'client did not catch up'
+            host.netplay.sync()
+            client.netplay.sync()
+            time.sleep(0.01)
+        assert [(i.x, i.y) for i in client.brush_items] == [(9.0, 9.0)]
+    finally:
+        client.leave_session()
+        host.leave_session()
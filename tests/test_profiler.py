@@ -0,0 +1,73 @@
+import csv
+import json
+
+from classes.profiler import COUNTERS, PHASES, FrameProfiler
+
+
+def test_phases_accumulate_and_sleep_is_excluded():
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    for _ in range(3):
+        with profiler.phase('tiles'):
+            pass
+    profiler.phases['sleep'] = 10.0
+    profiler.count('tiles_blitted', 5)
+    profiler.count('tiles_blitted', 2)
+    sample = profiler.end_frame()
+    assert sample['frame'] == 0
+    assert sample['tiles_blitted'] == 7
+    assert sample['events'] == 0
+    assert 0 <= sample['tiles_ms'] < 1000
+    assert sample['frame_ms'] < 1000
+    assert profiler.end_frame() is None
+
+
+def test_stats_percentiles():
+    profiler = FrameProfiler(window=100)
+    for i in range(200):
+        profiler.begin_frame()
+        profiler.end_frame()
+        profiler.samples[-1]['frame_ms'] = float(i % 100)
+    s = profiler.stats()
+    assert s['frames'] == 100
+    assert s['frame_avg_ms'] == 49.5
+    assert s['frame_p95_ms'] == 95
+    assert s['frame_p99_ms'] == 99
+    assert s['frame_max_ms'] == 99
+    assert all(f'{p}_avg_ms' in s for p in PHASES)
+    assert all(f'{c}_avg' in s for c in COUNTERS)
+
+
+def test_stream_jsonl_and_csv(tmp_path):
+    profiler = FrameProfiler()
+    for name in ('frames.jsonl', 'frames.csv'):
+        path = tmp_path / 'out' / name
+        profiler.start_log(str(path))
+        for _ in range(3):
+            profiler.begin_frame()
+            profiler.count('events', 2)
+            profiler.end_frame()
+        profiler.stop_log()
+        if name.endswith('.csv'):
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(rows) == 3
+        assert [int(r['events']) for r in rows] == [2, 2, 2]
+        assert 'tk_ms' in rows[0] and 'frame_ms' in rows[0]
+
+
+def test_hud_in_headless_tool(headless_tool):
+    tool = headless_tool
+    tool.profiler.begin_frame()
+    tool.draw()
+    tool.profiler.end_frame()
+    assert tool.profiler.samples[-1]['chunks_rendered'] == 0
+    tool.toggle_profiler_hud()
+    tool.draw()
+    assert tool.hud_rect is not None
+    assert tool.screen.get_at(tool.hud_rect.center)[:3] != (50, 50, 50)
+    tool.toggle_profiler_hud()
+    assert tool.hud_rect is None and tool.damage
+    tool.draw()
@@ -0,0 +1,99 @@
+import time
+
+import pygame
+
+from classes.scheduler import LINGER, FrameScheduler
+
+
+def test_tk_is_rate_limited():
+    scheduler = FrameScheduler(tk_hz=10)
+    assert scheduler.tk_due()
+    assert not scheduler.tk_due()
+    scheduler.last_tk -= 0.1
+    assert scheduler.tk_due()
+    assert FrameScheduler(tk_hz=0).tk_due() and FrameScheduler(tk_hz=0).tk_due()
+
+
+def test_active_frames_are_paced_and_idle_waits_wake_on_input(monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    pygame.event.clear()
+    scheduler = FrameScheduler(target_fps=50, idle_fps=0, tk_hz=0)
+    start = time.perf_counter()
+    scheduler.wait(active=True)
+    assert scheduler.wait(active=False) is None
+    # two frames at the interactive rate
+    assert 0.03 < time.perf_counter() - start < 0.5
+
+    scheduler.active_until = time.perf_counter() - LINGER
+    pygame.event.post(pygame.event.Event(pygame.USEREVENT, {'n': 1}))
+    start = time.perf_counter()
+    event = scheduler.wait(active=False)
+    assert event.type == pygame.USEREVENT and event.n == 1
+    assert time.perf_counter() - start < 0.2
+    # the input starts a burst of interactive frames
+    assert scheduler.active_until > time.perf_counter()
+
+    # with nothing to do, an idle wait ends at its cap
+    scheduler.active_until = 0.0
+    start = time.perf_counter()
+    assert scheduler.wait(active=False, wake_within=0.05) is None
+    assert time.perf_counter() - start < 0.5
+
+
+def test_idle_loop_polls_tk_without_running_frames(monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    pygame.event.clear()
+    polls = []
+
+    def poll():
+        polls.append(1)
+        return False
+
+    scheduler = FrameScheduler(target_fps=60, idle_fps=4, tk_hz=50)
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1.0:
+        scheduler.wait(active=False, poll_tk=poll)
+        frames += 1
+    # Tk is serviced at its own rate, frames only run at the idle rate
+    assert frames <= 6
+    assert len(polls) >= 25
+
+    # Tk leaving work ends the wait at once
+    start = time.perf_counter()
+    scheduler.wait(active=False, poll_tk=lambda: True)
+    assert time.perf_counter() - start < 0.1
+
+
+def test_tool_reports_pending_work(headless_tool):
+    tool = headless_tool
+    tool.draw()
+    assert not tool.needs_frame()
+    tool.layers[0].paint(1, 1, (0, 0))
+    assert tool.needs_frame()
+    tool.draw()
+    tool.camera[0] += 5
+    assert tool.needs_frame()
+
+
+def test_off_screen_edits_do_not_keep_the_loop_busy(headless_tool):
+    tool = headless_tool
+    tool.new_map(200, 200)
+    tool.camera = [0, 0]
+    tool.minimap.visible = False
+    tool.draw()
+    tool.layers[0].paint(150, 150, (0, 0))
+    assert tool.needs_frame()
+    tool.draw()
+    assert not tool.needs_frame()
+
+    tool.minimap.visible = True
+    tool.show_ui = False
+    tool.draw()
+    tool.layers[1].paint(160, 160, (0, 0))
+    tool.draw()
+    assert not tool.needs_frame()
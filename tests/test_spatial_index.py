@@ -0,0 +1,29 @@
+from classes.brush import BrushItem
+from classes.spatial_index import SpatialGrid
+
+
+def test_point_query_returns_topmost():
+    index = SpatialGrid(32)
+    low = BrushItem(0, 0, 10, 10, z=0)
+    high = BrushItem(0, 0, 20, 20, z=1)
+    index.insert(low, (10, 10, 40, 40))
+    index.insert(high, (20, 20, 40, 40))
+    assert index.query_point(25, 25) is high
+    assert index.query_point(15, 15) is low
+    assert index.query_point(55, 55) is high
+    assert index.query_point(100, 100) is None
+    index.remove(high)
+    assert index.query_point(25, 25) is low
+    assert len(index) == 1
+
+
+def test_move_and_rect_query_keep_z_order():
+    index = SpatialGrid(32)
+    items = [BrushItem(0, 0, i * 50, 0, z=i) for i in range(5)]
+    for item in reversed(items):
+        index.insert(item, (item.x, item.y, 32, 32))
+    assert index.query_rect((0, 0, 120, 32)) == items[:3]
+    index.move(items[4], (1000, 1000, 32, 32))
+    assert index.query_point(210, 10) is None
+    assert index.query_point(1010, 1010) is items[4]
+    assert index.query_rect((-10, -10, 5000, 5000)) == items
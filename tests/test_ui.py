@@ -0,0 +1,13 @@
+def test_asset_ui_reuses_cached_surfaces(headless_tool):
+    tool = headless_tool
+    tool.draw()
+    bar, strip = tool.asset_ui.bar, tool.asset_ui.strip
+    calls = tool.scaled_assets.scale_calls
+    tool.invalidate()
+    tool.draw()
+    assert tool.asset_ui.bar is bar and tool.asset_ui.strip is strip
+    assert tool.scaled_assets.scale_calls == calls
+    tool.asset_ui.cycle_selected_asset(1)
+    tool.draw()
+    assert tool.asset_ui.strip is not strip
+    assert tool.scaled_assets.scale_calls == calls